@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+# Make the orchestrator's 'app' package importable when run from the project root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'orchestrator_agent'))
+
+from app.frameworks import FRAMEWORK_AGENTS, agent_url
+from app.prewarm import PrewarmScheduler, SelectionFrequencies
+from app.transport import AgentTransport
+from benchmark_ranking import percentile
+from fake_framework_agents import add_fake_agent_arguments, build_fake_agents, start_fake_agents, stop_fake_agents
+
+SELECTION_SIZE = 4
+
+
+def selection_weights(skew: float) -> dict:
+    """Zipf-like popularity: the i-th framework is picked with weight 1 / (i + 1) ** skew."""
+    return {name: 1.0 / (i + 1) ** skew for i, (name, _) in enumerate(FRAMEWORK_AGENTS)}
+
+
+def simulate_ranking(rng: random.Random, weights: dict) -> list:
+    """A ranking whose top SELECTION_SIZE follows the popularity weights (weighted sampling without replacement)."""
+    names = list(weights)
+    return sorted(names, key=lambda name: rng.random() ** (1.0 / weights[name]), reverse=True)
+
+
+async def run_session(index: int, scheduler: PrewarmScheduler, transport: AgentTransport, rng: random.Random,
+                      weights: dict, args) -> list:
+    """One session: query arrives, ranking runs, then Pass 1 for the top picks. Returns Pass 1 latencies (ms)."""
+    scheduler.on_query()
+    await asyncio.sleep(args.ranking_seconds)
+    ranked = simulate_ranking(rng, weights)
+    scheduler.on_ranked(ranked)
+    await asyncio.sleep(args.selection_seconds)
+    selected = ranked[:SELECTION_SIZE]
+    scheduler.record_selection(selected)
+    payload = {"input": {"message": json.dumps({"original_query": f"benchmark query {index}"}),
+                         "session_id": f"prewarm-{index}", "user_id": "bench"}}
+
+    async def call(name):
+        start = time.perf_counter()
+        await transport.post_json(f"{agent_url(name)}/run", payload)
+        return (time.perf_counter() - start) * 1000
+
+    return await asyncio.gather(*(call(name) for name in selected))
+
+
+async def run_mode(prewarm: bool, args) -> dict:
+    agents = build_fake_agents(args)
+    servers, tasks = await start_fake_agents(agents, args.host, args.base_port)
+    transport = AgentTransport(http2=False)
+    scheduler = PrewarmScheduler({name: agent_url(name) for name in agents}, transport=transport,
+                                 frequencies=SelectionFrequencies(args.half_life), enabled=prewarm,
+                                 keep_warm_top_k=args.keep_warm_top_k,
+                                 keep_warm_interval_seconds=args.keep_warm_interval,
+                                 min_interval_seconds=args.min_interval)
+    rng = random.Random(args.seed)
+    weights = selection_weights(args.skew)
+    latencies = []
+    try:
+        for i in range(args.sessions):
+            latencies.extend(await run_session(i, scheduler, transport, rng, weights, args))
+            # Sessions arrive sparsely, so services regularly go idle in between.
+            await asyncio.sleep(rng.expovariate(1.0 / args.mean_gap))
+    finally:
+        await scheduler.aclose()
+        await transport.aclose()
+        await stop_fake_agents(servers, tasks)
+
+    latencies.sort()
+    cold_calls = sum(1 for ms in latencies if ms >= args.cold_start * 1000 * 0.5)
+    return {
+        "pass1_calls": len(latencies),
+        "cold_calls": cold_calls,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "cold_starts_total": sum(agent.stats["cold_starts"] for agent in agents.values()),
+        "scheduler": scheduler.stats(),
+    }
+
+
+async def main(args):
+    results = {}
+    for mode, prewarm in (("no_prewarm", False), ("prewarm", True)):
+        results[mode] = await run_mode(prewarm, args)
+
+    print(f"\n{'mode':<12} {'calls':>6} {'cold':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'probes':>7} {'cold starts':>12}")
+    for mode, r in results.items():
+        print(f"{mode:<12} {r['pass1_calls']:>6} {r['cold_calls']:>6} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['p99_ms']:>9.1f} {r['scheduler']['probes']:>7} {r['cold_starts_total']:>12}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    # To run: `python scripts/benchmark_prewarm.py --sessions 40 --cold-start 1.5 --idle-timeout 3` from the project root.
+    # Time is compressed: a stand-in goes cold after --idle-timeout seconds without traffic, so keep
+    # --keep-warm-interval below it and --mean-gap around it.
+    parser = argparse.ArgumentParser(description="Measure Pass 1 cold starts with and without the pre-warm scheduler.")
+    add_fake_agent_arguments(parser)
+    parser.set_defaults(agent_latency="uniform:0.05,0.15", cold_start=1.5, idle_timeout=3.0)
+    parser.add_argument('--sessions', type=int, default=40)
+    parser.add_argument('--mean-gap', type=float, default=3.0, help="Mean seconds between sessions.")
+    parser.add_argument('--ranking-seconds', type=float, default=1.0, help="Simulated ranking time.")
+    parser.add_argument('--selection-seconds', type=float, default=0.0, help="Simulated time the user takes to choose.")
+    parser.add_argument('--skew', type=float, default=1.2, help="Zipf exponent of framework popularity.")
+    parser.add_argument('--keep-warm-top-k', type=int, default=3)
+    parser.add_argument('--keep-warm-interval', type=float, default=2.0)
+    parser.add_argument('--min-interval', type=float, default=1.0, help="Seconds a probed service is assumed warm.")
+    parser.add_argument('--half-life', type=float, default=600.0, help="Selection frequency half-life in seconds.")
+    parser.add_argument('--output', help="Write the JSON report here.")
+    asyncio.run(main(parser.parse_args()))
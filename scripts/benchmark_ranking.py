@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import argparse
+import tracemalloc
+from types import SimpleNamespace
+
+# Make the orchestrator's 'app' package importable when run from the project root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'orchestrator_agent'))
+
+from app import tools
+from app.catalog import FrameworkCatalog
+from app.fakes import FakeFirestoreClient, LatencyDistribution, StubEmbedder, StubLLM, make_fake_frameworks
+from app.qa import QAState, initialize_qa_state
+from app.query_cache import MemoryTier, QueryCache
+from app.scoring import CompiledCatalog
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def install_stubs(catalog_size: int, dim: int, embed_latency: str, llm_latency: str, seed: int):
+    """Points the ranking module at offline stand-ins for Gemini and Firestore."""
+    client = FakeFirestoreClient()
+    for framework in make_fake_frameworks(catalog_size, dim=dim, seed=seed):
+        client.collection('frameworks').document(framework['name']).set(framework)
+
+    embedder = StubEmbedder(dim=dim, latency=LatencyDistribution(embed_latency, seed=seed))
+    tools.genai = SimpleNamespace(embed_content=embedder.embed_content)
+    tools.llm = StubLLM(latency=LatencyDistribution(llm_latency, seed=seed + 1))
+    tools.catalog = FrameworkCatalog(client_factory=lambda: client)
+    tools.embedding_index = None
+    # A zero-capacity cache: every lookup misses, so stages measure real work.
+    tools.query_cache = QueryCache(MemoryTier(max_entries=0), log_every=0)
+    tools.catalog.get()
+    return client
+
+
+def make_qa_context(agent_count: int = 4):
+    state = {"selected_frameworks": [f"agent_{i}" for i in range(agent_count)]}
+    for i in range(agent_count):
+        if i % 2:
+            state[f"agent_{i}"] = json.dumps({"status": "SUFFICIENT", "questions": []})
+        else:
+            state[f"agent_{i}"] = json.dumps({"status": "NEED_INFO", "questions": [f"Question {q}?" for q in range(3)]})
+    return SimpleNamespace(session=SimpleNamespace(state=state))
+
+
+def qa_answer_turn(qa_ctx):
+    """One sequential Q&A turn: load the stored state, answer the current question, store it back."""
+    qa = QAState.from_dict(qa_ctx.session.state.get("qa_state"))
+    if qa is None or qa.complete:
+        qa = initialize_qa_state(qa_ctx)
+    qa.answer("About two hundred thousand dollars.")
+    qa_ctx.session.state["qa_state"] = qa.to_dict()
+
+
+def build_stages():
+    """Returns stage name -> zero-argument callable. Each query is made unique so nothing is cached."""
+    counter = iter(range(10 ** 9))
+    query = lambda: f"Should our team expand into a new market this year? variant {next(counter)}"
+    frameworks = tools.catalog.get()
+    compiled = tools._get_compiled_catalog()
+    analysis = tools._analyze_query_characteristics("warm-up query")
+    embedding = tools._embed_query("warm-up query")
+    qa_ctx = make_qa_context()
+
+    return {
+        "catalog_get": lambda: tools.catalog.get(),
+        "compile_catalog": lambda: CompiledCatalog(frameworks),
+        "criteria_scores": lambda: compiled.criteria_scores_batch([analysis], [embedding]),
+        "score_and_rank": lambda: compiled.rank(analysis, embedding),
+        "embed_query": lambda: tools._embed_query(query()),
+        "analyze_query": lambda: tools._analyze_query_characteristics(query()),
+        "rank_frameworks": lambda: tools.rank_frameworks(query()),
+        "rank_frameworks_async": lambda: asyncio.run(tools.rank_frameworks_async(query())),
+        "initialize_qa_state": lambda: initialize_qa_state(qa_ctx),
+        "qa_answer_turn": lambda: qa_answer_turn(qa_ctx),
+    }
+
+
+def measure(fn, iterations: int, alloc_iterations: int):
+    # Warm up once so lazy initialization is not counted.
+    fn()
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(alloc_iterations):
+        fn()
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size for stat in snapshot.statistics('filename'))
+
+    return {
+        "p50_ms": round(percentile(durations, 50), 4),
+        "p95_ms": round(percentile(durations, 95), 4),
+        "p99_ms": round(percentile(durations, 99), 4),
+        "mean_ms": round(sum(durations) / len(durations), 4),
+        "peak_kib": round((peak - before) / 1024, 1),
+        "retained_kib_per_call": round(allocated / 1024 / max(1, alloc_iterations), 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Returns the stages whose p50 or p95 regressed by more than `tolerance` (a fraction)."""
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            # Ignore sub-10us noise on trivially cheap stages.
+            if current[metric] > previous[metric] * (1 + tolerance) and current[metric] - previous[metric] > 0.01:
+                regressions.append(f"{stage}.{metric}: {previous[metric]} -> {current[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the ranking and Q&A stages with deterministic stubs.")
+    parser.add_argument('--catalog-size', type=int, default=10)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--alloc-iterations', type=int, default=20)
+    parser.add_argument('--embed-latency', default="0", help="Stub embedder latency, e.g. 'lognormal:-3,0.4'.")
+    parser.add_argument('--llm-latency', default="0", help="Stub LLM latency, e.g. 'uniform:0.5,2.0'.")
+    parser.add_argument('--stages', nargs='*', help="Only run these stages.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-baseline', help="Write results to this JSON file.")
+    parser.add_argument('--compare', help="Baseline JSON to compare against; exits 1 on regression.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%).")
+    args = parser.parse_args()
+
+    install_stubs(args.catalog_size, args.dim, args.embed_latency, args.llm_latency, args.seed)
+    stages = build_stages()
+    selected = args.stages or list(stages)
+
+    results = {
+        "config": {
+            "catalog_size": args.catalog_size, "dim": args.dim, "iterations": args.iterations,
+            "embed_latency": args.embed_latency, "llm_latency": args.llm_latency, "seed": args.seed,
+        },
+        "environment": {"python": platform.python_version(), "machine": platform.machine()},
+        "stages": {},
+    }
+
+    # Ranking functions print progress; keep the report readable.
+    real_stdout = sys.stdout
+    print(f"{'stage':<24} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'peak KiB':>10} {'KiB/call':>10}")
+    for name in selected:
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            stats = measure(stages[name], args.iterations, args.alloc_iterations)
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+        results["stages"][name] = stats
+        print(f"{name:<24} {stats['p50_ms']:>10.4f} {stats['p95_ms']:>10.4f} {stats['p99_ms']:>10.4f} "
+              f"{stats['peak_kib']:>10.1f} {stats['retained_kib_per_call']:>10.1f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("Warning: baseline was recorded with a different configuration.")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("REGRESSIONS:")
+            for line in regressions:
+                print(f"  > {line}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == '__main__':
+    # To run: `python scripts/benchmark_ranking.py --save-baseline benchmarks/ranking.json` from the project root,
+    # then `python scripts/benchmark_ranking.py --compare benchmarks/ranking.json` after a change.
+    main()
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+# Make the orchestrator's 'app' package importable when run from the project root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'orchestrator_agent'))
+
+from app.fakes import FAKE_ATTRIBUTE_VALUES, make_fake_frameworks
+from app.scoring import CATEGORICAL_CRITERIA, WEIGHTS, CompiledCatalog
+
+# Maps a framework attribute to the query_analysis key that selects it.
+ANALYSIS_KEYS = {attribute: key for attribute, key, _ in CATEGORICAL_CRITERIA.values()}
+
+
+def legacy_rank(frameworks, query_analysis, query_embedding):
+    """The per-framework Python loop that CompiledCatalog replaced, kept for comparison."""
+    ranked = []
+    for framework in frameworks:
+        scores = {'semantic_relevance': sum(q * f for q, f in zip(query_embedding, framework.get('embedding', [])))}
+        for criterion, (attribute, key, miss_score) in CATEGORICAL_CRITERIA.items():
+            scores[criterion] = 1.0 if query_analysis.get(key) in framework.get(attribute, []) else miss_score
+        ranked.append((sum(scores[k] * WEIGHTS[k] for k in WEIGHTS), framework))
+    ranked.sort(key=lambda x: x[0], reverse=True)
+    return ranked
+
+
+def make_query(rng, dim):
+    analysis = {ANALYSIS_KEYS[attribute]: rng.choice(values) for attribute, values in FAKE_ATTRIBUTE_VALUES.items()}
+    embedding = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    return analysis, embedding
+
+
+def time_per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(sizes, dim, batch_size, repeat):
+    rng = random.Random(42)
+    queries = [make_query(rng, dim) for _ in range(batch_size)]
+    analyses = [q[0] for q in queries]
+    embeddings = [q[1] for q in queries]
+    analysis, embedding = queries[0]
+
+    print(f"dim={dim}, batch={batch_size}, repeat={repeat}")
+    print(f"{'frameworks':>10} | {'compile ms':>10} | {'legacy ms/q':>11} | {'score ms/q':>10} | {'rank ms/q':>9} | {'batch ms/q':>10}")
+    for size in sizes:
+        frameworks = make_fake_frameworks(size, dim=dim)
+
+        start = time.perf_counter()
+        compiled = CompiledCatalog(frameworks)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        legacy_repeat = max(1, repeat // max(1, size // 100))
+        legacy_ms = time_per_call(lambda: legacy_rank(frameworks, analysis, embedding), legacy_repeat) * 1000
+        score_ms = time_per_call(lambda: compiled.score(analysis, embedding), repeat) * 1000
+        rank_ms = time_per_call(lambda: compiled.rank(analysis, embedding), repeat) * 1000
+        batch_ms = time_per_call(lambda: compiled.score_batch(analyses, embeddings), max(1, repeat // 10)) * 1000 / batch_size
+
+        print(f"{size:>10} | {compile_ms:>10.2f} | {legacy_ms:>11.3f} | {score_ms:>10.3f} | {rank_ms:>9.3f} | {batch_ms:>10.4f}")
+
+
+if __name__ == '__main__':
+    # To run: `python scripts/benchmark_scoring.py` from the project root.
+    parser = argparse.ArgumentParser(description="Benchmark per-query framework scoring at several catalog sizes.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--dim', type=int, default=768, help="Embedding dimension (text-embedding-004 is 768).")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    run(args.sizes, args.dim, args.batch_size, args.repeat)
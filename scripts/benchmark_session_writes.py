@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import random
+import argparse
+
+# Make the orchestrator's 'app' package importable when run from the project root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'orchestrator_agent'))
+
+from app.fakes import FakeFirestoreClient, make_fake_frameworks
+from app.frameworks import FRAMEWORK_AGENTS
+from app.qa import QAState
+from app.session_store import SessionWriter, canonical_json
+
+
+def simulate_session(rng: random.Random, questions_per_agent: int, report_chars: int):
+    """
+    Yields (state, events) per turn, mutating one state dict the way
+    OrchestratorAgent does: ranking and Pass 1 on the first turn, one Q&A answer
+    per turn, then Pass 2 reports, digests and the final recommendation.
+    """
+    state = {}
+    names = [name for name, _ in FRAMEWORK_AGENTS]
+    ranked = make_fake_frameworks(len(names), seed=rng.randint(0, 10 ** 6))
+    for name, framework in zip(names, ranked):
+        framework["name"] = name
+        framework["score"] = round(rng.random(), 3)
+    selected = names[:4]
+
+    state["query"] = "Should we expand our bakery into a second location next year?"
+    state["ranked_frameworks"] = ranked
+    state["selected_frameworks"] = selected
+    for name in selected:
+        state[name] = json.dumps({"status": "NEED_INFO", "questions": [f"{name} q{i}?" for i in range(questions_per_agent)]})
+    qa = QAState.from_results({name: json.loads(state[name]) for name in selected})
+    state["qa_state"] = qa.to_dict()
+    # The user's message, the selection notice, one event per Pass 1 agent, and the first question.
+    yield state, 3 + len(selected)
+
+    while not qa.complete:
+        qa.answer("About two hundred thousand dollars.")
+        state["qa_state"] = qa.to_dict()
+        yield state, 2
+
+    for name in selected:
+        state[name] = json.dumps({"framework": name, "analysis": "x" * report_chars, "caveat": "None."})
+    state["agent_reports"] = {name: state[name] for name in selected}
+    state["synthesis_brief"] = {"frameworks": selected, "summary": "y" * (report_chars // 4)}
+    state["final_recommendation"] = {"text": "z" * report_chars}
+    yield state, 3 + len(selected)
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    client = FakeFirestoreClient()
+    writer = SessionWriter(lambda: client)
+    full = {"commits": 0, "bytes_written": 0}
+    max_document_bytes = {"full": 0, "delta": 0, "delta_subcollections": 0}
+    # Bytes a later Q&A turn reads: the whole session document vs. the header plus the values it touches.
+    qa_turn_read_bytes = {"full": 0, "delta": 0}
+    event = {"author": "orchestrator", "content": {"parts": [{"text": "w" * 200}]}}
+
+    for s in range(args.sessions):
+        session_id = f"bench-{s}"
+        for state, events in simulate_session(rng, args.questions, args.report_chars):
+            # Whole-session persistence: every event rewrites the full state.
+            state_bytes = len(canonical_json(state))
+            full["commits"] += events
+            full["bytes_written"] += events * (state_bytes + len(canonical_json(event)))
+            max_document_bytes["full"] = max(max_document_bytes["full"], state_bytes)
+            for _ in range(events):
+                writer.stage(session_id, state, {"app_name": "foursight", "user_id": "bench"}, event=event)
+            writer.flush(session_id)
+            if "qa_state" in state and not QAState.from_dict(state["qa_state"]).complete:
+                reader = SessionWriter(lambda: client)
+                loaded, _, _ = reader.load(session_id, recent_events=0)
+                for key in ("query", "qa_state"):
+                    loaded.get(key)
+                qa_turn_read_bytes["full"] += len(canonical_json(state))
+                qa_turn_read_bytes["delta"] += reader.stats()["bytes_read"]
+        stored = client.collection("sessions").document(session_id).get().to_dict()
+        max_document_bytes["delta"] = max(max_document_bytes["delta"], len(canonical_json(stored)))
+        for name in ("state", "events"):
+            for snapshot in client.collection(f"sessions/{session_id}/{name}").stream():
+                size = sum(len(v) for v in snapshot.to_dict().values() if isinstance(v, (str, bytes)))
+                max_document_bytes["delta_subcollections"] = max(max_document_bytes["delta_subcollections"], size)
+
+    delta = writer.stats()
+    print(f"\n{'store':<8} {'commits':>9} {'MB written':>11} {'max doc KB':>11}")
+    print(f"{'full':<8} {full['commits']:>9} {full['bytes_written'] / 1e6:>11.2f} {max_document_bytes['full'] / 1e3:>11.1f}")
+    print(f"{'delta':<8} {delta['commits']:>9} {delta['bytes_written'] / 1e6:>11.2f} {max_document_bytes['delta'] / 1e3:>11.1f}")
+    print(f"\nDelta store: {delta['fields_written']} fields written, {delta['refs_written']} ranking blobs stored, "
+          f"{delta['refs_reused']} reused, {delta['values_offloaded']} values offloaded in {delta['shards_written']} shards, "
+          f"{delta['event_chunks_written']} history chunks")
+    print(f"Compression: {delta['uncompressed_bytes'] / 1e6:.2f} MB of payloads stored in "
+          f"{delta['bytes_written'] / 1e6:.2f} MB; largest subcollection document "
+          f"{max_document_bytes['delta_subcollections'] / 1e3:.1f} KB")
+    print(f"Q&A turns: {qa_turn_read_bytes['full'] / 1e6:.2f} MB read with whole-session documents, "
+          f"{qa_turn_read_bytes['delta'] / 1e6:.2f} MB with lazy loading")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"config": vars(args), "full": full, "delta": delta, "max_document_bytes": max_document_bytes,
+                       "qa_turn_read_bytes": qa_turn_read_bytes}, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    # To run: `python scripts/benchmark_session_writes.py --sessions 50` from the project root.
+    parser = argparse.ArgumentParser(description="Compare whole-session and delta session persistence on simulated sessions.")
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--questions', type=int, default=3, help="Questions asked by each of the four selected agents.")
+    parser.add_argument('--report-chars', type=int, default=6000, help="Size of each Pass 2 report.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON report here.")
+    main(parser.parse_args())
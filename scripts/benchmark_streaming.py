@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+# Make the orchestrator's 'app' package importable when run from the project root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'orchestrator_agent'))
+
+from app.digest import format_section
+from app.frameworks import FRAMEWORK_AGENTS, agent_url
+from app.streaming import AgentReplyParser, stream_pass1
+from app.transport import AgentTransport
+from benchmark_ranking import percentile
+from fake_framework_agents import add_fake_agent_arguments, build_fake_agents, start_fake_agents, stop_fake_agents
+
+SELECTION_SIZE = 4
+
+
+def make_payload(index: int, pass2: bool, single_shot: bool) -> dict:
+    query = f"Should we open a second bakery location next year? (session {index})"
+    if pass2:
+        context = {"shared_context": {"original_query": query, "qa_answers": []}}
+    else:
+        context = {"original_query": query}
+        if single_shot:
+            context["protocol"] = "single_shot"
+    return {"input": {"message": json.dumps(context), "session_id": f"bench-{index}", "user_id": "bench"}}
+
+
+async def buffered_call(transport: AgentTransport, url: str, payload: dict) -> dict:
+    """The whole body, as `post_json` delivers it: every milestone is the end of the response."""
+    start = time.perf_counter()
+    await transport.post_json(url, payload)
+    elapsed = (time.perf_counter() - start) * 1000
+    return {"decision_ms": elapsed, "first_section_ms": elapsed, "full_ms": elapsed}
+
+
+async def streamed_call(transport: AgentTransport, url: str, payload: dict, pass2: bool) -> dict:
+    """
+    Reads the response the way RemoteFrameworkAgent does. Pass 1 stops at the
+    decision (a COMPLETE report is still read to the end, as the background
+    task would); Pass 2 notes when the first section could be shown.
+    """
+    start = time.perf_counter()
+    timings = {}
+    if not pass2:
+        _, report = await stream_pass1(lambda: transport.stream_json(url, payload))
+        timings["decision_ms"] = (time.perf_counter() - start) * 1000
+        if report is not None:
+            await report
+    else:
+        parser = AgentReplyParser()
+        chunks = transport.stream_json(url, payload)
+        try:
+            async for text in chunks:
+                values = parser.feed(text)
+                if "first_section_ms" not in timings and any(
+                        len(path) == 1 and format_section("agent", path[0], value) for path, value in values):
+                    timings["first_section_ms"] = (time.perf_counter() - start) * 1000
+        finally:
+            await chunks.aclose()
+    timings["full_ms"] = (time.perf_counter() - start) * 1000
+    timings.setdefault("decision_ms", timings["full_ms"])
+    timings.setdefault("first_section_ms", timings["full_ms"])
+    return timings
+
+
+async def run_mode(mode: str, transport: AgentTransport, urls: list, args) -> dict:
+    samples = {"pass1_decision_ms": [], "qa_start_ms": [], "single_shot_report_ms": [],
+               "pass2_first_section_ms": [], "pass2_full_ms": []}
+
+    async def call(url, index, pass2):
+        payload = make_payload(index, pass2, args.single_shot)
+        if mode == "buffered":
+            return await buffered_call(transport, url, payload)
+        return await streamed_call(transport, url, payload, pass2)
+
+    for index in range(args.sessions):
+        pass1 = await asyncio.gather(*(call(url, index, False) for url in urls))
+        samples["pass1_decision_ms"].extend(t["decision_ms"] for t in pass1)
+        # Q&A (or Phase 4) starts once every selected agent has decided.
+        samples["qa_start_ms"].append(max(t["decision_ms"] for t in pass1))
+        if args.single_shot:
+            samples["single_shot_report_ms"].extend(t["full_ms"] for t in pass1)
+        pass2 = await asyncio.gather(*(call(url, index, True) for url in urls))
+        samples["pass2_first_section_ms"].extend(t["first_section_ms"] for t in pass2)
+        samples["pass2_full_ms"].extend(t["full_ms"] for t in pass2)
+
+    summary = {}
+    for key, values in samples.items():
+        values.sort()
+        summary[key] = {"p50": round(percentile(values, 50), 1), "p95": round(percentile(values, 95), 1)} if values else None
+    summary["transport"] = transport.stats()
+    return summary
+
+
+async def main(args):
+    agents = build_fake_agents(args)
+    selected = [name for name, _ in FRAMEWORK_AGENTS][:SELECTION_SIZE]
+    agents = {name: agents[name] for name in selected}
+    servers, tasks = await start_fake_agents(agents, args.host, args.base_port)
+    urls = [f"{agent_url(name)}/run" for name in selected]
+    results = {}
+    try:
+        for mode in ("buffered", "streamed"):
+            transport = AgentTransport(http2=False)
+            results[mode] = await run_mode(mode, transport, urls, args)
+            await transport.aclose()
+    finally:
+        await stop_fake_agents(servers, tasks)
+
+    rows = [("Pass 1 decision (per agent)", "pass1_decision_ms"), ("Q&A can start", "qa_start_ms"),
+            ("Pass 2 first section", "pass2_first_section_ms"), ("Pass 2 full report", "pass2_full_ms")]
+    print(f"\n{'milestone':<30} {'buffered p50':>13} {'p95':>9} {'streamed p50':>13} {'p95':>9}")
+    for label, key in rows:
+        b, s = results["buffered"][key], results["streamed"][key]
+        print(f"{label:<30} {b['p50']:>13.1f} {b['p95']:>9.1f} {s['p50']:>13.1f} {s['p95']:>9.1f}")
+    print(f"\nStreams closed at the decision: {results['streamed']['transport']['streams_closed_early']}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    # To run: `python scripts/benchmark_streaming.py --generation-seconds 3 --report-sections 6` from the project root.
+    parser = argparse.ArgumentParser(description="Measure how much earlier streamed framework agent responses can be acted on.")
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--single-shot', action='store_true', help="Request the single-shot protocol in Pass 1.")
+    parser.add_argument('--output', help="Write the JSON report here.")
+    add_fake_agent_arguments(parser)
+    parser.set_defaults(agent_latency="uniform:0.2,0.6", generation_seconds=2.0, report_sections=6, base_port=8181)
+    asyncio.run(main(parser.parse_args()))
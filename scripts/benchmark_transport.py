@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import httpx
+
+# Make the orchestrator's 'app' package importable when run from the project root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'orchestrator_agent'))
+
+from app.fakes import FakeFrameworkAgent, LatencyDistribution
+from app.transport import AgentTransport, accept_encoding
+from benchmark_ranking import percentile
+from fake_framework_agents import start_fake_agents, stop_fake_agents
+
+
+def make_payload(index: int, payload_bytes: int) -> dict:
+    """A Pass 2 request whose Q&A answers pad it to roughly `payload_bytes`."""
+    answer = "We expect demand to grow steadily over the next two quarters. " * max(1, payload_bytes // 64)
+    context = {"shared_context": {"original_query": f"Should we expand into a new market? (request {index})",
+                                  "qa_answers": [{"q": "What is the expected demand?", "a": answer[:payload_bytes]}]}}
+    return {"input": {"message": json.dumps(context), "session_id": f"bench-{index}", "user_id": "bench"}}
+
+
+class PerRequestClient:
+    """A fresh client (and so a fresh connection) per call, like a tool that builds its own HTTP session."""
+
+    def __init__(self):
+        self.requests = 0
+
+    async def post_json(self, url: str, payload: dict) -> dict:
+        self.requests += 1
+        async with httpx.AsyncClient(headers={"accept-encoding": accept_encoding()}) as client:
+            response = await client.post(url, json=payload)
+            response.raise_for_status()
+            return response.json()
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "new_connections": self.requests, "reused_connections": 0, "reuse_ratio": 0.0}
+
+    async def aclose(self):
+        pass
+
+
+async def run_mode(client, url: str, requests: int, concurrency: int, payload_bytes: int) -> dict:
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            i = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                await client.post_json(url, make_payload(i, payload_bytes))
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+    latencies.sort()
+    return {
+        "requests_per_second": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "errors": errors,
+        "transport": client.stats(),
+    }
+
+
+def build_clients(args) -> dict:
+    clients = {"per_request": PerRequestClient(),
+               "pooled_http1": AgentTransport(http2=False, pool_size=args.pool_size, request_compression="none"),
+               "pooled_http2": AgentTransport(http2=True, pool_size=args.pool_size, request_compression="none")}
+    for encoding in args.compression:
+        clients[f"pooled_http2_{encoding}"] = AgentTransport(http2=True, pool_size=args.pool_size,
+                                                             request_compression=encoding, compress_min_bytes=0)
+    return clients
+
+
+async def main(args):
+    servers, tasks = [], []
+    target = args.target
+    if not target:
+        agent = FakeFrameworkAgent("benchmark_agent", latency=LatencyDistribution(args.agent_latency, seed=args.seed),
+                                   seed=args.seed)
+        servers, tasks = await start_fake_agents({"benchmark_agent": agent}, args.host, args.port)
+        target = os.environ["BENCHMARK_AGENT_URL"]
+        print(f"Stand-in agent on {target}. Plain-http targets negotiate no HTTP/2 (no ALPN), so the "
+              f"http2 modes measure HTTP/1.1 keep-alive here; use --target https://... for HTTP/2.")
+
+    url = f"{target.rstrip('/')}/run"
+    results = {}
+    try:
+        for mode, client in build_clients(args).items():
+            # One untimed warm-up request per mode so every mode starts with a resolved host.
+            await client.post_json(url, make_payload(-1, args.payload_bytes))
+            results[mode] = await run_mode(client, url, args.requests, args.concurrency, args.payload_bytes)
+            await client.aclose()
+    finally:
+        if servers:
+            await stop_fake_agents(servers, tasks)
+
+    print(f"\n{'mode':<22} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'reuse':>7} {'h2':>6} {'sent/raw':>9}")
+    for mode, r in results.items():
+        t = r["transport"]
+        print(f"{mode:<22} {r['requests_per_second']:>9.1f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+              f"{t['reuse_ratio']:>7.0%} {t.get('http2_requests', 0):>6} {t.get('request_compression_ratio', 1.0):>9.2f}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    # To run: `python scripts/benchmark_transport.py --requests 1000 --concurrency 50` from the project root.
+    # Compressed-request modes need a server that decodes them; the local stand-in does.
+    parser = argparse.ArgumentParser(description="Compare per-request and pooled HTTP clients for framework agent calls.")
+    parser.add_argument('--requests', type=int, default=500, help="Timed requests per mode.")
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--pool-size', type=int, default=20, help="Connections per host for the pooled modes.")
+    parser.add_argument('--payload-bytes', type=int, default=4000, help="Approximate request body size.")
+    parser.add_argument('--compression', nargs='*', default=["gzip", "zstd"], choices=["gzip", "zstd"],
+                        help="Request compressions to add as extra pooled modes.")
+    parser.add_argument('--target', help="Base URL of a framework agent to benchmark instead of the local stand-in.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8199)
+    parser.add_argument('--agent-latency', default="0", help="Stand-in agent delay, e.g. 'uniform:0.01,0.05'.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON report here.")
+    asyncio.run(main(parser.parse_args()))
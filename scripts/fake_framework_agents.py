@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+
+import uvicorn
+
+# Make the orchestrator's 'app' package importable when run from the project root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'orchestrator_agent'))
+
+from app.fakes import FakeFrameworkAgent, LatencyDistribution
+from app.frameworks import FRAMEWORK_AGENTS, url_env_var
+
+
+def add_fake_agent_arguments(parser: argparse.ArgumentParser):
+    """Options shared by this script and the load test, which can start the stand-ins itself."""
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--base-port', type=int, default=8101, help="Agents listen on consecutive ports from here.")
+    parser.add_argument('--agent-latency', default="uniform:0.5,2.0", help="Per-request delay, e.g. 'lognormal:0,0.5'.")
+    parser.add_argument('--agent-error-rate', type=float, default=0.0, help="Fraction of /run requests failing with 500.")
+    parser.add_argument('--need-info-ratio', type=float, default=0.5, help="Fraction of Pass 1 answers that ask questions.")
+    parser.add_argument('--questions', type=int, default=3, help="Questions per NEED_INFO answer.")
+    parser.add_argument('--cold-start', type=float, default=0.0, help="Seconds added to the first request after idling.")
+    parser.add_argument('--idle-timeout', type=float, default=900.0, help="Idle seconds before the next request is cold.")
+    parser.add_argument('--generation-seconds', type=float, default=0.0,
+                        help="Stream each /run body over this many seconds, as an LLM generates it.")
+    parser.add_argument('--report-sections', type=int, default=0, help="Extra analysis sections per Pass 2 report.")
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def build_fake_agents(args) -> dict:
+    """Returns agent name -> FakeFrameworkAgent, one per framework agent the orchestrator knows."""
+    return {
+        name: FakeFrameworkAgent(
+            name,
+            latency=LatencyDistribution(args.agent_latency, seed=args.seed + i),
+            error_rate=args.agent_error_rate,
+            need_info_ratio=args.need_info_ratio,
+            questions=args.questions,
+            cold_start_seconds=args.cold_start,
+            idle_timeout_seconds=args.idle_timeout,
+            generation_seconds=args.generation_seconds,
+            report_sections=args.report_sections,
+            seed=args.seed + i,
+        )
+        for i, (name, _) in enumerate(FRAMEWORK_AGENTS)
+    }
+
+
+async def start_fake_agents(agents: dict, host: str, base_port: int):
+    """
+    Serves every agent on its own port in the running event loop and points the
+    matching `*_AGENT_URL` variable at it. Returns the uvicorn servers and their tasks.
+    """
+    servers, tasks = [], []
+    for offset, (name, agent) in enumerate(agents.items()):
+        port = base_port + offset
+        config = uvicorn.Config(agent, host=host, port=port, log_level="warning", lifespan="off")
+        server = uvicorn.Server(config)
+        # Signal handling belongs to whoever owns the loop.
+        server.install_signal_handlers = lambda: None
+        servers.append(server)
+        tasks.append(asyncio.create_task(server.serve()))
+        os.environ[url_env_var(name)] = f"http://{host}:{port}"
+
+    while not all(server.started for server in servers):
+        if any(task.done() for task in tasks):
+            # Surface bind errors instead of waiting forever.
+            for task in tasks:
+                if task.done():
+                    task.result()
+            raise RuntimeError("A fake framework agent exited during startup.")
+        await asyncio.sleep(0.05)
+    return servers, tasks
+
+
+async def stop_fake_agents(servers, tasks):
+    for server in servers:
+        server.should_exit = True
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def serve_forever(args):
+    agents = build_fake_agents(args)
+    servers, tasks = await start_fake_agents(agents, args.host, args.base_port)
+    print("Fake framework agents are up. Export these for the orchestrator:")
+    for name in agents:
+        print(f"  export {url_env_var(name)}={os.environ[url_env_var(name)]}")
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        print(json.dumps({name: agent.stats for name, agent in agents.items()}, indent=2))
+
+
+if __name__ == '__main__':
+    # To run: `python scripts/fake_framework_agents.py --need-info-ratio 0.3` from the project root,
+    # then start the orchestrator with the printed *_AGENT_URL variables.
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for the ten framework agent services.")
+    add_fake_agent_arguments(parser)
+    try:
+        asyncio.run(serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
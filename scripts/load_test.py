@@ -0,0 +1,401 @@
+import os
+import sys
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import urllib.request
+from collections import defaultdict
+
+# Make the orchestrator's 'app' package importable when run from the project root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'orchestrator_agent'))
+
+from fake_framework_agents import add_fake_agent_arguments, build_fake_agents, start_fake_agents, stop_fake_agents
+from benchmark_ranking import percentile
+from app.qa import QUESTION_FORM_HINT
+
+QUERIES = [
+    "Should we expand our bakery into a second location next year?",
+    "Why did customer churn spike after the last pricing change?",
+    "Which of three CRM vendors should our sales team adopt?",
+    "Should I accept a job offer that requires relocating abroad?",
+    "How do we decide whether to build or buy a data platform?",
+    "Our release cadence keeps slipping; what is the root cause?",
+]
+
+ANSWERS = [
+    "About two hundred thousand dollars and a six month timeline.",
+    "The leadership team and two department heads are involved.",
+    "We have last year's sales figures but no market research.",
+]
+
+# Accepts the default picks when the orchestrator asks the user to choose frameworks.
+SELECTION_REPLY = "ok"
+
+MAX_TURNS = 50
+
+
+def run_payload(session_id: str, user_id: str, message: str) -> dict:
+    """
+    The body posted to the orchestrator's `/run` endpoint for one user turn.
+    The exact envelope depends on the ADK server version; adjust it here.
+    """
+    return {"input": {"message": message, "session_id": session_id, "user_id": user_id}}
+
+
+def response_text(body: bytes) -> str:
+    """Concatenates every string in the response so that turn markers can be found regardless of envelope."""
+    try:
+        data = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return body.decode('utf-8', errors='replace')
+    parts = []
+
+    def walk(value):
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, dict):
+            for item in value.values():
+                walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+
+    walk(data)
+    return "\n".join(parts)
+
+
+def classify_turn(turn_index: int, text: str) -> tuple:
+    """
+    Maps an orchestrator reply to (phase, session_finished) using the messages
+    `OrchestratorAgent` yields at each step.
+    """
+    # One question per turn, or every question in one form (QA_MODE=batched).
+    asks_question = "question from" in text or QUESTION_FORM_HINT in text
+    if "Reply with up to" in text:
+        # FRAMEWORK_SELECTION=user: the ranking is shown and Pass 1 waits for a pick.
+        return "rank_and_select", False
+    if turn_index == 0:
+        if asks_question:
+            return "rank_and_pass1", False
+        # Everyone was SUFFICIENT, so the first turn ran Pass 2 and synthesis too.
+        return "rank_pass1_pass2_synthesis", True
+    if "Selection confirmed" in text:
+        if asks_question:
+            return "pass1", False
+        return "pass1_pass2_synthesis", True
+    if asks_question:
+        return "qa_answer", False
+    return "pass2_and_synthesis", True
+
+
+def form_reply(text: str, rng: random.Random) -> str:
+    """Answers every item of a question form (QA_MODE=batched), numbered as the form numbers them."""
+    ids = re.findall(r"^(\d+)\. ", text, re.MULTILINE)
+    return "\n".join(f"{i}. {rng.choice(ANSWERS)}" for i in ids)
+
+
+class AsgiClient:
+    """Posts to an ASGI app in this process, without a network hop."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def post(self, path: str, payload: dict, timeout: float) -> tuple:
+        body = json.dumps(payload).encode('utf-8')
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 80),
+        }
+        sent = False
+        status = 500
+        chunks = []
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Block like a client that keeps the connection open until the response ends.
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await asyncio.wait_for(self.app(scope, receive, send), timeout)
+        return status, b"".join(chunks)
+
+
+class HttpClient:
+    """Posts to an orchestrator that is already running, e.g. a Cloud Run revision."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+
+    async def post(self, path: str, payload: dict, timeout: float) -> tuple:
+        def call():
+            request = urllib.request.Request(self.base_url + path, data=json.dumps(payload).encode('utf-8'),
+                                             headers={"Content-Type": "application/json"}, method="POST")
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    return response.status, response.read()
+            except urllib.error.HTTPError as e:
+                return e.code, e.read()
+
+        return await asyncio.to_thread(call)
+
+
+class LoopMonitor:
+    """
+    Measures how saturated the event loop serving the sessions is: a ticker that
+    should wake every `interval` seconds records how late it actually woke.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lags_ms = []
+        self._task = None
+
+    async def _tick(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags_ms.append(max(0.0, loop.time() - expected) * 1000)
+
+    def start(self):
+        self._task = asyncio.create_task(self._tick())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+class LoadStats:
+    def __init__(self):
+        self.phase_ms = defaultdict(list)
+        self.session_ms = []
+        self.turns = 0
+        self.completed = 0
+        self.failed = 0
+        self.errors = defaultdict(int)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+
+async def run_session(client, stats: LoadStats, rng: random.Random, timeout: float):
+    session_id = f"loadtest-{uuid.uuid4().hex[:12]}"
+    user_id = f"loadtest-user-{rng.randint(1, 1000)}"
+    message = rng.choice(QUERIES)
+    stats.in_flight += 1
+    stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+    session_start = time.perf_counter()
+    try:
+        for turn in range(MAX_TURNS):
+            start = time.perf_counter()
+            try:
+                status, body = await client.post("/run", run_payload(session_id, user_id, message), timeout)
+            except Exception as e:
+                stats.failed += 1
+                stats.errors[type(e).__name__] += 1
+                return
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats.turns += 1
+            if status >= 400:
+                stats.failed += 1
+                stats.errors[f"HTTP {status}"] += 1
+                return
+            text = response_text(body)
+            phase, finished = classify_turn(turn, text)
+            stats.phase_ms[phase].append(elapsed_ms)
+            if finished:
+                stats.completed += 1
+                stats.session_ms.append((time.perf_counter() - session_start) * 1000)
+                return
+            if phase == "rank_and_select":
+                message = SELECTION_REPLY
+            elif QUESTION_FORM_HINT in text:
+                message = form_reply(text, rng)
+            else:
+                message = rng.choice(ANSWERS)
+        stats.failed += 1
+        stats.errors["max_turns_exceeded"] += 1
+    finally:
+        stats.in_flight -= 1
+
+
+async def drive(client, sessions: int, concurrency: int, arrival_rate: float | None, timeout: float, seed: int,
+                stats: LoadStats):
+    """
+    Closed loop by default: `concurrency` virtual users each start a new session
+    as soon as theirs ends. With `arrival_rate`, sessions instead arrive as a
+    Poisson process (open loop), which exposes queueing once the service saturates.
+    """
+    rng = random.Random(seed)
+    if arrival_rate:
+        tasks = []
+        for _ in range(sessions):
+            tasks.append(asyncio.create_task(run_session(client, stats, random.Random(rng.random()), timeout)))
+            await asyncio.sleep(rng.expovariate(arrival_rate))
+        await asyncio.gather(*tasks)
+        return
+
+    remaining = iter(range(sessions))
+
+    async def virtual_user(user_seed):
+        user_rng = random.Random(user_seed)
+        for _ in remaining:
+            await run_session(client, stats, user_rng, timeout)
+
+    await asyncio.gather(*(virtual_user(rng.random()) for _ in range(concurrency)))
+
+
+def summarize(ms_values: list) -> dict:
+    values = sorted(ms_values)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50), 1),
+        "p95_ms": round(percentile(values, 95), 1),
+        "p99_ms": round(percentile(values, 99), 1),
+        "max_ms": round(values[-1], 1) if values else 0.0,
+    }
+
+
+def build_report(stats: LoadStats, monitor: LoopMonitor, wall_seconds: float, cpu_seconds: float, fake_agents: dict,
+                 args) -> dict:
+    return {
+        "config": {
+            "sessions": args.sessions, "concurrency": args.concurrency, "arrival_rate": args.arrival_rate,
+            "target": args.target or "in-process main.py:agent_app",
+            "agent_latency": args.agent_latency, "need_info_ratio": args.need_info_ratio,
+            "agent_error_rate": args.agent_error_rate,
+        },
+        "throughput": {
+            "wall_seconds": round(wall_seconds, 2),
+            "sessions_completed": stats.completed,
+            "sessions_failed": stats.failed,
+            "sessions_per_second": round(stats.completed / wall_seconds, 3) if wall_seconds else 0.0,
+            "turns": stats.turns,
+            "errors": dict(stats.errors),
+        },
+        "session_latency": summarize(stats.session_ms),
+        "phase_latency": {phase: summarize(values) for phase, values in sorted(stats.phase_ms.items())},
+        "saturation": {
+            "peak_sessions_in_flight": stats.peak_in_flight,
+            # CPU time over wall time for this process; near 1.0 means the single worker is pegged.
+            "process_cpu_utilization": round(cpu_seconds / wall_seconds, 3) if wall_seconds else 0.0,
+            "event_loop_lag": summarize(monitor.lags_ms),
+        },
+        "fake_agents": {name: dict(agent.stats) for name, agent in fake_agents.items()},
+    }
+
+
+def print_report(report: dict):
+    t = report["throughput"]
+    print(f"\nSessions: {t['sessions_completed']} completed, {t['sessions_failed']} failed in {t['wall_seconds']}s "
+          f"({t['sessions_per_second']} sessions/s, {t['turns']} turns)")
+    if t["errors"]:
+        print(f"Errors: {t['errors']}")
+    print(f"\n{'phase':<28} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    rows = list(report["phase_latency"].items()) + [("(whole session)", report["session_latency"])]
+    for phase, s in rows:
+        print(f"{phase:<28} {s['count']:>7} {s['p50_ms']:>10.1f} {s['p95_ms']:>10.1f} {s['p99_ms']:>10.1f} {s['max_ms']:>10.1f}")
+    sat = report["saturation"]
+    lag = sat["event_loop_lag"]
+    print(f"\nSaturation: peak {sat['peak_sessions_in_flight']} sessions in flight, "
+          f"process CPU {sat['process_cpu_utilization']:.0%}, "
+          f"event-loop lag p50 {lag['p50_ms']}ms / p99 {lag['p99_ms']}ms / max {lag['max_ms']}ms")
+    if report["fake_agents"]:
+        totals = defaultdict(int)
+        for agent_stats in report["fake_agents"].values():
+            for key in ("pass1", "pass2", "need_info", "single_shot_reports", "errors", "cold_starts"):
+                totals[key] += agent_stats[key]
+        peak = max(agent_stats["peak_in_flight"] for agent_stats in report["fake_agents"].values())
+        print(f"Fake agents: {dict(totals)}, peak {peak} requests in flight on one agent")
+
+
+def install_offline_ranking(seed: int):
+    """
+    Serves ranking from an in-memory catalog of the ten real agent names with the
+    offline embedder and query classifier, so that only the framework agents,
+    the session store and synthesis remain external.
+    """
+    from types import SimpleNamespace
+    from app import tools
+    from app.catalog import FrameworkCatalog
+    from app.fakes import FakeFirestoreClient, StubEmbedder, make_fake_frameworks
+    from app.frameworks import FRAMEWORK_AGENTS
+
+    client = FakeFirestoreClient()
+    for (name, _), framework in zip(FRAMEWORK_AGENTS, make_fake_frameworks(len(FRAMEWORK_AGENTS), seed=seed)):
+        framework["name"] = name
+        client.collection('frameworks').document(name).set(framework)
+    tools.genai = SimpleNamespace(embed_content=StubEmbedder().embed_content)
+    tools.catalog = FrameworkCatalog(client_factory=lambda: client)
+    tools.embedding_index = None
+    tools.ANALYSIS_MODE = "local"
+
+
+async def main(args):
+    fake_agents, servers, tasks = {}, [], []
+    if not args.no_fake_agents:
+        fake_agents = build_fake_agents(args)
+        servers, tasks = await start_fake_agents(fake_agents, args.host, args.base_port)
+        print(f"Started {len(fake_agents)} fake framework agents on ports {args.base_port}-{args.base_port + len(fake_agents) - 1}.")
+
+    if args.target:
+        client = HttpClient(args.target)
+    else:
+        # Imported only now: the orchestrator reads the *_AGENT_URL variables at import time.
+        if args.offline_ranking:
+            install_offline_ranking(args.seed)
+        import main as orchestrator_main
+        client = AsgiClient(orchestrator_main.agent_app)
+
+    monitor = LoopMonitor()
+    stats = LoadStats()
+    monitor.start()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        await drive(client, args.sessions, args.concurrency, args.arrival_rate, args.timeout, args.seed, stats)
+    finally:
+        wall_seconds, cpu_seconds = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        await monitor.stop()
+        if servers:
+            await stop_fake_agents(servers, tasks)
+
+    report = build_report(stats, monitor, wall_seconds, cpu_seconds, fake_agents, args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    # To run: `python scripts/load_test.py --sessions 200 --concurrency 20` from the project root.
+    # In-process runs import services/orchestrator_agent/main.py, so the session store needs Firestore
+    # (export FIRESTORE_EMULATOR_HOST) and synthesis needs GOOGLE_API_KEY. Use --target to load a deployed
+    # orchestrator instead; the fake agents then only help if that orchestrator can reach them.
+    parser = argparse.ArgumentParser(description="Drive concurrent multi-turn sessions through the orchestrator.")
+    parser.add_argument('--sessions', type=int, default=50, help="Total sessions to run.")
+    parser.add_argument('--concurrency', type=int, default=10, help="Virtual users in the closed-loop model.")
+    parser.add_argument('--arrival-rate', type=float, default=None,
+                        help="Sessions per second (open loop); overrides --concurrency.")
+    parser.add_argument('--timeout', type=float, default=300.0, help="Seconds allowed per turn.")
+    parser.add_argument('--target', help="Base URL of a running orchestrator; default is in-process main.py:agent_app.")
+    parser.add_argument('--no-fake-agents', action='store_true', help="Use the *_AGENT_URL variables already set.")
+    parser.add_argument('--offline-ranking', action='store_true',
+                        help="Rank with the offline embedder and classifier instead of Firestore and Gemini.")
+    parser.add_argument('--output', help="Write the JSON report here.")
+    add_fake_agent_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import time
+import argparse
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Make the orchestrator's 'app' package importable when run from the project root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'orchestrator_agent'))
+
+if 'GEMINI_API_KEY' in os.environ and 'GOOGLE_API_KEY' not in os.environ:
+    os.environ['GOOGLE_API_KEY'] = os.environ['GEMINI_API_KEY']
+
+import google.generativeai as genai
+from app import tools
+
+
+def read_queries(path: str):
+    """
+    Yields (id, query) pairs. JSONL lines must have a "query" field and may have
+    an "id"; any other line is taken as a plain-text query. Lines without an id
+    are numbered by their position in the file.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            if isinstance(record, dict) and 'query' in record:
+                yield str(record.get('id', line_number)), record['query']
+            else:
+                yield str(line_number), line
+
+
+def completed_ids(output_path: str) -> set:
+    """The output file doubles as the checkpoint: every id already written is skipped on resume."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)['id'])
+            except (json.JSONDecodeError, KeyError):
+                # A torn last line from an interrupted run; that query is simply redone.
+                continue
+    return done
+
+
+def run(input_path: str, output_path: str, chunk_size: int, concurrency: int, top_k: int | None):
+    done = completed_ids(output_path)
+    pending = [(qid, query) for qid, query in read_queries(input_path) if qid not in done]
+    total = len(pending) + len(done)
+    print(f"{len(done)} of {total} queries already ranked; {len(pending)} to go.", file=sys.stderr)
+
+    start = time.perf_counter()
+    processed = 0
+    with open(output_path, 'a', encoding='utf-8') as out:
+        for offset in range(0, len(pending), chunk_size):
+            chunk = pending[offset:offset + chunk_size]
+            results = tools.rank_frameworks_batch([query for _, query in chunk], concurrency=concurrency, top_k=top_k)
+            for (qid, query), result in zip(chunk, results):
+                record = {
+                    'id': qid,
+                    'query': query,
+                    'analysis': result['analysis'],
+                    'ranked': [{'name': f.get('name'), 'score': f['score']} for f in result['ranked']],
+                }
+                out.write(json.dumps(record) + '\n')
+            # Flushing per chunk is what makes the run resumable.
+            out.flush()
+            os.fsync(out.fileno())
+
+            processed += len(chunk)
+            elapsed = time.perf_counter() - start
+            rate = processed / elapsed if elapsed else 0.0
+            remaining = (len(pending) - processed) / rate if rate else 0.0
+            print(f"  > {len(done) + processed}/{total} ranked ({rate:.1f} queries/s, ~{remaining:.0f}s left)", file=sys.stderr)
+
+    print(f"Done. Results in {output_path}. Query cache: {tools.query_cache.stats()}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    # To run: `python scripts/rank_batch.py queries.jsonl ranked.jsonl` from the project root.
+    # Re-running with the same output file resumes where the previous run stopped.
+    parser = argparse.ArgumentParser(description="Rank a file of decision queries against the framework catalog.")
+    parser.add_argument('input', help="JSONL with {\"id\", \"query\"} records, or one plain-text query per line.")
+    parser.add_argument('output', help="JSONL results file (appended to; also the resume checkpoint).")
+    parser.add_argument('--chunk-size', type=int, default=200, help="Queries ranked and checkpointed together.")
+    parser.add_argument('--concurrency', type=int, default=tools.ANALYSIS_BATCH_CONCURRENCY,
+                        help="Maximum query analyses in flight.")
+    parser.add_argument('--top-k', type=int, default=None, help="Only keep the best K frameworks per query.")
+    args = parser.parse_args()
+
+    if os.environ.get('GOOGLE_API_KEY'):
+        genai.configure(api_key=os.environ['GOOGLE_API_KEY'])
+    run(args.input, args.output, args.chunk_size, args.concurrency, args.top_k)
@@ -1,6 +1,9 @@
 import os
-import json
-import asyncio
+import sys
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import firestore
 import google.generativeai as genai
 from dotenv import load_dotenv
@@ -9,38 +12,58 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # --- Configuration ---
-# Ensure the GEMINI_API_KEY environment variable is set for embedding generation
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", os.environ.get("GOOGLE_API_KEY"))
-if not GEMINI_API_KEY:
-    print("FATAL: GEMINI_API_KEY or GOOGLE_API_KEY environment variable is not set.")
-    exit(1)
-
-# Configure the generative AI client
-genai.configure(api_key=GEMINI_API_KEY)
-
 # Path to the framework descriptions relative to the script execution directory
 DESCRIPTIONS_PATH = 'scripts/framework_descriptions'
 
+# Must match EMBEDDING_MODEL in services/orchestrator_agent/app/tools.py; the orchestrator
+# refuses an index built with a different model.
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+# Default location of the binary index; the orchestrator Dockerfile copies it into the image.
+DEFAULT_INDEX_PATH = 'services/orchestrator_agent/framework_index.bin'
+
+# Firestore allows at most 500 operations per batched write.
+MAX_BATCH_WRITES = 500
+
+# Share the index format and the offline stub embedder with the orchestrator.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'orchestrator_agent'))
+from app.embedding_index import EmbeddingIndex, content_hash, catalog_hash, write_index
+from app.fakes import StubEmbedder
+
+
+def with_retries(operation, description: str, attempts: int = 5, base_delay: float = 0.5):
+    """Runs `operation()` with jittered exponential backoff, re-raising after the last attempt."""
+    for attempt in range(1, attempts + 1):
+        try:
+            return operation()
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay = base_delay * (2 ** (attempt - 1)) * (0.5 + random.random())
+            print(f"  > RETRY {attempt}/{attempts - 1} for {description} in {delay:.1f}s. Error: {e}")
+            time.sleep(delay)
+
+
 def delete_all_frameworks(db: firestore.Client):
     """Deletes all documents in the 'frameworks' collection."""
     print("--- STARTING CLEANUP ---")
     frameworks_collection = db.collection('frameworks')
-    
+
     # Batch delete operation (Firestore limitation: max 500 in one batch)
     deleted_count = 0
     while True:
-        docs = frameworks_collection.limit(500).stream()
+        docs = frameworks_collection.limit(MAX_BATCH_WRITES).stream()
         deleted_batch_count = 0
         batch = db.batch()
-        
+
         for doc in docs:
             batch.delete(doc.reference)
             deleted_batch_count += 1
             deleted_count += 1
-            
+
         if deleted_batch_count == 0:
             break
-            
+
         batch.commit()
         print(f"  > Deleted {deleted_batch_count} documents in a batch.")
 
@@ -48,75 +71,196 @@ def delete_all_frameworks(db: firestore.Client):
     print("--- CLEANUP ENDED ---")
 
 
-def setup_embeddings():
+def load_descriptions(path: str) -> dict:
+    """Reads every markdown description, keyed by framework name (e.g. 'swot.md' -> 'swot')."""
+    descriptions = {}
+    for filename in sorted(os.listdir(path)):
+        if filename.endswith('.md'):
+            with open(os.path.join(path, filename), 'r', encoding='utf-8') as f:
+                descriptions[filename.replace('.md', '')] = f.read()
+    return descriptions
+
+
+def load_remote_state(db: firestore.Client) -> dict:
+    """Returns name -> {content_hash, embedding_model, embedding} for the documents already in Firestore."""
+    fields = ['name', 'content_hash', 'embedding_model', 'embedding']
+    remote = {}
+    for doc in db.collection('frameworks').select(fields).stream():
+        data = doc.to_dict() or {}
+        remote[data.get('name', doc.id)] = data
+    return remote
+
+
+def embed_all(embedder, texts: list, batch_size: int, concurrency: int) -> list:
     """
-    Initializes Firestore, deletes old data, reads framework definitions,
-    generates embeddings, and writes new data back to Firestore.
+    Embeds `texts` in batches of `batch_size`, with at most `concurrency` batch
+    requests in flight. Returns the vectors in input order.
     """
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    def embed_batch(batch):
+        result = with_retries(
+            lambda: embedder.embed_content(model=EMBEDDING_MODEL, content=batch, task_type="RETRIEVAL_DOCUMENT"),
+            f"embedding batch of {len(batch)}",
+        )
+        return result['embedding']
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = list(pool.map(embed_batch, batches))
+    return [vector for batch in results for vector in batch]
+
+
+def write_documents(db: firestore.Client, upserts: dict, deletions: list):
+    """Applies upserts and deletions through batched writes of up to 500 operations, with retries."""
+    collection = db.collection('frameworks')
+    operations = [('set', name, doc) for name, doc in upserts.items()] + [('delete', name, None) for name in deletions]
+    for start in range(0, len(operations), MAX_BATCH_WRITES):
+        chunk = operations[start:start + MAX_BATCH_WRITES]
+
+        def commit_chunk():
+            batch = db.batch()
+            for op, name, doc in chunk:
+                if op == 'set':
+                    # Use framework name as the document ID
+                    batch.set(collection.document(name), doc)
+                else:
+                    batch.delete(collection.document(name))
+            batch.commit()
+
+        with_retries(commit_chunk, f"batched write of {len(chunk)} documents")
+        print(f"  > Committed {len(chunk)} document writes in a batch.")
+
+
+def index_is_current(index_path: str, hashes: dict) -> bool:
+    """True when the index on disk was built with EMBEDDING_MODEL from exactly these descriptions."""
+    if not index_path or not os.path.exists(index_path):
+        return False
     try:
-        # Initialize Firestore client (relies on Application Default Credentials for local execution)
-        db = firestore.Client()
-        print("Firestore client initialized successfully.")
-    except Exception as e:
-        print(f"Error initializing Firestore client: {e}")
-        print("Ensure you are authenticated with 'gcloud auth application-default login'.")
-        return
+        index = EmbeddingIndex.open(index_path, expected_model=EMBEDDING_MODEL)
+    except Exception:
+        return False
+    return index.catalog_hash == catalog_hash(hashes)
 
-    # 1. Clean up existing data
-    delete_all_frameworks(db)
 
-    # 2. Process and add new embeddings
-    frameworks_collection = db.collection('frameworks')
+def setup_embeddings(db, embedder, index_path: str | None = DEFAULT_INDEX_PATH, index_dtype: str = "float32",
+                     full: bool = False, batch_size: int = 16, concurrency: int = 4, dry_run: bool = False):
+    """
+    Synchronizes the 'frameworks' collection (and the binary index) with the
+    markdown descriptions.
 
-    print("\n--- STARTING EMBEDDING GENERATION AND UPLOAD ---")
-    
+    By default only descriptions whose content hash or embedding model differs
+    from what Firestore holds are re-embedded, and documents for deleted files
+    are removed; a run with no changes makes no embedding calls and no writes.
+    `full=True` restores the original behaviour of deleting and re-embedding
+    everything.
+    """
     # Check if the descriptions path exists
     if not os.path.isdir(DESCRIPTIONS_PATH):
         print(f"FATAL: Descriptions path '{DESCRIPTIONS_PATH}' not found.")
         print("Please ensure this script is run from the root directory of the project.")
         return
 
-    # Iterate over the markdown files in the directory
-    for filename in os.listdir(DESCRIPTIONS_PATH):
-        if filename.endswith('.md'):
-            filepath = os.path.join(DESCRIPTIONS_PATH, filename)
-            
-            with open(filepath, 'r', encoding='utf-8') as f:
-                description = f.read()
-            
-            # Extract framework name from filename (e.g., 'swot_analysis.md' -> 'swot_analysis')
-            framework_name = filename.replace('.md', '')
-
-            print(f"Processing: {framework_name}...")
-            
-            try:
-                # Generate vector embedding for the description
-                # Using a highly-optimized model for embedding retrieval
-                result = genai.embed_content(
-                    model="models/embedding-001",
-                    content=description,
-                    task_type="RETRIEVAL_DOCUMENT"
-                )
-                embedding = result['embedding']
-    
-                # Create a new document in the 'frameworks' collection
-                framework_doc = {
-                    'name': framework_name,
-                    'description': description,
-                    'embedding': embedding
-                }
-                
-                # Use framework name as the document ID
-                frameworks_collection.document(framework_name).set(framework_doc)
-                print(f'  > SUCCESS: Added {framework_name} to Firestore.')
-
-            except Exception as e:
-                print(f'  > ERROR: Failed to generate embedding or upload for {framework_name}. Error: {e}')
-                continue
-
-    print("--- UPLOAD COMPLETE ---")
+    descriptions = load_descriptions(DESCRIPTIONS_PATH)
+    hashes = {name: content_hash(text) for name, text in descriptions.items()}
+
+    # 1. Work out what changed
+    if full:
+        if not dry_run:
+            delete_all_frameworks(db)
+        remote = {}
+    else:
+        remote = load_remote_state(db)
+
+    changed = [
+        name for name in descriptions
+        if remote.get(name, {}).get('content_hash') != hashes[name]
+        or remote.get(name, {}).get('embedding_model') != EMBEDDING_MODEL
+        or not remote.get(name, {}).get('embedding')
+    ]
+    removed = sorted(set(remote) - set(descriptions))
+    print(f"{len(descriptions)} descriptions: {len(changed)} new or changed, "
+          f"{len(descriptions) - len(changed)} unchanged, {len(removed)} removed.")
+
+    if dry_run:
+        for name in changed:
+            print(f"  > WOULD EMBED: {name}")
+        for name in removed:
+            print(f"  > WOULD DELETE: {name}")
+        return
+
+    # 2. Embed only what changed, in concurrent batches
+    upserts = {}
+    if changed:
+        print("\n--- STARTING EMBEDDING GENERATION ---")
+        start = time.perf_counter()
+        vectors = embed_all(embedder, [descriptions[name] for name in changed], batch_size, concurrency)
+        print(f"Embedded {len(changed)} descriptions in {time.perf_counter() - start:.2f}s.")
+        for name, embedding in zip(changed, vectors):
+            upserts[name] = {
+                'name': name,
+                'description': descriptions[name],
+                'embedding': embedding,
+                'embedding_model': EMBEDDING_MODEL,
+                'content_hash': hashes[name]
+            }
+
+    # 3. Write the delta back to Firestore
+    if upserts or removed:
+        print("\n--- STARTING UPLOAD ---")
+        write_documents(db, upserts, removed)
+        print("--- UPLOAD COMPLETE ---")
+    else:
+        print("Firestore is already up to date.")
+
+    # 4. Refresh the binary index if the catalog it describes has changed
+    if index_path:
+        if index_is_current(index_path, hashes):
+            print(f"Embedding index {index_path} is already up to date.")
+            return
+        names = sorted(descriptions)
+        vectors = [upserts[name]['embedding'] if name in upserts else remote[name]['embedding'] for name in names]
+        header = write_index(index_path, names, vectors, EMBEDDING_MODEL, hashes, dtype=index_dtype)
+        print(f"Wrote {header['dtype']} embedding index for {header['count']} frameworks "
+              f"(dim={header['dim']}, catalog hash {header['catalog_hash'][:12]}) to {index_path}")
+
 
 if __name__ == '__main__':
     # This script is intended to be run locally, not inside the ADK server process
-    # To run: `python setup_framework_embeddings.py` (ensure dependencies are installed)
-    setup_embeddings()
\ No newline at end of file
+    # To run: `python scripts/setup_framework_embeddings.py` from the project root (ensure dependencies are installed)
+    # To target the Firestore emulator, export FIRESTORE_EMULATOR_HOST (e.g. localhost:8080) before running.
+    parser = argparse.ArgumentParser(description="Embed the framework descriptions into Firestore and a binary index.")
+    parser.add_argument('--index-out', default=DEFAULT_INDEX_PATH, help="Where to write the binary embedding index.")
+    parser.add_argument('--index-dtype', choices=['float32', 'int8'], default='float32',
+                        help="int8 quantizes vectors to a quarter of the size.")
+    parser.add_argument('--no-index', action='store_true', help="Only update Firestore.")
+    parser.add_argument('--full', action='store_true', help="Delete every framework document and re-embed all descriptions.")
+    parser.add_argument('--batch-size', type=int, default=16, help="Descriptions per embedding request.")
+    parser.add_argument('--concurrency', type=int, default=4, help="Maximum embedding requests in flight.")
+    parser.add_argument('--embedder', choices=['gemini', 'stub'], default='gemini',
+                        help="'stub' uses deterministic offline vectors (for emulator and CI runs).")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would change without embedding or writing.")
+    args = parser.parse_args()
+
+    if args.embedder == 'gemini':
+        # Ensure the GEMINI_API_KEY environment variable is set for embedding generation
+        GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", os.environ.get("GOOGLE_API_KEY"))
+        if not GEMINI_API_KEY:
+            print("FATAL: GEMINI_API_KEY or GOOGLE_API_KEY environment variable is not set.")
+            exit(1)
+        # Configure the generative AI client
+        genai.configure(api_key=GEMINI_API_KEY)
+        embedder = genai
+    else:
+        embedder = StubEmbedder()
+
+    try:
+        # Initialize Firestore client (relies on Application Default Credentials for local execution)
+        db = firestore.Client()
+        print("Firestore client initialized successfully.")
+    except Exception as e:
+        print(f"Error initializing Firestore client: {e}")
+        print("Ensure you are authenticated with 'gcloud auth application-default login'.")
+        exit(1)
+
+    setup_embeddings(db, embedder, None if args.no_index else args.index_out, args.index_dtype,
+                     full=args.full, batch_size=args.batch_size, concurrency=args.concurrency, dry_run=args.dry_run)
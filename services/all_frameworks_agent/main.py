@@ -0,0 +1,18 @@
+"""
+One service hosting all ten framework agents, each under /<agent_name>, for
+deployments that would rather not run ten separate containers. Point the
+orchestrator's ALL_FRAMEWORKS_URL at it.
+"""
+import os
+
+import uvicorn
+
+from app.framework_host import FrameworkHost
+
+# Every agent is loaded at startup, so the container's single cold start covers all ten.
+agent_app = FrameworkHost()
+
+if __name__ == "__main__":
+    # Respect the PORT environment variable provided by Cloud Run.
+    port = int(os.environ.get("PORT", 8080))
+    uvicorn.run(agent_app, host="0.0.0.0", port=port)
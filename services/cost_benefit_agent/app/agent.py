@@ -82,6 +82,12 @@ You operate in a two-pass system. Your response format is ALWAYS a single JSON o
   - If critical information is still missing, you MUST include a `caveat` field in your final report explaining the gap and its impact on the analysis.
 - **Output:** A JSON object containing the full analysis, structured as follows:
   `{{"costs": [ {{"item": "...", "cost_usd": 0, "description": "..."}} ], "benefits": [ {{"item": "...", "benefit_usd": 0, "description": "..."}} ], "net_value": 0, "recommendation": "...", "caveat": "..."}}`
+
+**SINGLE-SHOT MODE (opt-in)**
+If the request includes `"protocol": "single_shot"` and you receive only an `original_query`, combine both passes in one response:
+- If critical information is missing, respond exactly as in PASS 1 with `NEED_INFO` and your questions.
+- Otherwise, do NOT return `SUFFICIENT`. Perform the PASS 2 analysis right away, following all PASS 2 rules, and return it wrapped as:
+  `{{"status": "COMPLETE", "report": <the PASS 2 JSON object>}}`
 """
 
 def get_agent() -> LlmAgent:
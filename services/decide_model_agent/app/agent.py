@@ -67,7 +67,7 @@ You operate in a two-pass system. Your response format is ALWAYS a single JSON o
 - **Input:** `original_query`
 - **Task:** Determine if you have enough information to begin the first three steps of the model (Define, Establish, Consider).
 - **Output:**
-  - If YES, return: `{\{\"status\": \"SUFFICIENT\", "questions": []}}`
+  - If YES, return: `{{"status": "SUFFICIENT", "questions": []}}`
   - If NO, generate up to 3 critical questions to clarify the goal, criteria, and potential options, and return:
     `{{"status": "NEED_INFO", "questions": ["Question for the 'Define' step?", "Question for the 'Establish' step?", "Question for the 'Consider' step?"]}}`
 
@@ -80,6 +80,12 @@ You operate in a two-pass system. Your response format is ALWAYS a single JSON o
   - If critical information is still missing, you MUST include a `caveat` field in your final report explaining the gap and its impact.
 - **Output:** A JSON object summarizing the outcome of each step and the final decision:
   `{{"D_define": "...", "E_establish": "...", "C_consider": "...", "I_identify": "...", "D_develop": "...", "E_evaluate": "...", "final_decision_point": "...", "caveat": "..."}}`
+
+**SINGLE-SHOT MODE (opt-in)**
+If the request includes `"protocol": "single_shot"` and you receive only an `original_query`, combine both passes in one response:
+- If critical information is missing, respond exactly as in PASS 1 with `NEED_INFO` and your questions.
+- Otherwise, do NOT return `SUFFICIENT`. Perform the PASS 2 analysis right away, following all PASS 2 rules, and return it wrapped as:
+  `{{"status": "COMPLETE", "report": <the PASS 2 JSON object>}}`
 """
 
 def get_agent() -> LlmAgent:
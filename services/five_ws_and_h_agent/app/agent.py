@@ -58,7 +58,7 @@ You operate in a two-pass system. Your response format is ALWAYS a single, valid
 When you receive an `original_query`, your primary task is to determine if you have enough information to fully address the Who, What, Where, When, Why, and How of the situation or decision.
 
 - If the information is sufficient, you MUST return the following JSON object:
-  `{\{\"status\": \"SUFFICIENT\", "questions": []}}`
+  `{{"status": "SUFFICIENT", "questions": []}}`
 
 - If the information is insufficient, you MUST generate up to 3 critical questions focusing on the most ambiguous or undefined W or H elements. Your response MUST be the following JSON object:
   `{{"status": "NEED_INFO", "questions": ["Question about the 'Who' or 'How'?", "Question 2?", "..."]}}`
@@ -71,6 +71,12 @@ When you receive a `shared_context` that includes `qa_answers`, you MUST perform
 - If you determine that critical information is still missing despite the Q&A, you MUST include a `caveat` field in your final report. This caveat should explain the information gap and its potential impact on the analysis.
 - Your final output MUST be a JSON object structured as follows:
   `{{"who": "...", "what": "...", "where": "...", "when": "...", "why": "...", "how": "...", "summary_action_plan": "...", "caveat": "(Optional) A statement about any remaining information gaps."}}`
+
+**SINGLE-SHOT MODE (opt-in)**
+If the request includes `"protocol": "single_shot"` and you receive only an `original_query`, combine both passes in one response:
+- If critical information is missing, respond exactly as in PASS 1 with `NEED_INFO` and your questions.
+- Otherwise, do NOT return `SUFFICIENT`. Perform the PASS 2 analysis right away, following all PASS 2 rules, and return it wrapped as:
+  `{{"status": "COMPLETE", "report": <the PASS 2 JSON object>}}`
 """
 
 def get_agent():
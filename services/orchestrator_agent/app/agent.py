@@ -1,87 +1,81 @@
 import os
+import copy
+import time
+import asyncio
 import logging
-import json
-from typing import AsyncGenerator, List, Dict, Any
+from typing import AsyncGenerator, Callable, List, Dict, Any, Optional
 
 from adk.agent import BaseAgent, LlmAgent, AgentTool, ParallelAgent
 from adk.agents.invocation_context import InvocationContext
 from adk.events import Event, UIMessage
 from . import tools
+from .digest import digest_report, merge_digests
+from .framework_host import IN_PROCESS_ORIGIN, in_process_url, mount_in_process_host
+from .frameworks import (ALL_FRAMEWORKS_URL_ENV_VAR, FRAMEWORK_AGENTS, agent_url, framework_agent_name, parse_selection,
+                         url_env_var)
+from .resilience import (QUORUM_DEADLINE_SECONDS, SYNTHESIS_QUORUM, CircuitBreaker, Fanout,
+                         call_with_resilience)
+from .prewarm import PrewarmScheduler
+from .remote_agent import RemoteFrameworkAgent
+from .qa import (QAState, build_question_form, collect_single_shot_reports, format_question_form, initialize_qa_state,
+                 is_skip_reply, parse_agent_result, parse_form_reply, qa_answers)
+from .speculation import (SPECULATIVE_PASS1, SPECULATIVE_PASS1_TOP_N, SPECULATIVE_PASS2, BackgroundRuns,
+                          SpeculationMetrics)
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# "auto" analyzes the top SELECTION_SIZE ranked frameworks right away; "user" lists the
+# ranking and lets the user pick on the next turn (speculative Pass 1 covers the wait).
+FRAMEWORK_SELECTION = os.environ.get("FRAMEWORK_SELECTION", "auto").lower()
+SELECTION_SIZE = 4
+
+# Ask framework agents to return the final report directly in Pass 1 when they
+# need no further information (status COMPLETE), skipping their Pass 2 round trip.
+SINGLE_SHOT_PROTOCOL = os.environ.get("SINGLE_SHOT_PROTOCOL", "false").lower() == "true"
+
+# "sequential" asks one question per turn; "batched" asks every agent's questions
+# in one form, with overlapping questions merged, and takes all answers in one reply.
+QA_MODE = os.environ.get("QA_MODE", "sequential").lower()
+
+# "pooled" calls the framework services through the shared keep-alive HTTP/2 client
+# (app/transport.py); "agent_tool" uses one ADK AgentTool per service; "in_process"
+# runs the framework agents inside this process (app/framework_host.py), falling
+# back to the pooled remote call for any agent that cannot be loaded locally.
+FRAMEWORK_TRANSPORT = os.environ.get("FRAMEWORK_TRANSPORT", "pooled").lower()
+
+# The state a background framework call reads: the query, the Q&A (Pass 2) and the protocol.
+BACKGROUND_RUN_KEYS = ["query", "qa_state", "protocol"]
+
 # --- Framework Agent Definitions ---
-def create_framework_agent_tools() -> List[AgentTool]:
+def create_framework_agent_tools() -> List[BaseAgent]:
     """
-    Creates and returns a list of AgentTool instances for all 10 framework agents,
-    relying exclusively on environment variables for service URLs.
+    Creates and returns the agents that call the 10 framework services (see
+    FRAMEWORK_TRANSPORT), relying exclusively on environment variables for
+    service URLs.
     """
-    frameworks = [
-        ("pros_cons_agent", "A specialized agent for performing a Pros and Cons analysis."),
-        ("swot_agent", "A specialized agent for performing a SWOT analysis."),
-        ("cost_benefit_agent", "A specialized agent for a Cost-Benefit analysis."),
-        ("weighted_matrix_agent", "A specialized agent for creating a Weighted Matrix to evaluate options."),
-        ("five_whys_agent", "A specialized agent for root-cause analysis using the 5 Whys technique."),
-        ("five_ws_and_h_agent", "A specialized agent for defining a situation using the 5 W's and H framework."),
-        ("ten_ten_ten_agent", "A specialized agent for evaluating decisions using the 10-10-10 Rule."),
-        ("decide_model_agent", "A specialized agent for structured decision-making using the DECIDE Model."),
-        ("kepner_tregoe_agent", "A specialized agent for systematic problem analysis using the Kepner-Tregoe method."),
-        ("rational_decision_making_agent", "A specialized agent for formalized, logical Rational Decision Making.")
-    ]
-    
+    hosted = set(mount_in_process_host().apps) if FRAMEWORK_TRANSPORT == "in_process" else set()
     agent_tools = []
-    for name, description in frameworks:
-        url_env_var = f"{name.upper()}_URL"
-        agent_url = os.environ.get(url_env_var)
-        
-        if agent_url:
+    for name, description in FRAMEWORK_AGENTS:
+        url = agent_url(name)
+
+        if name in hosted:
+            agent_tools.append(RemoteFrameworkAgent(name=name, description=description, url=in_process_url(name)))
+        elif url and FRAMEWORK_TRANSPORT in ("pooled", "in_process"):
+            agent_tools.append(RemoteFrameworkAgent(name=name, description=description, url=url))
+        elif url:
             agent_tools.append(AgentTool(
                 name=name,
                 description=description,
-                url=f"{agent_url}/run"
+                url=f"{url}/run"
             ))
         else:
-            logger.warning(f"Environment variable {url_env_var} not set. The '{name}' agent will be unavailable.")
+            logger.warning(f"Neither {url_env_var(name)} nor {ALL_FRAMEWORKS_URL_ENV_VAR} is set. "
+                           f"The '{name}' agent will be unavailable.")
             
     return agent_tools
 
-# --- Helper Functions for Q&A ---
-def _initialize_qa_state(ctx: InvocationContext):
-    """Reads Pass 1 results and sets up the initial state for the Q&A session."""
-    qa_state = {"agents_with_questions": [], "completed_agents": [], "current_question": None, "answers": {}}
-    selected_agents = ctx.session.state.get("selected_frameworks", [])
-    
-    for agent_name in selected_agents:
-        # ADK's ParallelAgent stores the final response content of each sub-agent in the session state
-        # with the agent's name as the key.
-        result_str = ctx.session.state.get(agent_name, '{}')
-        try:
-            result = json.loads(result_str)
-            if result.get("status") == "NEED_INFO" and result.get("questions"):
-                qa_state["agents_with_questions"].append({
-                    "name": agent_name,
-                    "questions": result["questions"],
-                    "question_index": 0
-                })
-                qa_state["answers"][agent_name] = []
-        except (json.JSONDecodeError, TypeError) as e:
-            logger.error(f"Could not parse result for {agent_name}: {result_str} - Error: {e}")
-
-    ctx.session.state["qa_state"] = qa_state
-    logger.info(f"Q&A state initialized: {qa_state}")
-
-def _get_next_question(qa_state: Dict[str, Any]) -> Dict[str, Any] | None:
-    """Finds the next agent with an unanswered question."""
-    if not qa_state.get("agents_with_questions"):
-        return None
-    
-    next_agent_to_ask = qa_state["agents_with_questions"][0]
-    question_text = next_agent_to_ask["questions"][next_agent_to_ask["question_index"]]
-    
-    return {"agent_name": next_agent_to_ask["name"], "question": question_text}
-
 # --- Custom Orchestrator Agent ---
 class OrchestratorAgent(BaseAgent):
     """
@@ -92,52 +86,257 @@ class OrchestratorAgent(BaseAgent):
         self.framework_agents_map = {agent.name: agent for agent in self.framework_agent_tools}
         self.synthesis_agent = LlmAgent(
             name="SynthesisAgent", model="gemini-2.5-pro",
-            instruction="You are a master analyst. Synthesize the reports from four different decision frameworks into a single, cohesive, and actionable recommendation. The reports will be in the session state key 'agent_reports'. Your output should follow the structure defined in the PRD."
+            instruction="You are a master analyst. Synthesize the reports from four different decision frameworks into a single, cohesive, and actionable recommendation. "
+                        "Work from the condensed brief in the session state key 'synthesis_brief': each framework's verdict, highlights and caveat, already extracted from its report. "
+                        "Consult the full reports in 'agent_reports' only where the brief marks a framework as incomplete or a detail is needed to resolve a conflict. "
+                        "Your output should follow the structure defined in the PRD."
         )
+        # Pass 1 runs that overlap the selection turn, and Pass 2 runs for SUFFICIENT
+        # agents that overlap the Q&A turns (see app/speculation.py).
+        self.speculative_pass1 = BackgroundRuns(lambda: tools.db, kind="pass1", label="Pass 1")
+        self.speculation_metrics = SpeculationMetrics()
+        self.background_reports = BackgroundRuns(lambda: tools.db, kind="pass2")
+        # Shared by every session, so a service that keeps failing is skipped everywhere.
+        self.circuit_breaker = CircuitBreaker()
+        # Warm-up probes for remote services that may have scaled to zero (see app/prewarm.py).
+        self.prewarm = PrewarmScheduler({
+            name: agent_url(name) for name, agent in self.framework_agents_map.items()
+            if agent_url(name) and not getattr(agent, "url", "").startswith(IN_PROCESS_ORIGIN)
+        })
         super().__init__(name="Orchestrator", sub_agents=self.framework_agent_tools + [self.synthesis_agent])
 
     @classmethod
     def from_init_params(cls, **kwargs):
         return cls()
 
+    async def _invoke_framework_agents(self, ctx: InvocationContext, agent_names: List[str], invoker_name: str,
+                                       pass_label: str) -> AsyncGenerator[Event, None]:
+        """
+        Runs the named framework agents in parallel; each result lands in the
+        session state under the agent's name. With a cassette (see tools.cassette)
+        the results are recorded, or replayed into the state without any HTTP call.
+        """
+        cassette = tools.cassette
+        answers = qa_answers(ctx.session.state.get("qa_state")) if pass_label == "pass2" else {}
+        requests = {
+            name: {"agent": name, "query": ctx.session.state.get("query", ""), "qa_answers": answers.get(name, [])}
+            for name in agent_names
+        }
+        if cassette.replaying:
+            entries = [cassette.lookup(f"agent.{pass_label}", requests[name]) for name in agent_names]
+            # The agents ran in parallel, so the group takes as long as its slowest member.
+            results = await asyncio.gather(*(cassette.replay_async(entry) for entry in entries))
+            for name, result in zip(agent_names, results):
+                ctx.session.state[name] = result
+            return
+
+        invoker = ParallelAgent(name=invoker_name, sub_agents=[self.framework_agents_map[name] for name in agent_names])
+        start = time.perf_counter()
+        async for event in invoker.run_async(ctx):
+            yield event
+        elapsed = time.perf_counter() - start
+        for name in agent_names:
+            cassette.record(f"agent.{pass_label}", requests[name], ctx.session.state.get(name), latency=elapsed)
+
+    def _start_runs(self, ctx: InvocationContext, agent_names: List[str], invoker_prefix: str, pass_label: str,
+                    background: Optional[BackgroundRuns] = None) -> Optional[Fanout]:
+        """
+        Starts one resilient call per agent (deadline, retries, circuit breaker;
+        see app/resilience.py) for `pass_label`. Without `background`, the calls
+        run on `ctx` and are returned as a `Fanout`, so that each result can be
+        handled as it lands instead of after the slowest agent. With it, they
+        run on a detached context (see `_detached_context`) and their results
+        are kept in `background` until a later turn collects them.
+        """
+        session_id = ctx.session.session_id
+
+        def make_run(name):
+            async def run(emit=None):
+                async def attempt():
+                    run_ctx = ctx if background is None else self._detached_context(ctx, BACKGROUND_RUN_KEYS)
+                    previous = run_ctx.session.state.get(name)
+                    async for event in self._invoke_framework_agents(run_ctx, [name], f"{invoker_prefix}_{name}", pass_label):
+                        if emit is not None:
+                            await emit(event)
+                    result = run_ctx.session.state.get(name)
+                    # An agent that wrote nothing leaves the previous pass's result in place.
+                    return None if result is previous else result
+                try:
+                    return await call_with_resilience(name, attempt, self.circuit_breaker)
+                finally:
+                    self._forget_sections(session_id, name)
+            return run
+
+        if background is not None:
+            for name in agent_names:
+                background.start(session_id, name, make_run(name))
+            return None
+        fanout = Fanout()
+        for name in agent_names:
+            fanout.start(name, make_run(name))
+        return fanout
+
+    async def _drain(self, ctx: InvocationContext, fanout: Fanout,
+                     on_result: Callable[[str], Optional[Event]] = lambda name: None,
+                     quorum_met: Callable[[], bool] = lambda: False,
+                     quorum_deadline: Optional[float] = None) -> AsyncGenerator[Event, None]:
+        """
+        Yields the fanout's events and calls `on_result(name)` for each agent
+        that delivered, yielding what it returns, if anything; agents that did not are listed in the session state under
+        'unavailable_agents'. With `quorum_deadline` (a time.monotonic() value),
+        stops waiting once that time has passed and `quorum_met()`, leaving the
+        remaining agents running in `fanout`.
+        """
+        while fanout.pending:
+            timeout = None
+            if quorum_deadline is not None:
+                timeout = max(0.0, quorum_deadline - time.monotonic())
+                if timeout == 0.0 and quorum_met():
+                    logger.info(f"[{self.name}] Quorum reached; not waiting for {fanout.pending}.")
+                    return
+                if timeout == 0.0:
+                    timeout = None
+            item = await fanout.next(timeout)
+            if item is None:
+                continue
+            kind, name, payload = item
+            if kind == "event":
+                yield payload
+            elif kind == "done":
+                event = on_result(name)
+                if event is not None:
+                    yield event
+            else:
+                logger.error(f"[{self.name}] {name} unavailable: {payload}")
+                unavailable = ctx.session.state.get("unavailable_agents", [])
+                if name not in unavailable:
+                    ctx.session.state["unavailable_agents"] = unavailable + [name]
+
+    def _ranked_agent_names(self, ranked_frameworks: List[Dict[str, Any]], warn: bool = True) -> List[str]:
+        """The agents for the ranked catalog frameworks, in rank order, skipping frameworks without an agent."""
+        names = []
+        for framework in ranked_frameworks:
+            name = framework_agent_name(framework["name"])
+            if name in self.framework_agents_map:
+                names.append(name)
+            elif warn:
+                logger.warning(f"[{self.name}] Ranked framework '{framework['name']}' has no agent '{name}'; skipping it.")
+        return names
+
+    @staticmethod
+    def _detached_context(ctx: InvocationContext, keys: List[str]) -> InvocationContext:
+        """
+        A shallow copy of `ctx` whose session has a private state holding only
+        `keys`, for a background run that outlives the turn: what the agent
+        writes stays in the copy (the run returns it to `collect`) instead of
+        landing in the session of a turn that has already been saved.
+        """
+        session = copy.copy(ctx.session)
+        session.state = {key: ctx.session.state[key] for key in keys if key in ctx.session.state}
+        detached = copy.copy(ctx)
+        detached.session = session
+        return detached
+
+    def _start_speculative_pass1(self, ctx: InvocationContext, agent_names: List[str]) -> None:
+        """Starts Pass 1 for the likely picks before the user has confirmed them."""
+        self._start_runs(ctx, agent_names, "Pass1Speculative", "pass1", self.speculative_pass1)
+        ctx.session.state["speculative_pass1"] = list(agent_names)
+        logger.info(f"[{self.name}] Started speculative Pass 1 for the top {len(agent_names)} frameworks: {agent_names}")
+
+    def _start_background_pass2(self, ctx: InvocationContext, agent_names: List[str]) -> None:
+        """
+        Starts Pass 2 for agents that need no answers, so that their reports are
+        ready by the time Q&A ends. Their events are not shown to the user.
+        """
+        self._start_runs(ctx, agent_names, "Pass2Background", "pass2", self.background_reports)
+        previous = ctx.session.state.get("speculative_pass2", [])
+        ctx.session.state["speculative_pass2"] = previous + [name for name in agent_names if name not in previous]
+        logger.info(f"[{self.name}] Started background Pass 2 for {len(agent_names)} sufficient agents: {agent_names}")
+
+    def _forget_sections(self, session_id: str, name: str) -> None:
+        """Once `name`'s call has settled, lets its next call show every report section again."""
+        forget = getattr(self.framework_agents_map.get(name), "forget_sections", None)
+        if forget is not None:
+            forget(session_id)
+
+    def _adopt_report_streams(self, ctx: InvocationContext, results: Dict[str, Optional[Dict[str, Any]]]) -> List[str]:
+        """
+        Hands the single-shot reports still streaming in after Pass 1 (see
+        RemoteFrameworkAgent.take_report_stream) to `background_reports`, so that
+        Phase 4 collects them like background Pass 2 reports. Returns those agents' names.
+        """
+        session_id = ctx.session.session_id
+        adopted = []
+        for name, result in results.items():
+            if not (result and result.get("report_streaming")):
+                continue
+            take = getattr(self.framework_agents_map.get(name), "take_report_stream", None)
+            task = take(session_id) if take else None
+            # Without its stream (e.g. a replayed or persisted result), the agent simply runs Pass 2.
+            if task is not None:
+                self.background_reports.start(session_id, name, lambda task=task: task)
+                adopted.append(name)
+        ctx.session.state["speculative_pass2"] = adopted
+        if adopted:
+            logger.info(f"[{self.name}] Single-shot reports still streaming from: {adopted}")
+        return adopted
+
     async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
         """
         Defines the explicit, code-driven workflow for FourSight.
         """
         # --- Check for ongoing Q&A session ---
         qa_state = ctx.session.state.get("qa_state")
-        if qa_state and qa_state.get("current_question"):
-            # If we are in a Q&A session, the user's message is an answer.
+        qa = QAState.from_dict(qa_state)
+        if qa and qa.form:
+            # The user's message answers the whole question form (QA_MODE=batched).
+            last_message = ctx.session.history.get_last_message()
+            reply = last_message.content.parts[0].text if last_message and last_message.content.parts else ""
+            ids = [group["id"] for group in qa.form]
+            skip = is_skip_reply(reply)
+            answers = {} if skip else parse_form_reply(reply, ids)
+            qa.apply_form(answers, finish=skip)
+            ctx.session.state["qa_state"] = qa.to_dict()
+            if qa.form:
+                # A partial or ambiguous reply: ask again for the items still open.
+                yield UIMessage(f"Thank you. {len(answers)} of {len(ids)} questions answered. "
+                                f"Please also answer these:\n\n{format_question_form(qa.form)}")
+                return
+            yield UIMessage(f"Thank you. {len(answers)} of {len(ids)} questions answered. Proceeding to final analysis.")
+            async for event in self._run_final_analysis(ctx):
+                yield event
+            return
+
+        if qa and not qa.complete:
+            # If we are in a Q&A session, the user's message answers the question at the cursor.
             last_message = ctx.session.history.get_last_message()
             answer = last_message.content.parts[0].text if last_message and last_message.content.parts else ""
-            
-            # Store the answer
-            current_q_info = qa_state["current_question"]
-            agent_name = current_q_info["agent_name"]
-            qa_state["answers"][agent_name].append({"q": current_q_info["question"], "a": answer})
-            
-            # Find the agent we just answered for and advance its index
-            for agent in qa_state["agents_with_questions"]:
-                if agent["name"] == agent_name:
-                    agent["question_index"] += 1
-                    # If all questions for this agent are answered, move it to completed
-                    if agent["question_index"] >= len(agent["questions"]):
-                        qa_state["completed_agents"].append(agent)
-                        qa_state["agents_with_questions"].pop(0)
-                    break
-            
+            qa.answer(answer)
+            ctx.session.state["qa_state"] = qa.to_dict()
+
             # Ask the next question or conclude
-            next_question = _get_next_question(qa_state)
+            next_question = qa.current()
             if next_question:
-                qa_state["current_question"] = next_question
-                ctx.session.state["qa_state"] = qa_state
                 yield UIMessage(f"Thank you. Next question from {next_question['agent_name']}:\n\n{next_question['question']}")
                 return
             else:
-                # Q&A is complete
-                ctx.session.state["qa_state"] = qa_state
                 yield UIMessage("Thank you. All questions have been answered. Proceeding to final analysis.")
-                # Fall through to Phase 4
+                async for event in self._run_final_analysis(ctx):
+                    yield event
+                return
+
+        # --- Framework selection reply (FRAMEWORK_SELECTION=user) ---
+        if ctx.session.state.get("awaiting_selection"):
+            last_message = ctx.session.history.get_last_message()
+            reply = last_message.content.parts[0].text if last_message and last_message.content.parts else ""
+            ranked_names = self._ranked_agent_names(ctx.session.state.get("ranked_frameworks", []), warn=False)
+            selected_agent_names = parse_selection(reply, ranked_names, SELECTION_SIZE)
+            ctx.session.state["awaiting_selection"] = False
+            ctx.session.state["selected_frameworks"] = selected_agent_names
+            yield UIMessage(f"Selection confirmed. Starting analysis with: {', '.join(selected_agent_names)}")
+            async for event in self._run_pass1_and_qa(ctx, selected_agent_names):
+                yield event
+            return
         
         # --- Start of Workflow ---
         if ctx.session.history.get_turn_count() > 1 and not qa_state:
@@ -152,60 +351,154 @@ class OrchestratorAgent(BaseAgent):
 
         query = initial_message.content.parts[0].text
         ctx.session.state["query"] = query
+        # The usual picks start waking up while the query is being ranked.
+        self.prewarm.on_query()
+        if SINGLE_SHOT_PROTOCOL:
+            # Framework agents read the shared session state; see their SINGLE-SHOT MODE instructions.
+            ctx.session.state["protocol"] = "single_shot"
         
-        # --- Phase 1: Ranking & Selection (Simplified) ---
-        ranked_frameworks = tools.rank_frameworks(query)
+        # --- Phase 1: Ranking & Selection ---
+        ranked_frameworks = await tools.rank_frameworks_async(query)
         ctx.session.state["ranked_frameworks"] = ranked_frameworks
-        top_4 = [f["name"] for f in ranked_frameworks[:4]]
-        selected_agent_names = top_4 # Placeholder for user selection
+        ranked_names = self._ranked_agent_names(ranked_frameworks)
+        self.prewarm.on_ranked(ranked_names)
+
+        if FRAMEWORK_SELECTION == "user":
+            # Pass 1 for the likely picks runs while the user is choosing.
+            if SPECULATIVE_PASS1:
+                self._start_speculative_pass1(ctx, ranked_names[:SPECULATIVE_PASS1_TOP_N])
+            ctx.session.state["awaiting_selection"] = True
+            # Numbered like `ranked_names`, which the reply's positions refer to.
+            scores = {framework_agent_name(f["name"]): f["score"] for f in ranked_frameworks}
+            options = "\n".join(
+                f"{i}. {name.removesuffix('_agent')} ({scores[name]:.2f})" for i, name in enumerate(ranked_names, start=1)
+            )
+            yield UIMessage(f"These frameworks best match your problem:\n\n{options}\n\n"
+                            f"Reply with up to {SELECTION_SIZE} numbers or names to choose, or 'ok' to use the top {SELECTION_SIZE}.")
+            return
+
+        selected_agent_names = ranked_names[:SELECTION_SIZE]
         ctx.session.state["selected_frameworks"] = selected_agent_names
         yield UIMessage(f"Selection confirmed. Starting analysis with: {', '.join(selected_agent_names)}")
+        async for event in self._run_pass1_and_qa(ctx, selected_agent_names):
+            yield event
 
+    async def _run_pass1_and_qa(self, ctx: InvocationContext, selected_agent_names: List[str]) -> AsyncGenerator[Event, None]:
+        """Phases 2 and 3, continuing into Phase 4 when no agent has questions."""
+        self.prewarm.record_selection(selected_agent_names)
         # --- Phase 2: Pass 1 - Information Sufficiency Analysis ---
-        selected_agents = [self.framework_agents_map[name] for name in selected_agent_names]
-        pass1_invoker = ParallelAgent(name="Pass1Invoker", sub_agents=selected_agents)
-        
-        logger.info(f"[{self.name}] Invoking Pass 1 for {len(selected_agents)} agents in parallel.")
-        async for event in pass1_invoker.run_async(ctx):
-            yield event
+        # Results of speculative runs for the chosen agents are reused; runs for
+        # agents that were not chosen are cancelled or thrown away.
+        speculative = ctx.session.state.get("speculative_pass1", [])
+        reused = {}
+        if speculative:
+            session_id = ctx.session.session_id
+            reused = await self.speculative_pass1.collect(session_id, [n for n in selected_agent_names if n in speculative])
+            discarded = self.speculative_pass1.discard(session_id, [n for n in speculative if n not in selected_agent_names])
+            for name, result in reused.items():
+                ctx.session.state[name] = result
+            ctx.session.state["speculative_pass1"] = []
+            ctx.session.state["speculation_metrics"] = self.speculation_metrics.observe(
+                speculative, selected_agent_names, list(reused), discarded, ctx.session.state.get("query", "")
+            )
+
+        remaining = [name for name in selected_agent_names if name not in reused]
+        if remaining:
+            logger.info(f"[{self.name}] Invoking Pass 1 for {len(remaining)} agents in parallel.")
+            async for event in self._drain(ctx, self._start_runs(ctx, remaining, "Pass1Invoker", "pass1")):
+                yield event
         logger.info(f"[{self.name}] Pass 1 invocation complete.")
 
+        # Agents that already delivered their report need no Pass 2.
+        # Each Pass 1 result is parsed once, for both the single-shot reports and the Q&A.
+        results = {name: parse_agent_result(ctx.session.state.get(name)) for name in selected_agent_names}
+        ctx.session.state["completed_in_pass1"] = collect_single_shot_reports(ctx, results)
+        streaming = self._adopt_report_streams(ctx, results)
+
         # --- Phase 3: Interactive Q&A Setup ---
-        _initialize_qa_state(ctx)
-        qa_state = ctx.session.state["qa_state"]
-        
-        next_question = _get_next_question(qa_state)
+        qa = initialize_qa_state(ctx, results)
+
+        next_question = qa.current()
         if next_question:
-            qa_state["current_question"] = next_question
-            ctx.session.state["qa_state"] = qa_state
+            if SPECULATIVE_PASS2:
+                asking = set(qa.agents)
+                done = set(ctx.session.state["completed_in_pass1"]) | set(streaming)
+                sufficient = [name for name in selected_agent_names if name not in asking and name not in done]
+                if sufficient:
+                    self._start_background_pass2(ctx, sufficient)
+            if QA_MODE == "batched":
+                questions = qa.pending()
+                form = build_question_form(questions, await tools.embed_texts_async([q["question"] for q in questions]))
+                qa.form = form
+                ctx.session.state["qa_state"] = qa.to_dict()
+                yield UIMessage(f"Initial analysis is complete. Some agents need more information to proceed.\n\n"
+                                f"Please answer these {len(form)} questions from the agents:\n\n{format_question_form(form)}")
+                return
             yield UIMessage(f"Initial analysis is complete. Some agents need more information to proceed.\n\nFirst question from {next_question['agent_name']}:\n\n{next_question['question']}")
             return
         else:
             yield UIMessage("Initial analysis is complete. All agents have sufficient information. Proceeding to final analysis.")
-            # Fall through to Phase 4
-            
+            async for event in self._run_final_analysis(ctx):
+                yield event
+
+    async def _run_final_analysis(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        """Phase 4: Pass 2 for every selected agent, then synthesis."""
         # --- Phase 4: Final Analysis & Synthesis ---
         logger.info(f"[{self.name}] Starting Phase 4: Final Analysis.")
         
         # 4a. Prepare the shared context for Pass 2
         shared_context = {
             "original_query": ctx.session.state.get("query", ""),
-            "qa_answers": ctx.session.state.get("qa_state", {}).get("answers", {})
+            "qa_answers": qa_answers(ctx.session.state.get("qa_state"))
         }
         # The ADK automatically passes the session state, but we could also
         # explicitly pass this context if needed. For now, the agents are
         # designed to read from the shared session state.
         
-        # 4b. Invoke agents for Pass 2 in parallel
+        # 4b. Collect the reports produced in the background during Q&A, then
+        # invoke Pass 2 in parallel for the agents that still need it. Each report
+        # is condensed into a digest as soon as it is available (the map step),
+        # so synthesis only merges digests once the last report lands.
         selected_agent_names = ctx.session.state.get("selected_frameworks", [])
-        selected_agents = [self.framework_agents_map[name] for name in selected_agent_names]
-        
-        pass2_invoker = ParallelAgent(name="Pass2Invoker", sub_agents=selected_agents)
-        
-        logger.info(f"[{self.name}] Invoking Pass 2 for {len(selected_agents)} agents in parallel.")
-        async for event in pass2_invoker.run_async(ctx):
-            yield event
-        logger.info(f"[{self.name}] Pass 2 invocation complete. All framework reports are in session state.")
+        digests: Dict[str, Dict[str, Any]] = {}
+
+        def digest(name: str) -> None:
+            digests[name] = digest_report(name, ctx.session.state.get(name))
+
+        speculative = ctx.session.state.get("speculative_pass2", [])
+        background = await self.background_reports.collect(ctx.session.session_id, speculative) if speculative else {}
+        for name, report in background.items():
+            ctx.session.state[name] = report
+            digest(name)
+        completed = set(ctx.session.state.get("completed_in_pass1", []))
+        for name in completed:
+            digest(name)
+        remaining = [name for name in selected_agent_names if name not in background and name not in completed]
+        if background:
+            logger.info(f"[{self.name}] Reused {len(background)} background Pass 2 reports: {list(background)}")
+        if completed:
+            logger.info(f"[{self.name}] Skipping Pass 2 for {len(completed)} single-shot agents: {sorted(completed)}")
+
+        def publish() -> None:
+            ctx.session.state["agent_reports"] = {name: ctx.session.state.get(name) for name in digests}
+            ctx.session.state["agent_digests"] = digests
+            # The reduce step: the brief the synthesis agent works from.
+            ctx.session.state["synthesis_brief"] = merge_digests(digests, selected_agent_names)
+
+        # Once the quorum deadline has passed, synthesis starts as soon as enough
+        # reports are in; the stragglers keep running and are added afterwards.
+        fanout = None
+        if remaining:
+            logger.info(f"[{self.name}] Invoking Pass 2 for {len(remaining)} agents in parallel.")
+            fanout = self._start_runs(ctx, remaining, "Pass2Invoker", "pass2")
+            quorum = min(SYNTHESIS_QUORUM, len(selected_agent_names))
+            quorum_deadline = time.monotonic() + QUORUM_DEADLINE_SECONDS if quorum else None
+            async for event in self._drain(ctx, fanout, on_result=digest, quorum_met=lambda: len(digests) >= quorum,
+                                           quorum_deadline=quorum_deadline):
+                yield event
+        publish()
+        logger.info(f"[{self.name}] Pass 2 invocation complete. {len(digests)} of {len(selected_agent_names)} "
+                    f"framework reports are in session state.")
         
         # 4c. Synthesize the final recommendation
         # The individual agent reports are now in the session state under their names.
@@ -213,15 +506,44 @@ class OrchestratorAgent(BaseAgent):
         # The synthesis agent's prompt tells it to look for the reports in the state.
         
         logger.info(f"[{self.name}] Invoking Synthesis Agent.")
-        async for event in self.synthesis_agent.run_async(ctx):
-            # Yield the final synthesized response to the user
-            yield event
-            
-        # The final response from the synthesis agent is the end of the workflow.
-        # We can also save this to the state for history.
-        final_recommendation = ctx.session.history.get_last_message()
-        if final_recommendation:
-            ctx.session.state["final_recommendation"] = final_recommendation.to_dict()
+        synthesis_request = {
+            "query": ctx.session.state.get("query", ""),
+            "reports": {name: ctx.session.state.get(name) for name in selected_agent_names},
+        }
+        if tools.cassette.replaying:
+            recorded = await tools.cassette.replay_async(tools.cassette.lookup("agent.synthesis", synthesis_request))
+            yield UIMessage(recorded["text"])
+            ctx.session.state["final_recommendation"] = recorded["final_recommendation"]
+        else:
+            start = time.perf_counter()
+            async for event in self.synthesis_agent.run_async(ctx):
+                # Yield the final synthesized response to the user
+                yield event
+
+            # The final response from the synthesis agent is the end of the workflow.
+            # We can also save this to the state for history.
+            final_recommendation = ctx.session.history.get_last_message()
+            if final_recommendation:
+                ctx.session.state["final_recommendation"] = final_recommendation.to_dict()
+                text = final_recommendation.content.parts[0].text if final_recommendation.content.parts else ""
+                tools.cassette.record("agent.synthesis", synthesis_request,
+                                      {"text": text, "final_recommendation": ctx.session.state["final_recommendation"]},
+                                      latency=time.perf_counter() - start)
+
+        # 4d. Reports that missed the quorum deadline are added as they arrive.
+        if fanout and fanout.pending:
+            def late_report(name: str) -> Event:
+                digest(name)
+                publish()
+                late = digests[name]
+                lines = [f"Late addition from {name}: {late['verdict'] or 'see the full report.'}"]
+                if late["caveat"]:
+                    lines.append(f"Caveat: {late['caveat']}")
+                return UIMessage("\n".join(lines))
+
+            async for event in self._drain(ctx, fanout, on_result=late_report):
+                yield event
+            publish()
 
         logger.info(f"[{self.name}] Workflow complete.")
 
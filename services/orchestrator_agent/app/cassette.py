@@ -0,0 +1,434 @@
+"""
+Record/replay of the orchestrator's external interactions.
+
+With CASSETTE_MODE=record every Gemini generation, embedding request,
+Firestore read/write and framework agent result that passes through the
+orchestrator is appended, with its latency, to a JSONL cassette
+(CASSETTE_PATH). With CASSETTE_MODE=replay the same workflow runs offline
+against that file: calls are matched by kind and request, in recorded order,
+and answered either immediately (CASSETTE_REPLAY_TIMING=fast) or after the
+recorded latency (=original). This makes a captured production session
+repeatable, so orchestrator changes can be profiled against identical inputs.
+
+A replayed read with no recording raises `CassetteMissError`; reads that are
+issued more often than recorded (e.g. an extra catalog refresh) reuse the last
+recorded answer. Writes are never sent anywhere during replay.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+MODES = ("off", "record", "replay")
+TIMINGS = ("fast", "original")
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when a call has no recorded counterpart."""
+
+
+class ReplayedCallError(RuntimeError):
+    """Re-raises, during replay, an exception that the recorded call raised."""
+
+
+def _encode(value: Any) -> Any:
+    """Makes Firestore and SDK values JSON-safe, keeping datetimes restorable."""
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, dict):
+        return {str(k): _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {"__datetime__"}:
+            return datetime.fromisoformat(value["__datetime__"])
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+def request_key(kind: str, request: Dict[str, Any]) -> str:
+    material = json.dumps(_encode(request), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{kind}\n{material}".encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    A JSONL cassette of recorded calls.
+
+    Args:
+        path: The cassette file; appended to when recording.
+        mode: "off", "record" or "replay".
+        timing: In replay, "fast" answers immediately and "original" waits
+            for the recorded latency of each call.
+    """
+
+    def __init__(self, path: str = "cassette.jsonl", mode: str = "off", timing: str = "fast"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}'. Expected one of {MODES}.")
+        if timing not in TIMINGS:
+            raise ValueError(f"Unknown replay timing '{timing}'. Expected one of {TIMINGS}.")
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._seq = 0
+        self._entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._cursors: Dict[Tuple[str, str], int] = {}
+        self._counters = {"recorded": 0, "replayed": 0, "repeated": 0, "misses": 0}
+        if mode == "replay":
+            self._load()
+        elif mode == "record":
+            self._file = open(path, "a", encoding="utf-8")
+            self._write({"cassette_version": CASSETTE_VERSION, "created_at": time.time()})
+
+    @classmethod
+    def from_env(cls) -> "Cassette":
+        mode = os.environ.get("CASSETTE_MODE", "off").lower()
+        cassette = cls(
+            path=os.environ.get("CASSETTE_PATH", "cassette.jsonl"),
+            mode=mode,
+            timing=os.environ.get("CASSETTE_REPLAY_TIMING", "fast").lower(),
+        )
+        if mode != "off":
+            logger.info(f"Cassette {mode} mode using {cassette.path}.")
+        return cassette
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if "cassette_version" in entry:
+                    if entry["cassette_version"] != CASSETTE_VERSION:
+                        raise ValueError(f"Unsupported cassette version: {entry['cassette_version']}")
+                    continue
+                self._entries.setdefault((entry["kind"], entry["key"]), []).append(entry)
+        logger.info(f"Loaded cassette {self.path} ({sum(len(v) for v in self._entries.values())} calls).")
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def record(self, kind: str, request: Dict[str, Any], response: Any = None, latency: float = 0.0,
+               error: Optional[BaseException] = None) -> None:
+        """Appends one call; a no-op unless recording."""
+        if not self.recording:
+            return
+        entry = {
+            "kind": kind,
+            "key": request_key(kind, request),
+            "offset": round(time.monotonic() - self._started, 6),
+            "latency": round(latency, 6),
+            "request": _encode(request),
+        }
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+        else:
+            entry["response"] = _encode(response)
+        with self._lock:
+            self._seq += 1
+            entry["seq"] = self._seq
+            self._write(entry)
+            self._counters["recorded"] += 1
+
+    def lookup(self, kind: str, request: Dict[str, Any], strict: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Returns the next recorded entry for this call, or the last one once they
+        are used up. Returns None (or raises `CassetteMissError` when `strict`)
+        if the call was never recorded.
+        """
+        slot = (kind, request_key(kind, request))
+        with self._lock:
+            entries = self._entries.get(slot)
+            if not entries:
+                self._counters["misses"] += 1
+                if strict:
+                    raise CassetteMissError(f"No recorded '{kind}' call matches {json.dumps(_encode(request))[:200]}")
+                return None
+            index = self._cursors.get(slot, 0)
+            if index >= len(entries):
+                self._counters["repeated"] += 1
+                index = len(entries) - 1
+            else:
+                self._counters["replayed"] += 1
+            self._cursors[slot] = index + 1
+            return entries[index]
+
+    def replay(self, entry: Optional[Dict[str, Any]], decode: Callable[[Any], Any] = lambda value: value) -> Any:
+        """Waits out the recorded latency if asked to, then returns or raises the recorded outcome."""
+        if entry is None:
+            return None
+        if self.timing == "original" and entry.get("latency"):
+            time.sleep(entry["latency"])
+        return self._outcome(entry, decode)
+
+    async def replay_async(self, entry: Optional[Dict[str, Any]], decode: Callable[[Any], Any] = lambda value: value) -> Any:
+        if entry is None:
+            return None
+        if self.timing == "original" and entry.get("latency"):
+            await asyncio.sleep(entry["latency"])
+        return self._outcome(entry, decode)
+
+    @staticmethod
+    def _outcome(entry: Dict[str, Any], decode: Callable[[Any], Any]) -> Any:
+        if "error" in entry:
+            raise ReplayedCallError(entry["error"])
+        return decode(_decode(entry.get("response")))
+
+    def call(self, kind: str, request: Dict[str, Any], fn: Callable[[], Any],
+             encode: Callable[[Any], Any] = lambda value: value, decode: Callable[[Any], Any] = lambda value: value,
+             strict: bool = True) -> Any:
+        """
+        Runs a blocking external call through the cassette: passes straight
+        through when off, records the outcome and latency when recording, and
+        answers from the recording when replaying.
+        """
+        if self.replaying:
+            return self.replay(self.lookup(kind, request, strict=strict), decode)
+        if not self.recording:
+            return fn()
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self.record(kind, request, latency=time.perf_counter() - start, error=e)
+            raise
+        self.record(kind, request, encode(result), latency=time.perf_counter() - start)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"mode": self.mode, "path": self.path, **self._counters}
+
+    def close(self) -> None:
+        if self.recording:
+            self._file.close()
+
+
+# --- Client wrappers ---
+
+class _RecordedResponse:
+    """Stands in for a `GenerateContentResponse`; the orchestrator only reads `.text`."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class CassetteModel:
+    """Wraps a `genai.GenerativeModel` (which may be None when replaying offline)."""
+
+    def __init__(self, model: Any, cassette: Cassette, model_name: str):
+        self._model = model
+        self._cassette = cassette
+        self.model_name = model_name
+
+    def generate_content(self, prompt: str, **kwargs) -> Any:
+        return self._cassette.call(
+            "gemini.generate_content",
+            {"model": self.model_name, "prompt": prompt},
+            lambda: self._model.generate_content(prompt, **kwargs),
+            encode=lambda response: {"text": response.text},
+            decode=lambda data: _RecordedResponse(data["text"]),
+        )
+
+
+class CassetteEmbedder:
+    """Wraps the `genai` module's `embed_content`; every other attribute passes through."""
+
+    def __init__(self, genai_module: Any, cassette: Cassette):
+        self._genai = genai_module
+        self._cassette = cassette
+
+    def embed_content(self, model: str, content, task_type: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        return self._cassette.call(
+            "gemini.embed_content",
+            {"model": model, "content": content, "task_type": task_type},
+            lambda: self._genai.embed_content(model=model, content=content, task_type=task_type, **kwargs),
+            encode=lambda result: {"embedding": result["embedding"]},
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._genai, name)
+
+
+class _RecordedSnapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]], reference: "_CassetteDocument"):
+        self.id = doc_id
+        self._data = data
+        self.reference = reference
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return self._data
+
+
+class _InertWatch:
+    """Replay has no change feed; the catalog falls back to its TTL."""
+
+    def unsubscribe(self) -> None:
+        pass
+
+
+class _CassetteQuery:
+    def __init__(self, client: "CassetteFirestoreClient", path: Tuple[str, ...],
+                 fields: Optional[List[str]] = None, limit: Optional[int] = None):
+        self._client = client
+        self._path = path
+        self._fields = fields
+        self._limit = limit
+
+    @property
+    def id(self) -> str:
+        return self._path[-1]
+
+    def select(self, field_paths: List[str]) -> "_CassetteQuery":
+        return _CassetteQuery(self._client, self._path, list(field_paths), self._limit)
+
+    def limit(self, count: int) -> "_CassetteQuery":
+        return _CassetteQuery(self._client, self._path, self._fields, count)
+
+    def document(self, doc_id: str) -> "_CassetteDocument":
+        return _CassetteDocument(self._client, self._path + (doc_id,))
+
+    def _real(self) -> Any:
+        query = self._client._resolve(self._path)
+        if self._fields is not None:
+            query = query.select(self._fields)
+        if self._limit is not None:
+            query = query.limit(self._limit)
+        return query
+
+    def stream(self):
+        rows = self._client._cassette.call(
+            "firestore.stream",
+            {"path": "/".join(self._path), "fields": self._fields, "limit": self._limit},
+            lambda: [{"id": doc.id, "data": doc.to_dict()} for doc in self._real().stream()],
+        )
+        return iter([_RecordedSnapshot(row["id"], row["data"], self.document(row["id"])) for row in rows])
+
+    def on_snapshot(self, callback: Callable) -> Any:
+        if self._client._cassette.replaying:
+            return _InertWatch()
+        return self._real().on_snapshot(callback)
+
+
+class _CassetteDocument:
+    def __init__(self, client: "CassetteFirestoreClient", path: Tuple[str, ...]):
+        self._client = client
+        self._path = path
+
+    @property
+    def id(self) -> str:
+        return self._path[-1]
+
+    def collection(self, name: str) -> _CassetteQuery:
+        return _CassetteQuery(self._client, self._path + (name,))
+
+    def get(self) -> _RecordedSnapshot:
+        def read():
+            snapshot = self._client._resolve(self._path).get()
+            return {"data": snapshot.to_dict() if snapshot.exists else None}
+
+        data = self._client._cassette.call("firestore.get", {"path": "/".join(self._path)}, read)
+        return _RecordedSnapshot(self.id, data["data"], self)
+
+    def _write(self, op: str, data: Optional[Dict[str, Any]], fn: Callable[[], Any], **options) -> None:
+        request = {"op": op, "path": "/".join(self._path), "data": data, **options}
+        self._client._cassette.call("firestore.write", request, fn, encode=lambda _: None, strict=False)
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        self._write("set", data, lambda: self._client._resolve(self._path).set(data, merge=merge), merge=merge)
+
+    def update(self, data: Dict[str, Any]) -> None:
+        self._write("update", data, lambda: self._client._resolve(self._path).update(data))
+
+    def delete(self) -> None:
+        self._write("delete", None, lambda: self._client._resolve(self._path).delete())
+
+
+class _CassetteBatch:
+    def __init__(self, client: "CassetteFirestoreClient"):
+        self._client = client
+        self._ops: List[Tuple[str, _CassetteDocument, Optional[Dict[str, Any]], Dict[str, Any]]] = []
+
+    def set(self, reference: _CassetteDocument, data: Dict[str, Any], merge: bool = False) -> None:
+        self._ops.append(("set", reference, data, {"merge": merge}))
+
+    def update(self, reference: _CassetteDocument, data: Dict[str, Any]) -> None:
+        self._ops.append(("update", reference, data, {}))
+
+    def delete(self, reference: _CassetteDocument) -> None:
+        self._ops.append(("delete", reference, None, {}))
+
+    def commit(self) -> None:
+        def commit_real():
+            batch = self._client._real.batch()
+            for op, reference, data, options in self._ops:
+                target = self._client._resolve(reference._path)
+                if op == "delete":
+                    batch.delete(target)
+                elif op == "update":
+                    batch.update(target, data)
+                else:
+                    batch.set(target, data, **options)
+            batch.commit()
+
+        request = {"ops": [{"op": op, "path": "/".join(ref._path), "data": data} for op, ref, data, _ in self._ops]}
+        self._client._cassette.call("firestore.batch_commit", request, commit_real, encode=lambda _: None, strict=False)
+
+
+class CassetteFirestoreClient:
+    """
+    Wraps a `firestore.Client` for the subset of the API the orchestrator uses.
+    In replay mode the wrapped client may be None.
+    """
+
+    def __init__(self, client: Any, cassette: Cassette):
+        self._real = client
+        self._cassette = cassette
+
+    def collection(self, name: str) -> _CassetteQuery:
+        return _CassetteQuery(self, (name,))
+
+    def batch(self) -> _CassetteBatch:
+        return _CassetteBatch(self)
+
+    def _resolve(self, path: Tuple[str, ...]) -> Any:
+        if self._real is None:
+            raise ConnectionError("Firestore client not available.")
+        target = self._real
+        for i, segment in enumerate(path):
+            target = target.collection(segment) if i % 2 == 0 else target.document(segment)
+        return target
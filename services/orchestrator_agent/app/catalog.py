@@ -0,0 +1,229 @@
+"""
+In-process cache of the `frameworks` Firestore collection.
+
+`rank_frameworks` needs the framework metadata on every query, but the catalog
+only changes when `scripts/setup_framework_embeddings.py` is re-run. The
+`FrameworkCatalog` loads a projection of the collection once, keeps it fresh
+with either a TTL or a Firestore snapshot listener, and keeps serving the last
+good copy while a refresh is in flight or when Firestore is unavailable.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# The only fields read by the multi-criteria scoring. The full markdown
+# description is deliberately left out of the projection.
+CATALOG_FIELDS = [
+    "name", "embedding", "embedding_model", "content_hash", "complexity", "data_focus", "speed",
+    "type", "stakeholders", "focus",
+]
+
+DEFAULT_TTL_SECONDS = float(os.environ.get("CATALOG_TTL_SECONDS", "300"))
+DEFAULT_LOAD_TIMEOUT_SECONDS = float(os.environ.get("CATALOG_LOAD_TIMEOUT_SECONDS", "10"))
+
+
+class FrameworkCatalog:
+    """
+    Thread-safe, stale-while-revalidate cache of the framework catalog.
+
+    Args:
+        client_factory: Callable returning a Firestore client (or a
+            `fakes.FakeFirestoreClient`). Called lazily so that the cache can be
+            constructed at import time.
+        collection: Name of the Firestore collection holding the frameworks.
+        ttl_seconds: Age after which a refresh is triggered. Ignored while a
+            snapshot listener is attached.
+        use_listener: Attach a Firestore `on_snapshot` listener so that writes
+            to the collection invalidate the cache immediately.
+        load_timeout_seconds: How long a caller with no cached data at all will
+            wait for the first load before giving up.
+        fields: Projection to load; defaults to `CATALOG_FIELDS`.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        collection: str = "frameworks",
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        use_listener: bool = False,
+        load_timeout_seconds: float = DEFAULT_LOAD_TIMEOUT_SECONDS,
+        fields: Optional[List[str]] = None,
+    ):
+        self._client_factory = client_factory
+        self._collection = collection
+        self._ttl = ttl_seconds
+        self._use_listener = use_listener
+        self._load_timeout = load_timeout_seconds
+        self._fields = list(fields or CATALOG_FIELDS)
+
+        self._lock = threading.Lock()
+        self._listener_lock = threading.Lock()
+        self._frameworks: Optional[List[Dict[str, Any]]] = None
+        self._loaded_at = 0.0
+        self._version = 0
+        self._refreshing: Optional[threading.Thread] = None
+        # Set when the load attempt in `_refreshing` ends, whether or not it succeeded.
+        self._refresh_done = threading.Event()
+        self._watch = None
+        self._on_refresh: List[Callable[[List[Dict[str, Any]], int], None]] = []
+        self._counters = {
+            "hits": 0, "misses": 0, "stale_hits": 0,
+            "refreshes": 0, "refresh_errors": 0, "invalidations": 0,
+        }
+
+    # --- Public API ---
+
+    def get(self) -> List[Dict[str, Any]]:
+        """
+        Returns the cached catalog. Never blocks on Firestore when a previous
+        copy exists; an expired copy is returned while a background refresh runs.
+
+        Raises:
+            ConnectionError: If the catalog has never been loaded and the first
+                load fails or times out.
+        """
+        self._ensure_listener()
+        with self._lock:
+            frameworks = self._frameworks
+            expired = self._is_expired()
+            if frameworks is not None:
+                self._counters["stale_hits" if expired else "hits"] += 1
+            else:
+                self._counters["misses"] += 1
+
+        if frameworks is None:
+            done = self._start_refresh()
+            if not done.wait(self._load_timeout):
+                raise ConnectionError(f"Timed out loading the '{self._collection}' catalog from Firestore.")
+            with self._lock:
+                frameworks = self._frameworks
+            if frameworks is None:
+                raise ConnectionError(f"Failed to load the '{self._collection}' catalog from Firestore.")
+        elif expired:
+            self._start_refresh()
+
+        return frameworks
+
+    @property
+    def version(self) -> int:
+        """Monotonic counter that increases every time new catalog data is installed."""
+        return self._version
+
+    def invalidate(self) -> None:
+        """Marks the cached copy as expired; the next `get()` triggers a refresh."""
+        with self._lock:
+            self._loaded_at = 0.0
+            self._counters["invalidations"] += 1
+
+    def refresh(self) -> None:
+        """Synchronously reloads the catalog from Firestore."""
+        self._load()
+
+    def set_fields(self, fields: List[str]) -> None:
+        """Changes the projection loaded from now on; call `refresh()` to reload with it right away."""
+        with self._lock:
+            self._fields = list(fields)
+            self._loaded_at = 0.0
+
+    def add_refresh_callback(self, callback: Callable[[List[Dict[str, Any]], int], None]) -> None:
+        """Registers `callback(frameworks, version)` to run whenever new data is installed."""
+        self._on_refresh.append(callback)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss/refresh counters plus the current cache age."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["size"] = len(self._frameworks) if self._frameworks is not None else 0
+            stats["version"] = self._version
+            stats["age_seconds"] = round(time.monotonic() - self._loaded_at, 3) if self._loaded_at else None
+            stats["listener_attached"] = self._watch is not None
+        return stats
+
+    def close(self) -> None:
+        """Detaches the snapshot listener, if any."""
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    # --- Internals ---
+
+    def _is_expired(self) -> bool:
+        if self._watch is not None and self._loaded_at:
+            return False
+        return (time.monotonic() - self._loaded_at) >= self._ttl
+
+    def _start_refresh(self) -> threading.Event:
+        """Starts a load unless one is in flight; returns the event set when that load ends."""
+        with self._lock:
+            if self._refreshing is not None and self._refreshing.is_alive():
+                return self._refresh_done
+            # A fresh event per attempt: callers waiting on an earlier attempt are not reset.
+            done = threading.Event()
+            self._refresh_done = done
+            self._refreshing = threading.Thread(target=self._load_quietly, args=(done,), name="catalog-refresh",
+                                                daemon=True)
+            self._refreshing.start()
+        return done
+
+    def _load_quietly(self, done: threading.Event) -> None:
+        try:
+            self._load()
+        except Exception as e:
+            logger.warning(f"Catalog refresh failed, continuing to serve cached copy: {e}")
+        finally:
+            # Set after `_install` has run the callbacks, which may reload the catalog (e.g. with
+            # another projection) before a first-load waiter reads it; and on failure, so that
+            # waiters fail fast.
+            done.set()
+
+    def _load(self) -> None:
+        try:
+            client = self._client_factory()
+            if client is None:
+                raise ConnectionError("Firestore client not available.")
+            query = client.collection(self._collection).select(self._fields)
+            frameworks = [doc.to_dict() or {} for doc in query.stream()]
+        except Exception:
+            with self._lock:
+                self._counters["refresh_errors"] += 1
+            raise
+        self._install(frameworks)
+
+    def _install(self, frameworks: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._frameworks = frameworks
+            self._loaded_at = time.monotonic()
+            self._version += 1
+            self._counters["refreshes"] += 1
+            version = self._version
+        logger.info(f"Framework catalog v{version} loaded ({len(frameworks)} frameworks).")
+        for callback in self._on_refresh:
+            try:
+                callback(frameworks, version)
+            except Exception as e:
+                logger.error(f"Catalog refresh callback failed: {e}")
+
+    def _ensure_listener(self) -> None:
+        if not self._use_listener or self._watch is not None:
+            return
+        with self._listener_lock:
+            if self._watch is not None:
+                return
+            try:
+                client = self._client_factory()
+                self._watch = client.collection(self._collection).on_snapshot(self._on_snapshot)
+            except Exception as e:
+                logger.warning(f"Could not attach catalog snapshot listener, falling back to TTL refresh: {e}")
+                self._use_listener = False
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        # Listener snapshots carry full documents; apply the same projection.
+        frameworks = []
+        for doc in docs:
+            data = doc.to_dict() or {}
+            frameworks.append({k: v for k, v in data.items() if k in self._fields})
+        self._install(frameworks)
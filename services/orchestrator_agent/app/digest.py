@@ -0,0 +1,206 @@
+"""
+Condenses framework reports for synthesis (the map step of map-reduce).
+
+Each Pass 2 report is reduced to a small, framework-neutral digest as soon as
+it arrives: the framework's verdict, the key findings of each section, and its
+caveat. `merge_digests` then combines the digests into the brief that the
+SynthesisAgent reads, so the final LLM step only has to reconcile a few
+hundred words instead of four full reports.
+
+Findings are extracted from the report's structure rather than cut to a
+length (`extract_findings`):
+
+- items with a quantity (costs, benefits, option scores, criterion weights)
+  are ranked by it, largest first, and kept with their numbers;
+- in a chain of whys, the root cause comes first;
+- prose keeps its topic sentence and the most informative other sentence
+  (figures, causes, risks, recommendations), as whole sentences;
+- list entries keep their first sentence.
+
+Digests are built deterministically, without an LLM call, so producing them
+costs no extra round trip. The same extraction turns each report section into
+a progress line for the user while Pass 2 is still streaming (`format_section`).
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+# Report fields holding a framework's bottom line, in order of preference.
+VERDICT_KEYS = (
+    "recommendation",
+    "synthesized_recommendation",
+    "final_risk_mitigated_decision",
+    "final_justified_choice",
+    "final_decision_point",
+    "summary_action_plan",
+    "winning_option",
+)
+# Report fields not worth a progress line of their own.
+SECTION_SKIP_KEYS = ("framework",)
+MAX_ITEMS_PER_FIELD = 3
+MAX_TEXT_CHARS = 240
+# Fields naming an item in a list of objects, and fields describing it, in order of preference.
+LABEL_KEYS = ("item", "option", "name")
+TEXT_KEYS = ("answer", "description", "breakdown")
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+# Marks a sentence that carries a finding rather than framing: a figure, a cause, a risk, a call to action.
+_SIGNAL = re.compile(r"\d|%|\$|\b(because|due to|root cause|therefore|risk|cost|saves?|loses?|must|should|"
+                     r"recommend\w*|critical|key|main|primary|biggest|largest)\b", re.IGNORECASE)
+
+
+def parse_report(report: Any) -> Optional[Dict[str, Any]]:
+    """Returns a report as a dict, accepting JSON text with or without a ```json fence."""
+    if isinstance(report, dict):
+        return report
+    if not isinstance(report, str):
+        return None
+    text = report.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.startswith("json"):
+            text = text[4:]
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def _shorten(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= MAX_TEXT_CHARS else text[:MAX_TEXT_CHARS - 1].rstrip() + "…"
+
+
+def _sentences(text: str) -> List[str]:
+    return [sentence for sentence in _SENTENCE_BREAK.split(" ".join(text.split())) if sentence]
+
+
+def _key_sentences(text: str) -> str:
+    """The topic sentence plus the other sentence with the most signal, whole, in their original order."""
+    text = " ".join(text.split())
+    if len(text) <= MAX_TEXT_CHARS:
+        return text
+    sentences = _sentences(text)
+    picked = [0]
+    scored = [(len(_SIGNAL.findall(sentence)), -i) for i, sentence in enumerate(sentences) if i]
+    if scored and max(scored)[0]:
+        picked.append(-max(scored)[1])
+    finding = " ".join(sentences[i] for i in sorted(picked))
+    if len(finding) > MAX_TEXT_CHARS:
+        finding = sentences[0]
+    # Only a single sentence longer than the budget is still cut.
+    return _shorten(finding)
+
+
+def _quantity_key(items: List[Dict[str, Any]]) -> Optional[str]:
+    """The numeric field every item has (e.g. 'cost_usd', 'score'), if any."""
+    for key, value in items[0].items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and key != "why_number" and all(
+                isinstance(item.get(key), (int, float)) and not isinstance(item.get(key), bool) for item in items):
+            return key
+    return None
+
+
+def _item_finding(item: Dict[str, Any]) -> str:
+    """One object as 'label (field value, ...): first sentence of its description'."""
+    label = next((item[key] for key in LABEL_KEYS if isinstance(item.get(key), str) and item[key].strip()), None)
+    numbers = [f"{key.replace('_', ' ')} {value}" for key, value in item.items()
+               if isinstance(value, (int, float)) and not isinstance(value, bool) and key != "why_number"]
+    texts = [item[key] for key in TEXT_KEYS if isinstance(item.get(key), str) and item[key].strip()]
+    if not texts:
+        # e.g. a question without an answer.
+        texts = [value for value in item.values() if isinstance(value, str) and value.strip() and value is not label]
+    finding = label or (texts.pop(0) if texts else "")
+    if numbers:
+        finding += f" ({', '.join(numbers)})"
+    if texts:
+        finding += f": {_sentences(texts[0])[0]}"
+    return _shorten(finding)
+
+
+def extract_findings(value: Any) -> Any:
+    """The key findings of one report section (see the module docstring); scalars are kept as they are."""
+    if isinstance(value, str):
+        return _key_sentences(value)
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if isinstance(value, dict):
+        return _item_finding(value)
+    if isinstance(value, list):
+        items = [item for item in value if item not in (None, "", [], {})]
+        findings = []
+        if items and all(isinstance(item, dict) for item in items):
+            roots = [item for item in items if item.get("is_root_cause")]
+            if roots:
+                findings.append(_shorten(f"Root cause: {_item_finding(roots[-1])}"))
+                items = [item for item in items if item is not roots[-1]][-(MAX_ITEMS_PER_FIELD - 1):]
+            else:
+                quantity = _quantity_key(items)
+                if quantity:
+                    items = sorted(items, key=lambda item: -abs(item[quantity]))
+        for item in items[:MAX_ITEMS_PER_FIELD - len(findings)]:
+            if isinstance(item, str):
+                sentences = _sentences(item)
+                findings.append(_shorten(sentences[0]) if sentences else "")
+            else:
+                findings.append(extract_findings(item))
+        omitted = len(value) - len(findings)
+        if omitted > 0:
+            findings.append(f"(+{omitted} more)")
+        return findings
+    return _shorten(str(value))
+
+
+def format_section(agent_name: str, key: str, value: Any) -> Optional[str]:
+    """One condensed line for a report section that just arrived, or None if it is empty or skipped."""
+    if key in SECTION_SKIP_KEYS or value in (None, "", [], {}):
+        return None
+    condensed = extract_findings(value)
+    if isinstance(condensed, list):
+        condensed = "; ".join(str(item) for item in condensed)
+    return f"{agent_name} · {key.replace('_', ' ')}: {condensed}"
+
+
+def digest_report(agent_name: str, report: Any) -> Dict[str, Any]:
+    """
+    Builds the digest of one framework report.
+
+    Returns:
+        `{"framework", "verdict", "highlights", "caveat", "complete"}`, where
+        `highlights` maps each remaining section to its key findings and
+        `complete` is False when the report was missing or not valid JSON (the
+        raw text, shortened, is then the only highlight).
+    """
+    parsed = parse_report(report)
+    if parsed is None:
+        raw = report if isinstance(report, str) else ""
+        return {"framework": agent_name, "verdict": None, "highlights": {"raw": _shorten(raw)} if raw else {},
+                "caveat": "Report missing or unreadable.", "complete": False}
+
+    verdict = next((parsed[key] for key in VERDICT_KEYS if parsed.get(key)), None)
+    highlights = {
+        key: extract_findings(value)
+        for key, value in parsed.items()
+        if key not in VERDICT_KEYS and key != "caveat" and value not in (None, "", [], {})
+    }
+    caveat = parsed.get("caveat")
+    return {
+        "framework": agent_name,
+        "verdict": extract_findings(verdict) if verdict is not None else None,
+        "highlights": highlights,
+        "caveat": _shorten(caveat) if isinstance(caveat, str) and caveat.strip() else None,
+        "complete": True,
+    }
+
+
+def merge_digests(digests: Dict[str, Dict[str, Any]], order: List[str]) -> Dict[str, Any]:
+    """The reduce step: one brief over every framework's digest, in `order`."""
+    present = [name for name in order if name in digests]
+    return {
+        "frameworks": present,
+        "verdicts": {name: digests[name]["verdict"] for name in present if digests[name]["verdict"]},
+        "caveats": {name: digests[name]["caveat"] for name in present if digests[name]["caveat"]},
+        "incomplete": [name for name in order if name not in digests or not digests[name]["complete"]],
+        "digests": [digests[name] for name in present],
+    }
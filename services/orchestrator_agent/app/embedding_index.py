@@ -0,0 +1,195 @@
+"""
+Versioned binary index of framework description embeddings.
+
+`scripts/setup_framework_embeddings.py` writes this file next to the Firestore
+upload. The orchestrator memory-maps it at startup instead of downloading the
+float lists from Firestore, and refuses to use it if it was produced by a
+different embedding model than the one used for queries. Each vector records
+the `content_hash` of the description it was computed from; `stale_names`
+compares those with the catalog, so an index left behind by a catalog update
+is noticed instead of silently serving old embeddings.
+
+File layout (little-endian):
+
+    8 bytes    magic b"FSEMBIDX"
+    4 bytes    uint32 header length H
+    H bytes    UTF-8 JSON header (see `write_index`)
+    padding    to a 64-byte boundary
+    N*D        vectors, float32 (4 bytes each) or int8 (1 byte each), row-major
+    N*4        int8 only: float32 per-row dequantization scales
+
+Vectors are L2-normalized before they are written, so the float32 variant can
+be used for scoring without any copy.
+"""
+import hashlib
+import json
+import mmap
+import struct
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b"FSEMBIDX"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+SUPPORTED_DTYPES = ("float32", "int8")
+
+
+class IndexModelMismatchError(ValueError):
+    """Raised when an index was built with a different embedding model than expected."""
+
+
+def content_hash(text: str) -> str:
+    """Hash used to tie an embedding to the exact description it was computed from."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def catalog_hash(content_hashes: Dict[str, str]) -> str:
+    """Order-independent hash over every (name, content hash) pair in the index."""
+    material = "\n".join(f"{name}:{content_hashes[name]}" for name in sorted(content_hashes))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def write_index(path: str, names: Sequence[str], vectors: Sequence[Sequence[float]], model: str,
+                content_hashes: Dict[str, str], dtype: str = "float32") -> Dict:
+    """
+    Writes an index file and returns its header.
+
+    Args:
+        names: Framework names, one per vector.
+        vectors: Raw embeddings (any scale; they are normalized here).
+        model: The embedding model id that produced the vectors.
+        content_hashes: name -> `content_hash` of the embedded description.
+        dtype: "float32" or "int8" (symmetric per-row quantization).
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported index dtype '{dtype}'. Expected one of {SUPPORTED_DTYPES}.")
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] != len(names):
+        raise ValueError("Expected one embedding vector per framework name.")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = matrix / norms
+
+    scales = None
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        payload = np.round(matrix / scales[:, None]).astype(np.int8)
+    else:
+        payload = matrix
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "model": model,
+        "dim": int(matrix.shape[1]),
+        "count": int(matrix.shape[0]),
+        "dtype": dtype,
+        "names": list(names),
+        "content_hashes": {name: content_hashes[name] for name in names},
+        "catalog_hash": catalog_hash({name: content_hashes[name] for name in names}),
+        "vectors_sha256": hashlib.sha256(payload.tobytes()).hexdigest(),
+        "created_at": int(time.time()),
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    prefix_len = len(MAGIC) + 4 + len(header_bytes)
+    padding = (-prefix_len) % ALIGNMENT
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * padding)
+        f.write(payload.tobytes())
+        if scales is not None:
+            f.write(scales.astype(np.float32).tobytes())
+    return header
+
+
+class EmbeddingIndex:
+    """
+    A read-only, memory-mapped view of an index file.
+
+    Use `EmbeddingIndex.open(path, expected_model=...)`; the float32 matrix is a
+    zero-copy view over the mapping.
+    """
+
+    def __init__(self, header: Dict, matrix: np.ndarray, mapping: Optional[mmap.mmap] = None):
+        self.header = header
+        self.model: str = header["model"]
+        self.dim: int = header["dim"]
+        self.names: List[str] = header["names"]
+        self.content_hashes: Dict[str, str] = header["content_hashes"]
+        self.catalog_hash: str = header["catalog_hash"]
+        self.matrix = matrix
+        self._rows = {name: i for i, name in enumerate(self.names)}
+        self._mapping = mapping
+
+    @classmethod
+    def open(cls, path: str, expected_model: Optional[str] = None, verify: bool = False) -> "EmbeddingIndex":
+        """
+        Maps an index file into memory.
+
+        Raises:
+            ValueError: If the file is not a supported index or fails verification.
+            IndexModelMismatchError: If `expected_model` differs from the index's model.
+        """
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if mapping[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a framework embedding index.")
+        (header_len,) = struct.unpack_from("<I", mapping, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(mapping[header_start:header_start + header_len].decode("utf-8"))
+        if header.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format version: {header.get('format_version')}")
+        if expected_model and header["model"] != expected_model:
+            raise IndexModelMismatchError(
+                f"Index {path} was built with '{header['model']}' but queries use '{expected_model}'."
+            )
+
+        offset = header_start + header_len
+        offset += (-offset) % ALIGNMENT
+        count, dim, dtype = header["count"], header["dim"], header["dtype"]
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported index dtype '{dtype}'.")
+        payload = np.frombuffer(mapping, dtype=np.dtype(dtype), count=count * dim, offset=offset).reshape(count, dim)
+
+        if verify and hashlib.sha256(payload.tobytes()).hexdigest() != header["vectors_sha256"]:
+            raise ValueError(f"Vector checksum mismatch in {path}.")
+
+        if dtype == "int8":
+            scales_offset = offset + count * dim
+            scales = np.frombuffer(mapping, dtype=np.float32, count=count, offset=scales_offset)
+            matrix = payload.astype(np.float32) * scales[:, None]
+        else:
+            matrix = payload
+        return cls(header, matrix, mapping)
+
+    def vectors_for(self, names: Sequence[str]) -> np.ndarray:
+        """
+        Returns the rows for `names` in that order; names missing from the index
+        get a zero row. Returns the mapped matrix itself when the order matches.
+        """
+        if list(names) == self.names:
+            return self.matrix
+        rows = np.zeros((len(names), self.dim), dtype=np.float32)
+        for i, name in enumerate(names):
+            row = self._rows.get(name)
+            if row is not None:
+                rows[i] = self.matrix[row]
+        return rows
+
+    def matches_catalog(self, content_hashes: Dict[str, str]) -> bool:
+        """True when `content_hashes` (name -> the catalog's `content_hash`) is exactly the catalog this index was built from."""
+        return catalog_hash(content_hashes) == self.catalog_hash
+
+    def stale_names(self, content_hashes: Dict[str, str]) -> List[str]:
+        """Catalog names whose description hash is missing or differs from the one their vector was built from."""
+        return sorted(name for name, digest in content_hashes.items()
+                      if not digest or self.content_hashes.get(name) != digest)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._rows
@@ -0,0 +1,509 @@
+"""
+Local stand-ins for the external services the orchestrator talks to.
+
+These let the ranking pipeline run without Google Cloud credentials, e.g. in
+benchmarks or when exercising the catalog cache locally. They implement only
+the subset of the client APIs that this package actually uses.
+"""
+import copy
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+class FakeDocumentSnapshot:
+    """Mimics `google.cloud.firestore.DocumentSnapshot`."""
+
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]], reference: "FakeDocumentReference"):
+        self.id = doc_id
+        self._data = data
+        self.reference = reference
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    """Mimics `google.cloud.firestore.DocumentReference`."""
+
+    def __init__(self, collection: "FakeCollectionReference", doc_id: str):
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self) -> FakeDocumentSnapshot:
+        return FakeDocumentSnapshot(self.id, self._collection._docs.get(self.id), self)
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        with self._collection._client._lock:
+            if merge and self.id in self._collection._docs:
+                self._collection._docs[self.id].update(copy.deepcopy(data))
+            else:
+                self._collection._docs[self.id] = copy.deepcopy(data)
+        self._collection._notify()
+
+    def update(self, data: Dict[str, Any]) -> None:
+        """Applies top-level or dotted field paths ("state.`my-key`"); `DELETE_FIELD` removes a field."""
+        from .session_store import DELETE_FIELD
+
+        with self._collection._client._lock:
+            if self.id not in self._collection._docs:
+                raise KeyError(f"No document to update: {self._collection.id}/{self.id}")
+            doc = self._collection._docs[self.id]
+            for path, value in data.items():
+                parts = [p[1:-1].replace("\\`", "`").replace("\\\\", "\\") if p.startswith("`") else p
+                         for p in re.findall(r"`(?:[^`\\]|\\.)*`|[^.]+", path)]
+                target = doc
+                for part in parts[:-1]:
+                    target = target.setdefault(part, {})
+                if value is DELETE_FIELD:
+                    target.pop(parts[-1], None)
+                else:
+                    target[parts[-1]] = copy.deepcopy(value)
+        self._collection._notify()
+
+    def delete(self) -> None:
+        with self._collection._client._lock:
+            self._collection._docs.pop(self.id, None)
+        self._collection._notify()
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return self._collection._client.collection(f"{self._collection.id}/{self.id}/{name}")
+
+
+class FakeQuery:
+    """A projected or limited view over a fake collection."""
+
+    def __init__(self, collection: "FakeCollectionReference", fields: Optional[List[str]] = None, limit: Optional[int] = None):
+        self._collection = collection
+        self._fields = fields
+        self._limit = limit
+
+    def select(self, field_paths: List[str]) -> "FakeQuery":
+        return FakeQuery(self._collection, list(field_paths), self._limit)
+
+    def limit(self, count: int) -> "FakeQuery":
+        return FakeQuery(self._collection, self._fields, count)
+
+    def stream(self):
+        latency = self._collection._client.latency
+        if latency:
+            threading.Event().wait(latency)
+        return iter(self._snapshot())
+
+    def _snapshot(self) -> List[FakeDocumentSnapshot]:
+        with self._collection._client._lock:
+            items = list(self._collection._docs.items())
+        if self._limit is not None:
+            items = items[:self._limit]
+        snapshots = []
+        for doc_id, data in items:
+            if self._fields is not None:
+                data = {k: v for k, v in data.items() if k in self._fields}
+            snapshots.append(FakeDocumentSnapshot(doc_id, copy.deepcopy(data), self._collection.document(doc_id)))
+        return snapshots
+
+
+class FakeWatch:
+    """Handle returned by `on_snapshot`, mirroring `google.cloud.firestore_v1.watch.Watch`."""
+
+    def __init__(self, collection: "FakeCollectionReference", callback: Callable):
+        self._collection = collection
+        self._callback = callback
+
+    def unsubscribe(self) -> None:
+        if self._callback in self._collection._listeners:
+            self._collection._listeners.remove(self._callback)
+
+
+class FakeCollectionReference(FakeQuery):
+    """Mimics `google.cloud.firestore.CollectionReference`."""
+
+    def __init__(self, client: "FakeFirestoreClient", name: str):
+        self._client = client
+        self.id = name
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._listeners: List[Callable] = []
+        super().__init__(self)
+
+    def document(self, doc_id: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self, doc_id)
+
+    def on_snapshot(self, callback: Callable) -> FakeWatch:
+        self._listeners.append(callback)
+        callback(self._snapshot(), [], None)
+        return FakeWatch(self, callback)
+
+    def _notify(self) -> None:
+        for callback in list(self._listeners):
+            callback(self._snapshot(), [], None)
+
+
+class FakeWriteBatch:
+    """Mimics `google.cloud.firestore.WriteBatch`; operations apply on commit."""
+
+    def __init__(self):
+        self._ops: List[Callable[[], None]] = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._ops.append(lambda: reference.set(data, merge=merge))
+
+    def update(self, reference: FakeDocumentReference, data: Dict[str, Any]) -> None:
+        self._ops.append(lambda: reference.update(data))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self._ops.append(reference.delete)
+
+    def commit(self) -> None:
+        for op in self._ops:
+            op()
+        self._ops = []
+
+
+class FakeFirestoreClient:
+    """
+    An in-memory replacement for `firestore.Client`.
+
+    `latency` (seconds) is added to every collection stream, which is useful
+    for exercising the catalog cache's stale-while-revalidate path.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self._lock = threading.RLock()
+        self._collections: Dict[str, FakeCollectionReference] = {}
+        self.latency = latency
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollectionReference(self, name)
+            return self._collections[name]
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch()
+
+
+
+# Attribute values used by `make_fake_frameworks`; they mirror the labels that
+# `_analyze_query_characteristics` asks the LLM to produce.
+FAKE_ATTRIBUTE_VALUES = {
+    "complexity": ["low", "medium", "high"],
+    "data_focus": ["readily_available_data", "some_data", "limited_data"],
+    "speed": ["time_sensitive", "moderate_urgency", "not_time_sensitive"],
+    "type": ["heavy_quantitative_analysis", "some_quantitative_analysis", "mostly_qualitative_analysis"],
+    "stakeholders": ["multiple_stakeholders", "few_stakeholders", "individual_decision"],
+    "focus": ["strategic", "operational"],
+}
+
+
+def make_fake_frameworks(count: int, dim: int = 768, seed: int = 0) -> List[Dict[str, Any]]:
+    """Generates `count` synthetic framework documents with random embeddings and attributes."""
+    import random
+
+    rng = random.Random(seed)
+    frameworks = []
+    for i in range(count):
+        framework: Dict[str, Any] = {
+            "name": f"framework_{i:05d}",
+            "embedding": [rng.gauss(0.0, 1.0) for _ in range(dim)],
+        }
+        for attribute, values in FAKE_ATTRIBUTE_VALUES.items():
+            framework[attribute] = rng.sample(values, rng.randint(1, 2))
+        frameworks.append(framework)
+    return frameworks
+
+
+class StubEmbedder:
+    """
+    Deterministic, offline stand-in for `genai.embed_content`.
+
+    The same text always maps to the same unit vector, so results are stable
+    across runs. `calls` and `texts_embedded` count API-equivalent usage.
+    `latency` is a fixed delay in seconds or a `LatencyDistribution`.
+    """
+
+    def __init__(self, dim: int = 768, latency: Any = 0.0):
+        self.dim = dim
+        self.latency = latency
+        self.calls = 0
+        self.texts_embedded = 0
+        self._lock = threading.Lock()
+
+    def vector(self, text: str) -> List[float]:
+        import hashlib
+        import math
+        import random
+
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dim)]
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_content(self, model: str, content, task_type: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """Mirrors `genai.embed_content`: a list of texts returns a list of vectors."""
+        delay = self.latency.sample() if hasattr(self.latency, "sample") else self.latency
+        if delay:
+            threading.Event().wait(delay)
+        texts = content if isinstance(content, list) else [content]
+        with self._lock:
+            self.calls += 1
+            self.texts_embedded += len(texts)
+        vectors = [self.vector(text) for text in texts]
+        return {"embedding": vectors if isinstance(content, list) else vectors[0]}
+
+
+class LatencyDistribution:
+    """
+    Samples simulated call latencies (seconds) from a spec string:
+
+    - "0.05" or "fixed:0.05"
+    - "uniform:0.01,0.2"
+    - "normal:0.5,0.1" (mean, stddev; clipped at zero)
+    - "lognormal:-1.0,0.5" (mu, sigma of the underlying normal)
+    """
+
+    def __init__(self, spec: str = "0", seed: int = 0):
+        import random
+
+        self.spec = spec
+        self._rng = random.Random(seed)
+        kind, _, params = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        self._kind = kind
+        self._params = [float(p) for p in params.split(",") if p]
+
+    def sample(self) -> float:
+        p = self._params
+        if self._kind == "fixed":
+            return p[0] if p else 0.0
+        if self._kind == "uniform":
+            return self._rng.uniform(p[0], p[1])
+        if self._kind == "normal":
+            return max(0.0, self._rng.gauss(p[0], p[1]))
+        if self._kind == "lognormal":
+            return self._rng.lognormvariate(p[0], p[1])
+        raise ValueError(f"Unknown latency distribution '{self.spec}'.")
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubLLM:
+    """
+    Offline stand-in for `genai.GenerativeModel` used by the ranking analysis.
+
+    `generate_content` answers with the six query characteristics, chosen
+    deterministically from the prompt text, after a simulated delay drawn from
+    `latency`. Set `error_rate` to make a fraction of calls raise.
+    """
+
+    def __init__(self, latency: Optional[LatencyDistribution] = None, error_rate: float = 0.0, seed: int = 0):
+        import random
+
+        self.latency = latency or LatencyDistribution("0")
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    def generate_content(self, prompt: str, **kwargs) -> _StubResponse:
+        import hashlib
+        import json
+
+        delay = self.latency.sample()
+        if delay:
+            threading.Event().wait(delay)
+        self.calls += 1
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise RuntimeError("Simulated LLM failure")
+
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        labels = {
+            "complexity": FAKE_ATTRIBUTE_VALUES["complexity"],
+            "data_availability": FAKE_ATTRIBUTE_VALUES["data_focus"],
+            "time_sensitivity": FAKE_ATTRIBUTE_VALUES["speed"],
+            "quantitative_need": FAKE_ATTRIBUTE_VALUES["type"],
+            "stakeholder_involvement": FAKE_ATTRIBUTE_VALUES["stakeholders"],
+            "strategic_operational": FAKE_ATTRIBUTE_VALUES["focus"],
+        }
+        analysis = {key: values[digest[i] % len(values)] for i, (key, values) in enumerate(labels.items())}
+        return _StubResponse("```json\n" + json.dumps(analysis) + "\n```")
+
+
+PASS2_MARKERS = (b"shared_context", b"qa_answers", b"qa_state")
+
+
+class FakeFrameworkAgent:
+    """
+    A minimal ASGI app standing in for one framework agent service.
+
+    `POST /run` answers with the two-pass protocol of the real agents: a
+    request mentioning `shared_context`, `qa_answers` or `qa_state` gets a
+    Pass 2 report, anything else a Pass 1 sufficiency verdict. Under the
+    single-shot protocol (the request mentions `single_shot`) a sufficient
+    verdict is replaced by COMPLETE with the report. `GET /` is a health probe
+    and `GET /stats` returns the counters below as JSON. gzip or zstd request
+    bodies are decoded, and responses of 500 bytes or more are gzipped for
+    clients that accept it. With `generation_seconds`, `/run` bodies are
+    instead sent uncompressed in chunks spread over that time, as an LLM
+    writes them token by token.
+
+    Args:
+        name: The agent name, echoed in reports.
+        latency: Per-request delay (`LatencyDistribution`).
+        error_rate: Fraction of `/run` requests answered with HTTP 500.
+        need_info_ratio: Fraction of Pass 1 requests answered with NEED_INFO.
+        questions: Number of questions asked with NEED_INFO.
+        cold_start_seconds: Extra delay on the first request after `idle_timeout_seconds`
+            without traffic (and on the very first request), as on a scaled-to-zero service.
+        generation_seconds: Time over which a `/run` body is streamed after `latency`.
+        report_sections: Extra analysis sections (of `section_chars` each) in every report.
+    """
+
+    def __init__(self, name: str, latency: Optional[LatencyDistribution] = None, error_rate: float = 0.0,
+                 need_info_ratio: float = 0.5, questions: int = 3, cold_start_seconds: float = 0.0,
+                 idle_timeout_seconds: float = 900.0, generation_seconds: float = 0.0, report_sections: int = 0,
+                 section_chars: int = 600, seed: int = 0):
+        import random
+
+        self.name = name
+        self.latency = latency or LatencyDistribution("0")
+        self.error_rate = error_rate
+        self.need_info_ratio = need_info_ratio
+        self.questions = questions
+        self.cold_start_seconds = cold_start_seconds
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.generation_seconds = generation_seconds
+        self.report_sections = report_sections
+        self.section_chars = section_chars
+        self._rng = random.Random(seed)
+        self._last_request: Optional[float] = None
+        self._ready_at = 0.0
+        self.stats: Dict[str, Any] = {"pass1": 0, "pass2": 0, "need_info": 0, "errors": 0, "cold_starts": 0,
+                                      "single_shot_reports": 0, "probes": 0, "in_flight": 0, "peak_in_flight": 0,
+                                      "compressed_requests": 0}
+
+    def pass1_payload(self) -> Dict[str, Any]:
+        if self._rng.random() < self.need_info_ratio:
+            self.stats["need_info"] += 1
+            return {"status": "NEED_INFO",
+                    "questions": [f"{self.name} question {i + 1}?" for i in range(self.questions)]}
+        return {"status": "SUFFICIENT", "questions": []}
+
+    def single_shot_payload(self) -> Dict[str, Any]:
+        payload = self.pass1_payload()
+        if payload["status"] == "NEED_INFO":
+            return payload
+        return {"status": "COMPLETE", "report": self.pass2_payload()}
+
+    def pass2_payload(self) -> Dict[str, Any]:
+        report = {"framework": self.name, "summary": f"Stand-in {self.name} analysis."}
+        for i in range(self.report_sections):
+            text = f"Finding {i + 1} of the {self.name} analysis. "
+            report[f"analysis_{i + 1}"] = (text * (self.section_chars // len(text) + 1))[:self.section_chars]
+        report["recommendation"] = "Proceed with the option that scores best on the stated criteria."
+        report["confidence"] = round(self._rng.uniform(0.5, 0.95), 2)
+        return report
+
+    async def _wake(self) -> None:
+        import asyncio
+        import time
+
+        now = time.monotonic()
+        cold = self._last_request is None or now - self._last_request > self.idle_timeout_seconds
+        self._last_request = now
+        if cold and self.cold_start_seconds:
+            self.stats["cold_starts"] += 1
+            self._ready_at = now + self.cold_start_seconds
+        # Requests arriving while the instance boots wait for it, as on Cloud Run.
+        if self._ready_at > now:
+            await asyncio.sleep(self._ready_at - now)
+
+    async def __call__(self, scope, receive, send):
+        import asyncio
+        import json
+
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        headers = dict(scope.get("headers") or [])
+        content_encoding = headers.get(b"content-encoding", b"")
+        if content_encoding == b"gzip":
+            import gzip
+            body = gzip.decompress(body)
+            self.stats["compressed_requests"] += 1
+        elif content_encoding == b"zstd":
+            import zstandard
+            body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+            self.stats["compressed_requests"] += 1
+
+        method, path = scope["method"], scope["path"]
+        if method == "GET" and path == "/stats":
+            status, payload = 200, self.stats
+        elif method in ("GET", "HEAD") and path == "/":
+            self.stats["probes"] += 1
+            await self._wake()
+            status, payload = 200, {"status": "ok", "agent": self.name}
+        elif method == "POST" and path == "/run":
+            self.stats["in_flight"] += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+            try:
+                await self._wake()
+                delay = self.latency.sample()
+                if delay:
+                    await asyncio.sleep(delay)
+                if self.error_rate and self._rng.random() < self.error_rate:
+                    self.stats["errors"] += 1
+                    status, payload = 500, {"error": "Simulated framework agent failure"}
+                elif any(marker in body for marker in PASS2_MARKERS):
+                    self.stats["pass2"] += 1
+                    status, payload = 200, self.pass2_payload()
+                elif b"single_shot" in body:
+                    self.stats["pass1"] += 1
+                    payload = self.single_shot_payload()
+                    if payload["status"] == "COMPLETE":
+                        self.stats["single_shot_reports"] += 1
+                    status = 200
+                else:
+                    self.stats["pass1"] += 1
+                    status, payload = 200, self.pass1_payload()
+            finally:
+                self.stats["in_flight"] -= 1
+        else:
+            status, payload = 404, {"error": f"No route for {method} {path}"}
+
+        data = json.dumps(payload).encode("utf-8")
+        response_headers = [(b"content-type", b"application/json")]
+        if self.generation_seconds and method == "POST" and path == "/run" and status == 200:
+            await send({"type": "http.response.start", "status": status, "headers": response_headers})
+            size = max(1, len(data) // 40)
+            pieces = [data[i:i + size] for i in range(0, len(data), size)]
+            for piece in pieces:
+                await asyncio.sleep(self.generation_seconds / len(pieces))
+                await send({"type": "http.response.body", "body": piece, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if len(data) >= 500 and b"gzip" in headers.get(b"accept-encoding", b""):
+            import gzip
+            data = gzip.compress(data)
+            response_headers.append((b"content-encoding", b"gzip"))
+        response_headers.append((b"content-length", str(len(data)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": data})
@@ -0,0 +1,117 @@
+"""
+Hosts the framework agents inside one process, each under /<agent_name>.
+
+`FrameworkHost` is an ASGI app that imports every
+`services/<agent_name>/app/agent.py:get_agent()` and serves it with the ADK's
+own server app, so callers keep using the `/run` protocol. It backs two
+deployment options next to the per-agent Cloud Run services:
+
+- FRAMEWORK_TRANSPORT=in_process: the orchestrator mounts the host on its
+  shared transport (see `mount_in_process_host`), so framework calls skip the
+  network and the agents' cold starts entirely.
+- services/all_frameworks_agent: one container serves all ten agents; point
+  ALL_FRAMEWORKS_URL at it (see app/frameworks.py).
+
+The agents' packages are all called `app`, so each agent module is loaded from
+its file under a unique name instead of being imported normally.
+"""
+import importlib.util
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from .frameworks import FRAMEWORK_AGENTS
+
+logger = logging.getLogger(__name__)
+
+# The directory containing the framework agents' service folders.
+FRAMEWORK_AGENTS_DIR = os.environ.get("FRAMEWORK_AGENTS_DIR", str(Path(__file__).resolve().parents[2]))
+
+# The origin the orchestrator's transport serves from the in-process host.
+IN_PROCESS_ORIGIN = "http://in-process"
+
+
+def load_framework_agent(name: str, agents_dir: str = FRAMEWORK_AGENTS_DIR) -> Any:
+    """Imports `<agents_dir>/<name>/app/agent.py` and returns its `get_agent()`."""
+    path = Path(agents_dir) / name / "app" / "agent.py"
+    if not path.exists():
+        raise FileNotFoundError(f"No framework agent module at {path}")
+    spec = importlib.util.spec_from_file_location(f"framework_agents.{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.get_agent()
+
+
+def build_agent_app(name: str) -> Any:
+    """The ADK server app for one framework agent, as `adk api_server` would serve it."""
+    from adk.server import app as adk_app
+    from adk.sessions import InMemorySessionService
+
+    return adk_app.create_app(agent=load_framework_agent(name), session_service=InMemorySessionService())
+
+
+class FrameworkHost:
+    """
+    ASGI app routing /<agent_name>/... to that agent's app. `GET /` lists the
+    hosted agents and serves as the health probe.
+
+    Args:
+        apps: Agent name -> ASGI app. Defaults to building every framework
+            agent with `build_fn`; agents that fail to load are left out.
+        build_fn: Builds the app for one agent name.
+    """
+
+    def __init__(self, apps: Optional[Dict[str, Any]] = None, build_fn: Callable[[str], Any] = build_agent_app):
+        if apps is None:
+            apps = {}
+            for name, _ in FRAMEWORK_AGENTS:
+                try:
+                    apps[name] = build_fn(name)
+                except Exception as e:
+                    logger.warning(f"Could not load framework agent '{name}' in process: {e}")
+        self.apps = apps
+        logger.info(f"Hosting {len(self.apps)} framework agents in process: {sorted(self.apps)}")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                await send({"type": f"{message['type']}.complete"})
+                if message["type"] == "lifespan.shutdown":
+                    return
+
+        name, _, rest = scope["path"].lstrip("/").partition("/")
+        app = self.apps.get(name)
+        if app is not None:
+            prefix = f"/{name}"
+            scope = dict(scope, path=f"/{rest}", root_path=scope.get("root_path", "") + prefix,
+                         raw_path=f"/{rest}".encode("utf-8"))
+            await app(scope, receive, send)
+            return
+
+        if scope["type"] != "http":
+            return
+        if scope["method"] == "GET" and not name:
+            status, payload = 200, {"status": "ok", "agents": sorted(self.apps)}
+        else:
+            status, payload = 404, {"error": f"No framework agent '{name}' is hosted here"}
+        data = json.dumps(payload).encode("utf-8")
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(data)).encode())]})
+        await send({"type": "http.response.body", "body": data})
+
+
+def in_process_url(name: str) -> str:
+    """The base URL under which the in-process host serves an agent."""
+    return f"{IN_PROCESS_ORIGIN}/{name}"
+
+
+def mount_in_process_host(host: Optional[FrameworkHost] = None) -> FrameworkHost:
+    """Serves IN_PROCESS_ORIGIN from `host` (by default every framework agent) on the shared transport."""
+    from .transport import get_transport
+
+    host = host or FrameworkHost()
+    get_transport().mount(IN_PROCESS_ORIGIN, host)
+    return host
@@ -0,0 +1,78 @@
+"""
+The framework agents the orchestrator can delegate to.
+
+Kept free of ADK imports so that scripts (load tests, stand-in servers) can
+enumerate the agents and their endpoint variables without the agent runtime.
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+FRAMEWORK_AGENTS: List[Tuple[str, str]] = [
+    ("pros_cons_agent", "A specialized agent for performing a Pros and Cons analysis."),
+    ("swot_agent", "A specialized agent for performing a SWOT analysis."),
+    ("cost_benefit_agent", "A specialized agent for a Cost-Benefit analysis."),
+    ("weighted_matrix_agent", "A specialized agent for creating a Weighted Matrix to evaluate options."),
+    ("five_whys_agent", "A specialized agent for root-cause analysis using the 5 Whys technique."),
+    ("five_ws_and_h_agent", "A specialized agent for defining a situation using the 5 W's and H framework."),
+    ("ten_ten_ten_agent", "A specialized agent for evaluating decisions using the 10-10-10 Rule."),
+    ("decide_model_agent", "A specialized agent for structured decision-making using the DECIDE Model."),
+    ("kepner_tregoe_agent", "A specialized agent for systematic problem analysis using the Kepner-Tregoe method."),
+    ("rational_decision_making_agent", "A specialized agent for formalized, logical Rational Decision Making."),
+]
+
+
+def url_env_var(agent_name: str) -> str:
+    """The environment variable holding an agent's base URL, e.g. 'SWOT_AGENT_URL'."""
+    return f"{agent_name.upper()}_URL"
+
+
+# Base URL of the consolidated all-frameworks service (services/all_frameworks_agent),
+# which serves every agent under /<agent_name>. An agent's own URL variable wins.
+ALL_FRAMEWORKS_URL_ENV_VAR = "ALL_FRAMEWORKS_URL"
+
+
+def agent_url(agent_name: str) -> Optional[str]:
+    """An agent's base URL: its own `*_AGENT_URL`, else its path on ALL_FRAMEWORKS_URL, else None."""
+    url = os.environ.get(url_env_var(agent_name))
+    if url:
+        return url
+    shared = os.environ.get(ALL_FRAMEWORKS_URL_ENV_VAR)
+    return f"{shared.rstrip('/')}/{agent_name}" if shared else None
+
+
+def configured_agent_urls() -> Dict[str, str]:
+    """Agent name -> base URL for every agent with a URL (see `agent_url`)."""
+    urls = {}
+    for name, _ in FRAMEWORK_AGENTS:
+        url = agent_url(name)
+        if url:
+            urls[name] = url
+    return urls
+
+
+def framework_agent_name(framework_name: str) -> str:
+    """The agent for a catalog framework: catalog names are description file stems ('swot' -> 'swot_agent')."""
+    name = framework_name.strip().lower()
+    return name if name.endswith("_agent") else f"{name}_agent"
+
+
+def parse_selection(text: str, ranked_names: List[str], limit: int) -> List[str]:
+    """
+    Reads the user's framework choice. Accepts 1-based positions in
+    `ranked_names` ("1, 3, 4"), agent names with or without the `_agent` suffix
+    ("swot, pros_cons"), or anything else (e.g. "ok") to accept the top `limit`.
+    At most `limit` frameworks are returned, in the order given.
+    """
+    known = {name: name for name in ranked_names}
+    known.update({name.removesuffix("_agent"): name for name in ranked_names})
+    chosen: List[str] = []
+    for token in text.replace(",", " ").split():
+        token = token.strip().lower().rstrip(".")
+        name = None
+        if token.isdigit() and 1 <= int(token) <= len(ranked_names):
+            name = ranked_names[int(token) - 1]
+        elif token in known:
+            name = known[token]
+        if name and name not in chosen:
+            chosen.append(name)
+    return chosen[:limit] if chosen else ranked_names[:limit]
@@ -0,0 +1,119 @@
+"""
+Offline classifier for the six query characteristics used by `rank_frameworks`.
+
+It produces the same labels as `tools._analyze_query_characteristics` without
+any network call, so ranking can proceed when the LLM is slow, failing or not
+configured. Each query is turned into a small feature vector (keyword hits,
+regex matches and a few shape features such as length and pronoun use), and
+each characteristic is a tiny linear model over those features: the label with
+the highest weighted score wins, with ties broken by the label's bias.
+"""
+import re
+from typing import Dict, List
+
+# --- Feature extraction ---
+
+KEYWORDS: Dict[str, List[str]] = {
+    "urgent": ["urgent", "asap", "immediately", "deadline", "today", "tonight", "tomorrow", "this week",
+               "right away", "quickly", "emergency", "by monday", "by friday", "running out of time"],
+    "not_urgent": ["eventually", "someday", "long term", "long-term", "next year", "no rush", "over the next",
+                   "in the future", "years"],
+    "quantitative": ["cost", "budget", "price", "revenue", "profit", "roi", "salary", "percent", "metrics",
+                     "numbers", "estimate", "forecast", "score", "weigh", "compare", "spreadsheet", "expenses"],
+    "qualitative": ["feel", "values", "happiness", "culture", "relationship", "passion", "meaning", "gut",
+                    "fulfilling", "worried", "stress", "regret"],
+    "data_rich": ["data", "report", "metrics", "analytics", "survey", "research", "measured", "statistics",
+                  "we know", "results show"],
+    "data_poor": ["not sure", "unsure", "don't know", "unknown", "uncertain", "no idea", "unclear", "guess"],
+    "group": ["team", "board", "stakeholders", "customers", "partners", "investors", "department", "company",
+              "organization", "family", "employees", "management", "committee", "clients", "community"],
+    "individual": ["myself", "my career", "my life", "personal", "should i"],
+    "strategic": ["strategy", "strategic", "long term", "long-term", "vision", "expand", "market", "invest",
+                  "acquire", "career", "future", "growth", "pivot", "launch", "merger", "relocate"],
+    "operational": ["process", "workflow", "schedule", "vendor", "tool", "fix", "bug", "outage", "shift",
+                    "routine", "daily", "weekly", "procedure", "inventory", "staffing"],
+    "complex": ["multiple", "several", "trade-off", "tradeoff", "complex", "uncertain", "risk", "dependencies",
+                "competing", "options", "versus", " vs ", "alternatives", "root cause", "why does"],
+}
+
+PATTERNS = {
+    "numbers": re.compile(r"\b\d+(?:[.,]\d+)?\b"),
+    "money": re.compile(r"[$€£¥]\s?\d|\b\d+(?:\.\d+)?\s?(?:k|m|bn|usd|eur|dollars|euros)\b", re.IGNORECASE),
+    "percent": re.compile(r"\d+(?:\.\d+)?\s?%|\bpercent\b", re.IGNORECASE),
+    "dates": re.compile(r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b|\b\d{1,2}/\d{1,2}\b|\bq[1-4]\b",
+                        re.IGNORECASE),
+    "first_singular": re.compile(r"\b(?:i|me|my|mine|i'm|i've)\b", re.IGNORECASE),
+    "first_plural": re.compile(r"\b(?:we|us|our|ours|we're|we've)\b", re.IGNORECASE),
+    "choice": re.compile(r"\b(?:or|between|whether|versus|vs\.?)\b", re.IGNORECASE),
+}
+
+
+def extract_features(query: str) -> Dict[str, float]:
+    """Turns a query into the feature vector consumed by the per-characteristic models."""
+    text = f" {query.lower()} "
+    features: Dict[str, float] = {}
+    for name, keywords in KEYWORDS.items():
+        features[name] = float(sum(text.count(keyword) for keyword in keywords))
+    for name, pattern in PATTERNS.items():
+        features[name] = float(len(pattern.findall(query)))
+    words = len(query.split())
+    features["long"] = min(words / 60.0, 2.0)
+    features["short"] = 1.0 if words < 15 else 0.0
+    features["questions"] = float(query.count("?"))
+    return features
+
+
+# --- Per-characteristic linear models ---
+# characteristic -> label -> {feature: weight}; "bias" is the prior for the label.
+
+MODELS: Dict[str, Dict[str, Dict[str, float]]] = {
+    "complexity": {
+        "low": {"bias": 0.3, "short": 0.8, "complex": -0.6, "long": -0.5},
+        "medium": {"bias": 0.5, "choice": 0.2, "complex": 0.2},
+        "high": {"bias": 0.1, "complex": 0.6, "long": 0.8, "group": 0.2, "strategic": 0.2, "questions": 0.1},
+    },
+    "data_availability": {
+        "readily_available_data": {"bias": 0.1, "data_rich": 0.7, "numbers": 0.2, "money": 0.3, "percent": 0.3},
+        "some_data": {"bias": 0.5, "numbers": 0.1, "data_rich": 0.2},
+        "limited_data": {"bias": 0.3, "data_poor": 0.8, "short": 0.3, "qualitative": 0.1},
+    },
+    "time_sensitivity": {
+        "time_sensitive": {"bias": 0.1, "urgent": 0.9, "dates": 0.3},
+        "moderate_urgency": {"bias": 0.5, "dates": 0.2},
+        "not_time_sensitive": {"bias": 0.3, "not_urgent": 0.7, "strategic": 0.1},
+    },
+    "quantitative_need": {
+        "heavy_quantitative_analysis": {"bias": 0.1, "quantitative": 0.4, "money": 0.5, "percent": 0.5, "numbers": 0.15},
+        "some_quantitative_analysis": {"bias": 0.4, "quantitative": 0.2, "choice": 0.1},
+        "mostly_qualitative_analysis": {"bias": 0.4, "qualitative": 0.6, "individual": 0.1},
+    },
+    "stakeholder_involvement": {
+        "multiple_stakeholders": {"bias": 0.1, "group": 0.6, "first_plural": 0.3},
+        "few_stakeholders": {"bias": 0.3, "first_plural": 0.1, "group": 0.1},
+        "individual_decision": {"bias": 0.3, "individual": 0.7, "first_singular": 0.2, "first_plural": -0.3},
+    },
+    "strategic_operational": {
+        "strategic": {"bias": 0.5, "strategic": 0.6, "not_urgent": 0.2, "long": 0.1},
+        "operational": {"bias": 0.4, "operational": 0.7, "urgent": 0.2},
+    },
+}
+
+
+def classify_query(query: str) -> Dict[str, str]:
+    """
+    Returns the six query characteristics using only local features.
+
+    The output has the same keys and label vocabulary as the LLM analysis, so
+    it can be passed straight to the scoring engine.
+    """
+    features = extract_features(query)
+    analysis = {}
+    for characteristic, labels in MODELS.items():
+        best_label, best_score = None, float("-inf")
+        for label, weights in labels.items():
+            score = sum(weight * features.get(feature, 1.0 if feature == "bias" else 0.0)
+                        for feature, weight in weights.items())
+            if score > best_score or (score == best_score and weights["bias"] > labels[best_label]["bias"]):
+                best_label, best_score = label, score
+        analysis[characteristic] = best_label
+    return analysis
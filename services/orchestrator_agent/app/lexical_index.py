@@ -0,0 +1,162 @@
+"""
+Offline BM25 relevance index over the framework descriptions.
+
+This is a network-free alternative to the `text-embedding-004` similarity used
+for the `semantic_relevance` criterion. The index is small (ten markdown files)
+and is built ahead of time into a JSON artifact; scoring a query is a handful of
+dictionary lookups.
+
+Build the artifact with:
+    python -m app.lexical_index --descriptions ../../scripts/framework_descriptions --output lexical_index.json
+"""
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+INDEX_VERSION = 1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could do does for from has have how i if in into is it its
+me my of on or our should so than that the their them then there these they this to was we were
+what when where which while who why will with would you your
+""".split())
+
+
+def _stem(token: str) -> str:
+    # A deliberately light suffix stripper; enough to match "decisions"/"decision"/"deciding".
+    for suffix in ("ingly", "ings", "ing", "edly", "ed", "ies", "es", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[:-len(suffix)] + ("y" if suffix == "ies" else "")
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases, splits on non-alphanumerics, drops stopwords and stems."""
+    return [_stem(t) for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    An Okapi BM25 index.
+
+    Args:
+        names: Framework names, in document order.
+        postings: term -> {document index: term frequency}.
+        doc_lengths: Token count of each document.
+        k1, b: Standard BM25 saturation and length-normalization parameters.
+    """
+
+    def __init__(self, names: List[str], postings: Dict[str, Dict[int, int]], doc_lengths: List[int],
+                 k1: float = 1.2, b: float = 0.75):
+        self.names = names
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+        count = len(names)
+        self.idf = {
+            term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, documents: Dict[str, str], k1: float = 1.2, b: float = 0.75) -> "LexicalIndex":
+        """Indexes a mapping of framework name -> description text."""
+        names = sorted(documents)
+        postings: Dict[str, Dict[int, int]] = {}
+        doc_lengths = []
+        for i, name in enumerate(names):
+            tokens = tokenize(documents[name])
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, {})[i] = tf
+        return cls(names, postings, doc_lengths, k1, b)
+
+    @classmethod
+    def build_from_directory(cls, path: str) -> "LexicalIndex":
+        """Indexes every `*.md` file in a directory, named after the file stem."""
+        documents = {p.stem: p.read_text(encoding="utf-8") for p in sorted(Path(path).glob("*.md"))}
+        return cls.build(documents)
+
+    def score(self, query: str) -> Dict[str, float]:
+        """
+        Returns a BM25 relevance per framework, scaled so that the best match is
+        1.0 (all zeros when no query term occurs in any description).
+        """
+        totals = [0.0] * len(self.names)
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf[term]
+            for i, tf in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / self.avg_length)
+                totals[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = max(totals, default=0.0)
+        if best > 0:
+            totals = [t / best for t in totals]
+        return dict(zip(self.names, totals))
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": INDEX_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "names": self.names,
+            "doc_lengths": self.doc_lengths,
+            # JSON object keys must be strings; document indexes are restored on load.
+            "postings": {term: {str(i): tf for i, tf in docs.items()} for term, docs in self.postings.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LexicalIndex":
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported lexical index version: {data.get('version')}")
+        postings = {term: {int(i): tf for i, tf in docs.items()} for term, docs in data["postings"].items()}
+        return cls(data["names"], postings, data["doc_lengths"], data["k1"], data["b"])
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_default_index() -> Optional[LexicalIndex]:
+    """
+    Loads the prebuilt artifact from LEXICAL_INDEX_PATH (default: next to the
+    app package, where the Dockerfile writes it). When no artifact exists, the
+    index is built from the framework descriptions in the source tree instead.
+    """
+    default_path = Path(__file__).parent.parent / "lexical_index.json"
+    path = Path(os.environ.get("LEXICAL_INDEX_PATH", default_path))
+    if path.exists():
+        return LexicalIndex.load(str(path))
+
+    for descriptions in (Path(__file__).parent.parent.parent.parent / "scripts" / "framework_descriptions",
+                         Path("/scripts/framework_descriptions")):
+        if descriptions.is_dir():
+            return LexicalIndex.build_from_directory(str(descriptions))
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline BM25 index over the framework descriptions.")
+    parser.add_argument("--descriptions", required=True, help="Directory containing the framework *.md files.")
+    parser.add_argument("--output", required=True, help="Where to write the JSON index artifact.")
+    args = parser.parse_args()
+
+    index = LexicalIndex.build_from_directory(args.descriptions)
+    index.save(args.output)
+    print(f"Wrote lexical index for {len(index.names)} frameworks ({len(index.postings)} terms) to {args.output}")
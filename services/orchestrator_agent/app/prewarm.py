@@ -0,0 +1,195 @@
+"""
+Wakes scaled-to-zero framework services before Pass 1 needs them.
+
+Cloud Run stops idle services, and the first request afterwards pays the
+container's cold start. The scheduler sends cheap `GET /` probes so that the
+cold start overlaps work the session is doing anyway:
+
+- On query arrival, the PREWARM_TOP_N most frequently selected frameworks are
+  probed while ranking runs.
+- Once ranking returns, the top PREWARM_TOP_N ranked frameworks are probed
+  (with FRAMEWORK_SELECTION=user, while the user is choosing).
+- Every KEEP_WARM_INTERVAL_SECONDS, the KEEP_WARM_TOP_K most frequently
+  selected frameworks are probed so they never go idle (0 disables this).
+
+Selection frequencies decay with a half-life of SELECTION_HALF_LIFE_SECONDS,
+so the schedule follows shifts in what users pick. A service probed (or
+called) within PREWARM_MIN_INTERVAL_SECONDS is assumed warm and skipped;
+probes are per origin, so agents behind one consolidated service share them.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .transport import AgentTransport, get_transport
+
+logger = logging.getLogger(__name__)
+
+PREWARM = os.environ.get("PREWARM", "true").lower() == "true"
+PREWARM_TOP_N = int(os.environ.get("PREWARM_TOP_N", "6"))
+PREWARM_MIN_INTERVAL_SECONDS = float(os.environ.get("PREWARM_MIN_INTERVAL_SECONDS", "60"))
+PREWARM_PROBE_TIMEOUT_SECONDS = float(os.environ.get("PREWARM_PROBE_TIMEOUT_SECONDS", "30"))
+# A probe slower than this most likely woke a cold instance.
+PREWARM_COLD_PROBE_SECONDS = float(os.environ.get("PREWARM_COLD_PROBE_SECONDS", "1.0"))
+KEEP_WARM_TOP_K = int(os.environ.get("KEEP_WARM_TOP_K", "3"))
+# Below Cloud Run's idle window, so that kept-warm services are never scaled to zero.
+KEEP_WARM_INTERVAL_SECONDS = float(os.environ.get("KEEP_WARM_INTERVAL_SECONDS", "300"))
+SELECTION_HALF_LIFE_SECONDS = float(os.environ.get("SELECTION_HALF_LIFE_SECONDS", "86400"))
+
+
+class SelectionFrequencies:
+    """
+    Exponentially decayed count of how often each framework is selected.
+
+    Args:
+        half_life_seconds: Time after which a selection counts half as much.
+    """
+
+    def __init__(self, half_life_seconds: float = SELECTION_HALF_LIFE_SECONDS):
+        self._half_life = half_life_seconds
+        self._scores: Dict[str, float] = {}
+        self._updated_at = time.monotonic()
+
+    def _decay(self) -> None:
+        now = time.monotonic()
+        factor = 0.5 ** ((now - self._updated_at) / self._half_life) if self._half_life > 0 else 1.0
+        self._updated_at = now
+        if factor < 1.0:
+            self._scores = {name: score * factor for name, score in self._scores.items()}
+
+    def observe(self, names: List[str]) -> None:
+        self._decay()
+        for name in names:
+            self._scores[name] = self._scores.get(name, 0.0) + 1.0
+
+    def top(self, k: int) -> List[str]:
+        """The `k` most frequently selected names, most frequent first."""
+        self._decay()
+        return sorted(self._scores, key=self._scores.get, reverse=True)[:k]
+
+    def snapshot(self) -> Dict[str, float]:
+        self._decay()
+        return {name: round(score, 3) for name, score in sorted(self._scores.items(), key=lambda kv: -kv[1])}
+
+
+class PrewarmScheduler:
+    """
+    Sends warm-up probes to framework services; see the module docstring.
+
+    Args:
+        urls: Agent name -> base URL of every remote framework agent.
+        transport: Defaults to the process-wide `get_transport()`.
+        frequencies: Selection history that drives the query-time and keep-warm probes.
+        enabled: False turns every method into a no-op.
+        top_n: Agents probed on query arrival and after ranking.
+        keep_warm_top_k: Most frequently selected agents kept warm (0 disables).
+        keep_warm_interval_seconds: Time between keep-warm rounds.
+        min_interval_seconds: A service warmed more recently than this is not probed.
+    """
+
+    def __init__(self, urls: Dict[str, str], transport: Optional[AgentTransport] = None,
+                 frequencies: Optional[SelectionFrequencies] = None, enabled: bool = PREWARM,
+                 top_n: int = PREWARM_TOP_N, keep_warm_top_k: int = KEEP_WARM_TOP_K,
+                 keep_warm_interval_seconds: float = KEEP_WARM_INTERVAL_SECONDS,
+                 min_interval_seconds: float = PREWARM_MIN_INTERVAL_SECONDS):
+        self.urls = urls
+        self.transport = transport or get_transport()
+        self.frequencies = frequencies or SelectionFrequencies()
+        self.enabled = enabled
+        self.top_n = top_n
+        self.keep_warm_top_k = keep_warm_top_k
+        self.keep_warm_interval_seconds = keep_warm_interval_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self._last_warmed: Dict[str, float] = {}
+        self._probes: Dict[str, asyncio.Task] = {}
+        self._keep_warm_task: Optional[asyncio.Task] = None
+        self._counters = {"probes": 0, "skipped_warm": 0, "probe_errors": 0, "cold_probes": 0, "keep_warm_rounds": 0}
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def warm(self, names: List[str], reason: str) -> List[str]:
+        """Probes the services behind `names` that are not known to be warm; returns the agents probed."""
+        if not self.enabled:
+            return []
+        probed = []
+        now = time.monotonic()
+        for name in names:
+            url = self.urls.get(name)
+            if url is None:
+                continue
+            origin = self._origin(url)
+            if origin in self._probes or now - self._last_warmed.get(origin, float("-inf")) < self.min_interval_seconds:
+                self._counters["skipped_warm"] += 1
+                continue
+            self._last_warmed[origin] = now
+            self._probes[origin] = asyncio.create_task(self._probe(origin, f"{url.rstrip('/')}/"))
+            probed.append(name)
+        if probed:
+            logger.info(f"Pre-warming {len(probed)} framework services ({reason}): {probed}")
+        return probed
+
+    async def _probe(self, origin: str, url: str) -> None:
+        self._counters["probes"] += 1
+        start = time.perf_counter()
+        try:
+            # Any HTTP answer means an instance is up; the status does not matter.
+            await self.transport.probe(url, timeout=PREWARM_PROBE_TIMEOUT_SECONDS)
+        except Exception as e:
+            self._counters["probe_errors"] += 1
+            # Let the next session retry rather than assume the service is warm.
+            self._last_warmed.pop(origin, None)
+            logger.warning(f"Warm-up probe to {url} failed: {e}")
+        else:
+            if time.perf_counter() - start >= PREWARM_COLD_PROBE_SECONDS:
+                self._counters["cold_probes"] += 1
+        finally:
+            self._probes.pop(origin, None)
+
+    def mark_warm(self, names: List[str]) -> None:
+        """Records that `names` were just called, which keeps their services warm without a probe."""
+        now = time.monotonic()
+        for name in names:
+            if name in self.urls:
+                self._last_warmed[self._origin(self.urls[name])] = now
+
+    def on_query(self) -> List[str]:
+        """A query arrived: probe the usual picks while ranking runs."""
+        self._ensure_keep_warm()
+        return self.warm(self.frequencies.top(self.top_n), "query arrived")
+
+    def on_ranked(self, ranked_names: List[str]) -> List[str]:
+        """Ranking returned: probe the likely picks before Pass 1."""
+        return self.warm(ranked_names[:self.top_n], "ranked")
+
+    def record_selection(self, names: List[str]) -> None:
+        self.frequencies.observe(names)
+        self.mark_warm(names)
+
+    def _ensure_keep_warm(self) -> None:
+        # Started from the first session, since it needs the server's running loop.
+        if not self.enabled or self.keep_warm_top_k <= 0 or self.keep_warm_interval_seconds <= 0:
+            return
+        if self._keep_warm_task is None or self._keep_warm_task.done():
+            self._keep_warm_task = asyncio.create_task(self._keep_warm())
+
+    async def _keep_warm(self) -> None:
+        while True:
+            await asyncio.sleep(self.keep_warm_interval_seconds)
+            self._counters["keep_warm_rounds"] += 1
+            self.warm(self.frequencies.top(self.keep_warm_top_k), "keep-warm")
+
+    async def aclose(self) -> None:
+        tasks = list(self._probes.values()) + ([self._keep_warm_task] if self._keep_warm_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._keep_warm_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "selection_frequencies": self.frequencies.snapshot()}
@@ -0,0 +1,368 @@
+"""
+Q&A helpers for the orchestrator's interactive phase.
+
+Kept free of ADK imports so that they can be exercised (and benchmarked) with
+a plain object standing in for the invocation context.
+"""
+import bisect
+import json
+import logging
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Batched Q&A (QA_MODE=batched): questions whose embeddings are at least this
+# similar (cosine) are asked once; without embeddings, token overlap (Jaccard)
+# against QA_LEXICAL_DEDUP_THRESHOLD is used instead.
+QA_DEDUP_THRESHOLD = float(os.environ.get("QA_DEDUP_THRESHOLD", "0.9"))
+QA_LEXICAL_DEDUP_THRESHOLD = float(os.environ.get("QA_LEXICAL_DEDUP_THRESHOLD", "0.6"))
+
+# Shown under the question form; also how the load test recognizes one.
+QUESTION_FORM_HINT = "Reply with one answer per line, numbered to match (e.g. '1. ...'), or 'skip' to go on without the rest."
+
+# A reply to the question form that leaves its open items unanswered.
+FORM_SKIP_REPLIES = frozenset({"skip", "none", "n/a", "no answer", "pass"})
+
+NO_ANSWER = "(No answer given.)"
+
+QA_STATE_VERSION = 1
+
+
+def parse_agent_result(value: Any) -> Optional[Dict[str, Any]]:
+    """An agent's Pass 1 result as a dict (results may be stored as JSON text or already decoded), or None."""
+    if isinstance(value, dict):
+        return value
+    if not isinstance(value, str):
+        return None
+    try:
+        result = json.loads(value)
+    except json.JSONDecodeError:
+        return None
+    return result if isinstance(result, dict) else None
+
+
+class QAState:
+    """
+    The interactive Q&A as a small state machine.
+
+    Every question sits in one flat list in asking order, with the questions of
+    each agent in one run, so `starts[i] + n` is the slot of agent i's n-th
+    question. `replies` holds the answer per slot (None while unanswered), and
+    `cursor` is the first unanswered slot. Answering the current question or
+    routing an answer to (agent, n) is an index lookup, and the cursor only
+    moves forward, past the slots already answered (amortized constant time
+    per answer), so answers may arrive in any order.
+
+    Args:
+        agents: Agents with questions, in asking order.
+        starts: Slot of each agent's first question, plus the total as the last entry.
+        questions: Question text per slot.
+        replies: Answer per slot, or None.
+        cursor: First unanswered slot (len(questions) once the Q&A is complete).
+        form: The batched question form (see `build_question_form`), while it awaits its reply.
+    """
+
+    __slots__ = ("agents", "starts", "questions", "replies", "cursor", "form", "_agent_index")
+
+    def __init__(self, agents: List[str], starts: List[int], questions: List[str],
+                 replies: Optional[List[Optional[str]]] = None, cursor: int = 0,
+                 form: Optional[List[Dict[str, Any]]] = None):
+        self.agents = agents
+        self.starts = starts
+        self.questions = questions
+        self.replies = replies if replies is not None else [None] * len(questions)
+        self.cursor = cursor
+        self.form = form
+        self._agent_index: Optional[Dict[str, int]] = None
+        self._advance()
+
+    @classmethod
+    def from_results(cls, results: Dict[str, Optional[Dict[str, Any]]]) -> "QAState":
+        """Builds the Q&A from parsed Pass 1 results (agent name -> result), in the given agent order."""
+        agents, starts, questions = [], [], []
+        for agent_name, result in results.items():
+            if result and result.get("status") == "NEED_INFO" and result.get("questions"):
+                agents.append(agent_name)
+                starts.append(len(questions))
+                questions.extend(str(q) for q in result["questions"])
+        return cls(agents, starts + [len(questions)], questions)
+
+    # --- Lookups ---
+
+    def _agent_of(self, slot: int) -> int:
+        return bisect.bisect_right(self.starts, slot) - 1
+
+    def _index_of(self, agent_name: str) -> Optional[int]:
+        if self._agent_index is None:
+            self._agent_index = {name: i for i, name in enumerate(self.agents)}
+        return self._agent_index.get(agent_name)
+
+    def slot(self, agent_name: str, index: int) -> Optional[int]:
+        """The slot of `agent_name`'s `index`-th question, or None."""
+        i = self._index_of(agent_name)
+        if i is None or not 0 <= index < self.starts[i + 1] - self.starts[i]:
+            return None
+        return self.starts[i] + index
+
+    def question_at(self, slot: int) -> Dict[str, Any]:
+        i = self._agent_of(slot)
+        return {"agent_name": self.agents[i], "question": self.questions[slot], "index": slot - self.starts[i],
+                "slot": slot}
+
+    def current(self) -> Optional[Dict[str, Any]]:
+        """The next question to ask, or None once every question is answered."""
+        return self.question_at(self.cursor) if self.cursor < len(self.questions) else None
+
+    @property
+    def complete(self) -> bool:
+        return self.cursor >= len(self.questions)
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Every unanswered question, in asking order."""
+        return [self.question_at(slot) for slot in range(self.cursor, len(self.questions))
+                if self.replies[slot] is None]
+
+    def answers_for(self, agent_name: str) -> List[Dict[str, str]]:
+        """The agent's answered questions as [{"q": ..., "a": ...}], in its own question order."""
+        i = self._index_of(agent_name)
+        if i is None:
+            return []
+        return [{"q": self.questions[s], "a": self.replies[s]}
+                for s in range(self.starts[i], self.starts[i + 1]) if self.replies[s] is not None]
+
+    def answers(self) -> Dict[str, List[Dict[str, str]]]:
+        """agent name -> `answers_for(agent)`, the `qa_answers` the framework agents receive."""
+        return {agent_name: self.answers_for(agent_name) for agent_name in self.agents}
+
+    # --- Transitions ---
+
+    def _advance(self) -> None:
+        while self.cursor < len(self.questions) and self.replies[self.cursor] is not None:
+            self.cursor += 1
+
+    def answer(self, answer: str, slot: Optional[int] = None) -> None:
+        """Records `answer` for `slot` (default: the current question) and moves the cursor on."""
+        slot = self.cursor if slot is None else slot
+        if not 0 <= slot < len(self.questions):
+            raise IndexError(f"No question in slot {slot}; the Q&A has {len(self.questions)}.")
+        self.replies[slot] = answer
+        self._advance()
+
+    def apply_form(self, answers: Dict[int, str], finish: bool = False) -> None:
+        """
+        Fans each answer to the question form out to every question it groups.
+        Items left unanswered stay on the form (to be asked again) unless
+        `finish`; once none are left, the Q&A is complete. Questions still
+        without an answer then are recorded as NO_ANSWER so that Pass 2 can flag
+        the gap in its caveat.
+        """
+        remaining = []
+        for group in self.form or []:
+            answer = answers.get(group["id"])
+            if not answer and not finish:
+                remaining.append(group)
+                continue
+            for asker in group["askers"]:
+                if self.replies[asker["slot"]] is None:
+                    self.replies[asker["slot"]] = answer or NO_ANSWER
+        self.form = remaining or None
+        if self.form:
+            self._advance()
+            return
+        for slot in range(self.cursor, len(self.questions)):
+            if self.replies[slot] is None:
+                self.replies[slot] = NO_ANSWER
+        self.cursor = len(self.questions)
+
+    # --- Session storage ---
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The compact form stored as `qa_state`; the form keeps only each group's text, slots and number."""
+        data = {"v": QA_STATE_VERSION, "agents": list(self.agents), "starts": list(self.starts),
+                "questions": list(self.questions), "replies": list(self.replies), "cursor": self.cursor}
+        if self.form:
+            data["form"] = [[group["question"], [asker["slot"] for asker in group["askers"]], group["id"]]
+                            for group in self.form]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["QAState"]:
+        """Restores `to_dict` output; also reads the nested layout sessions used to store. None for no Q&A."""
+        if not data:
+            return None
+        if "agents_with_questions" in data:
+            return cls._from_nested(data)
+        if data.get("v") != QA_STATE_VERSION:
+            raise ValueError(f"Unsupported qa_state version: {data.get('v')}")
+        state = cls(list(data["agents"]), list(data["starts"]), list(data["questions"]), list(data["replies"]),
+                    data["cursor"])
+        if data.get("form"):
+            # Groups keep the number the user saw, also once some of the form is answered.
+            state.form = [{"id": group[2] if len(group) > 2 else i, "question": group[0],
+                           "askers": [state.question_at(slot) for slot in group[1]]}
+                          for i, group in enumerate(data["form"], start=1)]
+        return state
+
+    @classmethod
+    def _from_nested(cls, data: Dict[str, Any]) -> "QAState":
+        agents = data.get("completed_agents", []) + data.get("agents_with_questions", [])
+        state = cls.from_results({agent["name"]: {"status": "NEED_INFO", "questions": agent["questions"]}
+                                  for agent in agents})
+        # Batched answers were appended in form order, so they are matched by question, not position.
+        slots: Dict[tuple, int] = {}
+        for slot, question in enumerate(state.questions):
+            slots.setdefault((state.agents[state._agent_of(slot)], question), slot)
+        for agent_name, items in (data.get("answers") or {}).items():
+            for item in items:
+                if (agent_name, item.get("q")) in slots:
+                    state.replies[slots[(agent_name, item.get("q"))]] = item.get("a")
+        state._advance()
+        if data.get("question_form"):
+            state.form = [{**group, "askers": [state.question_at(slots[(a["agent_name"], a["question"])])
+                                               for a in group["askers"] if (a["agent_name"], a["question"]) in slots]}
+                          for group in data["question_form"]]
+        return state
+
+
+def qa_answers(qa_state: Optional[Dict[str, Any]]) -> Dict[str, List[Dict[str, str]]]:
+    """The per-agent answers held in a stored `qa_state` (empty before the Q&A starts)."""
+    state = QAState.from_dict(qa_state)
+    return state.answers() if state else {}
+
+
+def initialize_qa_state(ctx: Any, results: Optional[Dict[str, Optional[Dict[str, Any]]]] = None) -> QAState:
+    """
+    Sets up the Q&A from the Pass 1 results of the selected agents and stores it
+    as `qa_state`. `results` are the already-parsed results, if the caller has them.
+    """
+    selected_agents = ctx.session.state.get("selected_frameworks", [])
+    if results is None:
+        results = {name: parse_agent_result(ctx.session.state.get(name)) for name in selected_agents}
+    for agent_name in selected_agents:
+        if results.get(agent_name) is None:
+            logger.error(f"Could not parse result for {agent_name}: {ctx.session.state.get(agent_name)}")
+    qa_state = QAState.from_results({name: results.get(name) for name in selected_agents})
+    ctx.session.state["qa_state"] = qa_state.to_dict()
+    logger.info(f"Q&A state initialized: {len(qa_state.questions)} questions from {qa_state.agents}")
+    return qa_state
+
+
+def collect_single_shot_reports(ctx: Any, results: Optional[Dict[str, Optional[Dict[str, Any]]]] = None) -> List[str]:
+    """
+    Finds selected agents that answered Pass 1 with `COMPLETE` (single-shot
+    protocol) and replaces their state entry with the report itself, which is
+    what Pass 2 would have written there. Returns those agents' names.
+    `results` are the already-parsed results, if the caller has them.
+    """
+    completed = []
+    for agent_name in ctx.session.state.get("selected_frameworks", []):
+        result = results.get(agent_name) if results is not None else parse_agent_result(ctx.session.state.get(agent_name))
+        if result and result.get("status") == "COMPLETE" and result.get("report"):
+            ctx.session.state[agent_name] = json.dumps(result["report"])
+            completed.append(agent_name)
+    if completed:
+        logger.info(f"Single-shot reports received in Pass 1 from: {completed}")
+    return completed
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return sum(x * y for x, y in zip(a, b)) / norm if norm else 0.0
+
+
+def _tokens(text: str) -> set:
+    return set(re.findall(r"[a-z0-9']+", text.lower()))
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+def build_question_form(questions: List[Dict[str, str]], embeddings: Optional[List[List[float]]] = None,
+                        threshold: float = QA_DEDUP_THRESHOLD,
+                        lexical_threshold: float = QA_LEXICAL_DEDUP_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Groups overlapping questions (see `QAState.pending`) so that each is asked
+    once. A question joins the first group whose leading question is similar
+    enough, else starts a new one. Returns the groups, numbered from 1, each
+    with the question shown and the agents (and their own wording) it answers.
+    """
+    embeddings = embeddings or [[] for _ in questions]
+    form: List[Dict[str, Any]] = []
+    leaders: List[tuple] = []  # (embedding, tokens) of each group's first question
+    for item, embedding in zip(questions, embeddings):
+        tokens = _tokens(item["question"])
+        match = None
+        for group, (leader_embedding, leader_tokens) in zip(form, leaders):
+            if embedding and leader_embedding:
+                similar = _cosine(embedding, leader_embedding) >= threshold
+            else:
+                similar = _jaccard(tokens, leader_tokens) >= lexical_threshold
+            if similar:
+                match = group
+                break
+        if match is None:
+            form.append({"id": len(form) + 1, "question": item["question"], "askers": [item]})
+            leaders.append((embedding, tokens))
+        else:
+            match["askers"].append(item)
+    logger.info(f"Question form: {len(questions)} questions asked as {len(form)}.")
+    return form
+
+
+def format_question_form(form: List[Dict[str, Any]]) -> str:
+    lines = []
+    for group in form:
+        askers = ", ".join(dict.fromkeys(asker["agent_name"] for asker in group["askers"]))
+        lines.append(f"{group['id']}. {group['question']} (asked by {askers})")
+    return "\n".join(lines) + f"\n\n{QUESTION_FORM_HINT}"
+
+
+def is_skip_reply(reply: str) -> bool:
+    """Whether a reply to the question form asks to go on without the items still open."""
+    return reply.strip().lower().rstrip(".!") in FORM_SKIP_REPLIES
+
+
+def parse_form_reply(reply: str, ids: List[int]) -> Dict[int, str]:
+    """
+    Reads a reply to the question form items numbered `ids` (those still open,
+    in order). Accepts a JSON object ({"1": "..."}) or list, or lines numbered
+    "1." / "1)" / "1:" (unnumbered lines continue the previous answer). An
+    unnumbered reply with exactly one line per item is matched in order, and
+    answers a single open item as a whole; otherwise it is ambiguous and
+    answers nothing, so that the items are asked again.
+    """
+    reply = reply.strip()
+    if not reply:
+        return {}
+    open_ids = set(ids)
+    try:
+        data = json.loads(reply)
+    except json.JSONDecodeError:
+        data = None
+    if isinstance(data, dict):
+        return {int(k): str(v).strip() for k, v in data.items() if str(k).isdigit() and int(k) in open_ids and str(v).strip()}
+    if isinstance(data, list):
+        return {i: str(v).strip() for i, v in zip(ids, data) if str(v).strip()}
+
+    answers: Dict[int, str] = {}
+    current = None
+    for line in reply.splitlines():
+        match = re.match(r"\s*(?:Q\s*)?(\d+)\s*(?:[):]|\.(?=\s|$))\s*(.*)", line, re.IGNORECASE)
+        if match and int(match.group(1)) in open_ids:
+            current = int(match.group(1))
+            answers[current] = match.group(2).strip()
+        elif current is not None and line.strip():
+            answers[current] = f"{answers[current]} {line.strip()}".strip()
+    if answers:
+        return {i: a for i, a in answers.items() if a}
+
+    lines = [line.strip() for line in reply.splitlines() if line.strip()]
+    if len(lines) == len(ids):
+        return dict(zip(ids, lines))
+    if len(ids) == 1:
+        return {ids[0]: reply}
+    return {}
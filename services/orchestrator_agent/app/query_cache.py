@@ -0,0 +1,306 @@
+"""
+Content-addressed memoization for per-query model calls.
+
+`rank_frameworks` pays for an embedding call and a `gemini-2.5-pro` analysis on
+every query, even when the same (or trivially re-formatted) query was seen
+before. `QueryCache` keys results on the normalized query text, the kind of
+result and the model id, and stores them in two tiers:
+
+- an in-process LRU (`MemoryTier`), checked first;
+- an optional persistent tier shared across restarts and instances, either a
+  local SQLite file (`DiskTier`) or a Firestore collection (`FirestoreTier`).
+
+The memory and disk tiers are bounded by entry count and TTL; the Firestore
+tier by a TTL policy on the collection.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", "1024"))
+DEFAULT_TTL_SECONDS = float(os.environ.get("QUERY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def normalize_query(query: str) -> str:
+    """Canonicalizes a query so that case and whitespace edits map to the same key."""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def cache_key(kind: str, model_id: str, query: str) -> str:
+    """Returns the content address for a (kind, model, query) triple."""
+    material = "\0".join([kind, model_id, normalize_query(query)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class MemoryTier:
+    """
+    A thread-safe LRU with per-entry expiry. Values are copied on the way in
+    and out, so callers may modify what they store or get back (e.g. add score
+    fields to a ranking) without changing the cached entry.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at or time.time() + self._ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskTier:
+    """
+    A SQLite-backed store, bounded by `max_entries`. Reads do not write: the
+    access times of hits are kept in memory and saved by the next sweep. A sweep
+    drops expired rows and re-counts the table; it runs every `sweep_every`
+    writes, or when the row count kept in memory passes the bound, and then
+    evicts least-recently-used rows down to 90% of the bound, so that the next
+    writes do not have to.
+    """
+
+    name = "disk"
+
+    def __init__(self, path: str, max_entries: int = 100_000, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 sweep_every: int = 100):
+        self._path = path
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._sweep_every = sweep_every
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS query_cache_accessed ON query_cache (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS query_cache_expires ON query_cache (expires_at)")
+        self._conn.commit()
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM query_cache").fetchone()[0]
+        self._writes = 0
+        # key -> access time of hits not yet saved.
+        self._touched: Dict[str, float] = {}
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[tuple]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM query_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                # Expired rows are left to the next sweep.
+                return None
+            self._touched[key] = now
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._touched.pop(key, None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self._ttl, now),
+            )
+            # Over-counts replaced rows until the next sweep re-counts.
+            self._rows += 1
+            self._writes += 1
+            if self._rows > self._max_entries or self._writes % self._sweep_every == 0:
+                self._sweep(now)
+            self._conn.commit()
+
+    def _sweep(self, now: float) -> None:
+        if self._touched:
+            self._conn.executemany("UPDATE query_cache SET accessed_at = ? WHERE key = ?",
+                                   [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+        self._conn.execute("DELETE FROM query_cache WHERE expires_at < ?", (now,))
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM query_cache").fetchone()[0]
+        overflow = self._rows - self._max_entries
+        if overflow > 0:
+            overflow += self._max_entries // 10
+            self._conn.execute(
+                "DELETE FROM query_cache WHERE key IN"
+                " (SELECT key FROM query_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._rows -= overflow
+            self.evictions += overflow
+
+    def __len__(self) -> int:
+        return self._rows
+
+
+class FirestoreTier:
+    """
+    A Firestore collection keyed by content address. Expiry is checked on read;
+    size is bounded by configuring a Firestore TTL policy on `expires_at`. That
+    policy deletes documents server-side, so `evictions` is None (not known)
+    rather than a count.
+    """
+
+    name = "firestore"
+
+    def __init__(self, client_factory: Callable[[], Any], collection: str = "query_cache",
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self._client_factory = client_factory
+        self._collection = collection
+        self._ttl = ttl_seconds
+        self.evictions: Optional[int] = None
+
+    def _doc(self, key: str):
+        client = self._client_factory()
+        if client is None:
+            raise ConnectionError("Firestore client not available.")
+        return client.collection(self._collection).document(key)
+
+    def get(self, key: str) -> Optional[tuple]:
+        snapshot = self._doc(key).get()
+        data = snapshot.to_dict() if snapshot.exists else None
+        if not data:
+            return None
+        expires_at = data.get("expires_at", 0)
+        if hasattr(expires_at, "timestamp"):
+            expires_at = expires_at.timestamp()
+        if expires_at < time.time():
+            return None
+        return json.loads(data["value"]), expires_at
+
+    def set(self, key: str, value: Any) -> None:
+        from datetime import datetime, timezone
+
+        expires_at = datetime.fromtimestamp(time.time() + self._ttl, tz=timezone.utc)
+        self._doc(key).set({"value": json.dumps(value), "expires_at": expires_at})
+
+
+class QueryCache:
+    """
+    Two-tier read-through cache.
+
+    Args:
+        memory: The in-process tier, always consulted first.
+        persistent: Optional slower tier; hits are promoted into `memory`.
+        log_every: Log a metrics line every N lookups (0 disables it).
+    """
+
+    def __init__(self, memory: MemoryTier, persistent: Optional[Any] = None, log_every: int = 100):
+        self.memory = memory
+        self.persistent = persistent
+        self._log_every = log_every
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, kind: str, outcome: str) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(kind, {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "errors": 0})
+            counters[outcome] += 1
+            lookups = sum(sum(c[k] for k in ("memory_hits", "persistent_hits", "misses")) for c in self._counters.values())
+        if self._log_every and outcome != "errors" and lookups % self._log_every == 0:
+            logger.info(f"Query cache stats: {self.stats()}")
+
+    def get(self, kind: str, model_id: str, query: str) -> Optional[Any]:
+        """Returns the cached value or None; persistent hits are promoted to memory."""
+        key = cache_key(kind, model_id, query)
+        value = self.memory.get(key)
+        if value is not None:
+            self._count(kind, "memory_hits")
+            return value
+        if self.persistent is not None:
+            try:
+                found = self.persistent.get(key)
+            except Exception as e:
+                logger.warning(f"Persistent query cache read failed: {e}")
+                self._count(kind, "errors")
+                found = None
+            if found is not None:
+                value, expires_at = found
+                self.memory.set(key, value, expires_at)
+                self._count(kind, "persistent_hits")
+                return value
+        self._count(kind, "misses")
+        return None
+
+    def set(self, kind: str, model_id: str, query: str, value: Any) -> None:
+        """Stores a value in both tiers. Persistent write failures are logged, not raised."""
+        key = cache_key(kind, model_id, query)
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            try:
+                self.persistent.set(key, value)
+            except Exception as e:
+                logger.warning(f"Persistent query cache write failed: {e}")
+                self._count(kind, "errors")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns per-kind hit/miss counters and hit rates, plus tier sizes and
+        evictions (None where the tier cannot count them).
+        """
+        with self._lock:
+            kinds = {kind: dict(counters) for kind, counters in self._counters.items()}
+        for counters in kinds.values():
+            lookups = counters["memory_hits"] + counters["persistent_hits"] + counters["misses"]
+            counters["hit_rate"] = round((lookups - counters["misses"]) / lookups, 4) if lookups else None
+        return {
+            "kinds": kinds,
+            "memory_entries": len(self.memory),
+            "memory_evictions": self.memory.evictions,
+            "persistent_tier": self.persistent.name if self.persistent is not None else None,
+            "persistent_evictions": self.persistent.evictions if self.persistent is not None else None,
+        }
+
+
+def create_query_cache(client_factory: Callable[[], Any]) -> QueryCache:
+    """
+    Builds the cache from environment configuration:
+
+    - QUERY_CACHE_BACKEND: "memory" (default), "disk" or "firestore".
+    - QUERY_CACHE_MAX_ENTRIES / QUERY_CACHE_TTL_SECONDS: in-process bounds.
+    - QUERY_CACHE_DISK_PATH / QUERY_CACHE_DISK_MAX_ENTRIES: SQLite tier settings.
+    - QUERY_CACHE_COLLECTION: Firestore tier collection name.
+    """
+    backend = os.environ.get("QUERY_CACHE_BACKEND", "memory").lower()
+    persistent = None
+    try:
+        if backend == "disk":
+            persistent = DiskTier(
+                os.environ.get("QUERY_CACHE_DISK_PATH", "/tmp/foursight_query_cache.sqlite3"),
+                max_entries=int(os.environ.get("QUERY_CACHE_DISK_MAX_ENTRIES", "100000")),
+            )
+        elif backend == "firestore":
+            persistent = FirestoreTier(client_factory, os.environ.get("QUERY_CACHE_COLLECTION", "query_cache"))
+    except Exception as e:
+        logger.warning(f"Could not initialize '{backend}' query cache tier, using memory only: {e}")
+    return QueryCache(MemoryTier(), persistent)
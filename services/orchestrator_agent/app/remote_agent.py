@@ -0,0 +1,143 @@
+"""
+A framework agent service called through the shared pooled transport.
+
+Drop-in replacement for `AgentTool` inside the orchestrator's `ParallelAgent`
+invokers: it POSTs to the service's `/run` endpoint and, like `AgentTool`,
+leaves the agent's response in the session state under the agent's name.
+
+With AGENT_STREAMING the response is parsed while it streams in (see
+app/streaming.py):
+
+- Pass 1 ends as soon as `status` and `questions` are decoded, so Q&A can
+  start without waiting for the rest of the body. A single-shot COMPLETE
+  leaves a placeholder in the state and the report keeps streaming in the
+  background; the orchestrator claims it with `take_report_stream` (see
+  `stream_pass1`).
+- Pass 2 yields one UI message per report section as it completes, and a
+  retried call does not show a section again (see `forget_sections`).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
+
+from adk.agent import BaseAgent
+from adk.agents.invocation_context import InvocationContext
+from adk.events import Event, UIMessage
+
+from .digest import format_section
+from .qa import qa_answers
+from .speculation import SPECULATIVE_RESULT_TTL_SECONDS
+from .streaming import AgentReplyParser, stream_pass1
+from .transport import AgentTransport, get_transport
+
+logger = logging.getLogger(__name__)
+
+AGENT_STREAMING = os.environ.get("AGENT_STREAMING", "true").lower() == "true"
+
+
+def agent_output(body: Any) -> str:
+    """The agent's reply as the JSON text the orchestrator parses from the session state."""
+    if isinstance(body, dict):
+        for key in ("output", "response", "text"):
+            if isinstance(body.get(key), str):
+                return body[key]
+    return body if isinstance(body, str) else json.dumps(body)
+
+
+class RemoteFrameworkAgent(BaseAgent):
+    """
+    Args:
+        name: The agent name (also its session state key).
+        description: Shown in the orchestrator's agent tree.
+        url: The service's base URL.
+        transport: Defaults to the process-wide `get_transport()`.
+    """
+
+    def __init__(self, name: str, description: str, url: str, transport: AgentTransport = None):
+        self.description = description
+        self.url = f"{url.rstrip('/')}/run"
+        self.transport = transport or get_transport()
+        # Session id -> (task finishing a single-shot report, start time).
+        self._report_streams: Dict[str, Tuple[asyncio.Task, float]] = {}
+        # Session id -> keys of the Pass 2 sections already shown to the user.
+        self._shown_sections: Dict[str, set] = {}
+        super().__init__(name=name, sub_agents=[])
+
+    def build_payload(self, ctx: InvocationContext) -> dict:
+        """
+        Pass 1 sends only the original query; once Q&A has been set up, Pass 2
+        sends the shared context with this agent's answers.
+        """
+        state = ctx.session.state
+        qa_state = state.get("qa_state")
+        if qa_state is not None:
+            context = {"shared_context": {"original_query": state.get("query", ""),
+                                          "qa_answers": qa_answers(qa_state).get(self.name, [])}}
+        else:
+            context = {"original_query": state.get("query", "")}
+            if state.get("protocol"):
+                context["protocol"] = state["protocol"]
+        return {"input": {"message": json.dumps(context), "session_id": ctx.session.session_id,
+                          "user_id": getattr(ctx.session, "user_id", None)}}
+
+    def take_report_stream(self, session_id: str) -> Optional[asyncio.Task]:
+        """
+        The task finishing the single-shot report that Pass 1 left streaming for
+        `session_id` (it returns the report as JSON text, or None), if any.
+        """
+        entry = self._report_streams.pop(session_id, None)
+        return entry[0] if entry else None
+
+    def _keep_report_stream(self, session_id: str, task: asyncio.Task) -> None:
+        # Streams nobody claimed (the session moved on, or another instance serves it) are dropped.
+        cutoff = time.monotonic() - SPECULATIVE_RESULT_TTL_SECONDS
+        for key, (stale, started) in list(self._report_streams.items()):
+            if started < cutoff:
+                stale.cancel()
+                del self._report_streams[key]
+        self._report_streams[session_id] = (task, time.monotonic())
+
+    def forget_sections(self, session_id: str) -> None:
+        """Clears which Pass 2 sections were shown for `session_id`; call once the call is settled, retries included."""
+        self._shown_sections.pop(session_id, None)
+
+    async def _run_pass1(self, ctx: InvocationContext, payload: dict) -> None:
+        value, report = await stream_pass1(lambda: self.transport.stream_json(self.url, payload))
+        ctx.session.state[self.name] = value
+        if report is not None:
+            session_id = ctx.session.session_id
+            self._keep_report_stream(session_id, report)
+            logger.info(f"[{self.name}] Single-shot report for session {session_id} continues in the background.")
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        payload = self.build_payload(ctx)
+        if not AGENT_STREAMING:
+            body = await self.transport.post_json(self.url, payload)
+            ctx.session.state[self.name] = agent_output(body)
+            return
+        if ctx.session.state.get("qa_state") is None:
+            await self._run_pass1(ctx, payload)
+            return
+
+        session_id = ctx.session.session_id
+        # A retry after a partial stream sends the report again from the start; skip what was shown.
+        shown = self._shown_sections.setdefault(session_id, set())
+        parser = AgentReplyParser()
+        chunks = self.transport.stream_json(self.url, payload)
+        try:
+            async for text in chunks:
+                values = parser.feed(text)
+                if parser.failed:
+                    continue
+                for path, value in values:
+                    line = format_section(self.name, path[0], value) if len(path) == 1 else None
+                    if line and path[0] not in shown:
+                        shown.add(path[0])
+                        yield UIMessage(line)
+            ctx.session.state[self.name] = parser.text()
+        finally:
+            await chunks.aclose()
+        self._shown_sections.pop(session_id, None)
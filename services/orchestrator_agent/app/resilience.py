@@ -0,0 +1,203 @@
+"""
+Keeps one slow or failing framework service from stalling a session.
+
+- Deadlines: every framework call (all of its attempts together) must finish
+  within AGENT_DEADLINE_SECONDS, or `{AGENT_NAME}_DEADLINE_SECONDS` for a
+  single agent (e.g. SWOT_AGENT_DEADLINE_SECONDS=30).
+- Retries: a failed or empty attempt is retried up to AGENT_RETRIES times,
+  after a "full jitter" backoff (uniform in 0..min(max, base * 2**attempt)).
+- Circuit breaker: after CIRCUIT_FAILURE_THRESHOLD consecutive failures a
+  service is skipped for CIRCUIT_RESET_SECONDS; the first call after that is a
+  trial, which closes the circuit on success and re-opens it on failure.
+- Quorum: Pass 2 stops waiting QUORUM_DEADLINE_SECONDS after it started once
+  SYNTHESIS_QUORUM reports are in. Reports still in flight are delivered after
+  the synthesis as late additions.
+
+`Fanout` runs one call per agent and hands back their events and outcomes in
+the order they happen, so the orchestrator can act on each result as it lands.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+AGENT_DEADLINE_SECONDS = float(os.environ.get("AGENT_DEADLINE_SECONDS", "90"))
+AGENT_RETRIES = int(os.environ.get("AGENT_RETRIES", "1"))
+AGENT_RETRY_BASE_SECONDS = float(os.environ.get("AGENT_RETRY_BASE_SECONDS", "0.5"))
+AGENT_RETRY_MAX_SECONDS = float(os.environ.get("AGENT_RETRY_MAX_SECONDS", "4"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("CIRCUIT_RESET_SECONDS", "60"))
+# 0 disables the quorum and Pass 2 waits for every agent (up to its deadline).
+SYNTHESIS_QUORUM = int(os.environ.get("SYNTHESIS_QUORUM", "3"))
+QUORUM_DEADLINE_SECONDS = float(os.environ.get("QUORUM_DEADLINE_SECONDS", "45"))
+
+
+class AgentUnavailableError(RuntimeError):
+    """Raised when a framework call exhausted its attempts, its deadline, or hit an open circuit."""
+
+
+def agent_deadline(agent_name: str) -> float:
+    """The deadline for one call to `agent_name`, in seconds."""
+    return float(os.environ.get(f"{agent_name.upper()}_DEADLINE_SECONDS", AGENT_DEADLINE_SECONDS))
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter backoff before retry number `attempt` (0-based)."""
+    return random.uniform(0, min(AGENT_RETRY_MAX_SECONDS, AGENT_RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Per-service circuit breaker (closed -> open -> half-open -> closed).
+
+    Args:
+        failure_threshold: Consecutive failures that open a service's circuit.
+        reset_seconds: How long an open circuit rejects calls before a trial call.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self._failure_threshold = failure_threshold
+        self._reset_seconds = reset_seconds
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._trial_in_flight: Dict[str, bool] = {}
+        self._counters = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def state(self, name: str) -> str:
+        opened_at = self._opened_at.get(name)
+        if opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - opened_at >= self._reset_seconds else "open"
+
+    def allow(self, name: str) -> bool:
+        """Whether a call to `name` may go out now. Only one trial call is let through a half-open circuit."""
+        state = self.state(name)
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight.get(name):
+            self._trial_in_flight[name] = True
+            return True
+        self._counters["rejected"] += 1
+        return False
+
+    def record_success(self, name: str) -> None:
+        if name in self._opened_at:
+            logger.info(f"Circuit for {name} closed.")
+        self._failures[name] = 0
+        self._opened_at.pop(name, None)
+        self._trial_in_flight.pop(name, None)
+        self._counters["successes"] += 1
+
+    def record_failure(self, name: str) -> None:
+        self._counters["failures"] += 1
+        self._failures[name] = self._failures.get(name, 0) + 1
+        trial = self._trial_in_flight.pop(name, False)
+        if trial or (name not in self._opened_at and self._failures[name] >= self._failure_threshold):
+            self._opened_at[name] = time.monotonic()
+            self._counters["opened"] += 1
+            logger.warning(f"Circuit for {name} opened after {self._failures[name]} consecutive failures; "
+                           f"skipping it for {self._reset_seconds:g}s.")
+
+    def release_trial(self, name: str) -> None:
+        """Ends a trial call that was abandoned (e.g. cancelled) before it settled, so the next call can be one."""
+        self._trial_in_flight.pop(name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "open": sorted(name for name in self._opened_at if self.state(name) == "open")}
+
+
+async def call_with_resilience(name: str, attempt: Callable[[], Awaitable[Any]], breaker: CircuitBreaker,
+                               deadline: Optional[float] = None, retries: int = AGENT_RETRIES) -> Any:
+    """
+    Runs `attempt()` (which returns the agent's result, None meaning no result)
+    under the agent's deadline, retrying with jittered backoff and consulting
+    the circuit breaker before each attempt.
+
+    Raises:
+        AgentUnavailableError: If no attempt produced a result in time.
+    """
+    deadline = agent_deadline(name) if deadline is None else deadline
+    give_up_at = time.monotonic() + deadline
+    last_error: Any = None
+    for attempt_index in range(retries + 1):
+        if not breaker.allow(name):
+            raise AgentUnavailableError(f"{name} skipped: circuit open")
+        remaining = give_up_at - time.monotonic()
+        try:
+            async with asyncio.timeout(remaining):
+                result = await attempt()
+        except TimeoutError:
+            breaker.record_failure(name)
+            raise AgentUnavailableError(f"{name} missed its {deadline:g}s deadline")
+        except asyncio.CancelledError:
+            # Says nothing about the service's health, but must not leave a half-open circuit waiting on it.
+            breaker.release_trial(name)
+            raise
+        except Exception as e:
+            last_error = e
+            breaker.record_failure(name)
+        else:
+            if result is not None:
+                breaker.record_success(name)
+                return result
+            last_error = "empty result"
+            breaker.record_failure(name)
+
+        if attempt_index < retries:
+            delay = backoff_delay(attempt_index)
+            if time.monotonic() + delay >= give_up_at:
+                break
+            logger.warning(f"Call to {name} failed ({last_error}); retrying in {delay:.2f}s.")
+            await asyncio.sleep(delay)
+    raise AgentUnavailableError(f"{name} failed after {attempt_index + 1} attempts: {last_error}")
+
+
+class Fanout:
+    """
+    Runs one call per agent and queues what happens in completion order:
+    `("event", name, event)` for events the call emits, then either
+    `("done", name, result)` or `("failed", name, error)`.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._finished: set = set()
+
+    def start(self, name: str, run: Callable[[Callable[[Any], Awaitable[None]]], Awaitable[Any]]) -> None:
+        """Starts `run(emit)`, whose return value is the agent's result; `await emit(event)` forwards an event."""
+        async def emit(event: Any) -> None:
+            await self._queue.put(("event", name, event))
+
+        async def wrapper():
+            try:
+                result = await run(emit)
+            except Exception as e:
+                await self._queue.put(("failed", name, e))
+            else:
+                await self._queue.put(("done", name, result))
+
+        self._tasks[name] = asyncio.create_task(wrapper())
+
+    @property
+    def pending(self) -> List[str]:
+        """Agents whose outcome has not been taken from the queue yet."""
+        return [name for name in self._tasks if name not in self._finished]
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Tuple[str, str, Any]]:
+        """The next queued item, or None if nothing arrives within `timeout` seconds."""
+        try:
+            item = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if item[0] != "event":
+            self._finished.add(item[1])
+        return item
+
+    def cancel(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
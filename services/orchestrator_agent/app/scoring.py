@@ -0,0 +1,189 @@
+"""
+Vectorized multi-criteria scoring for `rank_frameworks`.
+
+The catalog is compiled once into a row-normalized embedding matrix and one
+bitmask per categorical attribute, so scoring a query (or a batch of queries)
+against every framework is a handful of NumPy operations instead of a Python
+loop over frameworks.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# criterion -> (framework attribute, query_analysis key, score when not matched)
+CATEGORICAL_CRITERIA = {
+    'complexity_match': ('complexity', 'complexity', 0.2),
+    'data_availability': ('data_focus', 'data_availability', 0.3),
+    'time_sensitivity': ('speed', 'time_sensitivity', 0.4),
+    'quantitative_need': ('type', 'quantitative_need', 0.5),
+    'stakeholder_involvement': ('stakeholders', 'stakeholder_involvement', 0.6),
+    'strategic_operational': ('focus', 'strategic_operational', 0.7),
+}
+
+WEIGHTS = {
+    'semantic_relevance': 0.10, 'complexity_match': 0.20, 'data_availability': 0.15,
+    'time_sensitivity': 0.15, 'quantitative_need': 0.15, 'stakeholder_involvement': 0.15,
+    'strategic_operational': 0.10
+}
+
+# Each attribute value gets one bit in a uint64 mask.
+MAX_VALUES_PER_ATTRIBUTE = 64
+
+
+def _has_values(vector: Optional[Sequence[float]]) -> bool:
+    return vector is not None and len(vector) > 0
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class CompiledCatalog:
+    """
+    A framework catalog compiled for vectorized scoring.
+
+    Args:
+        frameworks: Framework documents as returned by the catalog cache. The
+            list is kept as-is (see `source`) so callers can detect when the
+            catalog has been reloaded and a recompile is needed.
+        embedding_index: Optional `EmbeddingIndex`; when given, framework
+            vectors come from it instead of the documents' 'embedding' field.
+        embedding_model: The model used for query embeddings. Documents whose
+            'embedding_model' field names a different model are treated as
+            having no embedding rather than being compared across models.
+    """
+
+    def __init__(self, frameworks: List[Dict[str, Any]], embedding_index=None,
+                 embedding_model: Optional[str] = None):
+        self.source = frameworks
+        self.names = [f.get('name') for f in frameworks]
+        self.size = len(frameworks)
+
+        if embedding_index is not None:
+            # --- Embeddings: pre-normalized rows straight from the mapped index ---
+            self.dim = embedding_index.dim
+            self.embeddings = embedding_index.vectors_for(self.names)
+            self.has_embedding = np.array([name in embedding_index for name in self.names], dtype=bool)
+        else:
+            # --- Embeddings: zero-padded to the widest vector, then L2-normalized ---
+            vectors = []
+            for framework in frameworks:
+                vector = framework.get('embedding')
+                model = framework.get('embedding_model')
+                if embedding_model and model and model != embedding_model:
+                    logger.warning(f"Ignoring embedding for '{framework.get('name')}': built with '{model}', queries use '{embedding_model}'.")
+                    vector = None
+                vectors.append(vector if _has_values(vector) else [])
+            self.dim = max((len(v) for v in vectors), default=0)
+            embeddings = np.zeros((self.size, self.dim), dtype=np.float32)
+            for row, vector in enumerate(vectors):
+                embeddings[row, :len(vector)] = vector
+            self.has_embedding = np.array([len(v) > 0 for v in vectors], dtype=bool)
+            self.embeddings = _normalize_rows(embeddings)
+
+        # --- Categorical attributes: one vocabulary and one uint64 bitmask per criterion ---
+        self.vocabularies: Dict[str, Dict[str, int]] = {}
+        self.masks: Dict[str, np.ndarray] = {}
+        for criterion, (attribute, _, _) in CATEGORICAL_CRITERIA.items():
+            vocabulary: Dict[str, int] = {}
+            masks = np.zeros(self.size, dtype=np.uint64)
+            for row, framework in enumerate(frameworks):
+                values = framework.get(attribute) or []
+                if isinstance(values, str):
+                    values = [values]
+                for value in values:
+                    if value not in vocabulary:
+                        if len(vocabulary) >= MAX_VALUES_PER_ATTRIBUTE:
+                            raise ValueError(f"Attribute '{attribute}' has more than {MAX_VALUES_PER_ATTRIBUTE} distinct values.")
+                        vocabulary[value] = len(vocabulary)
+                    masks[row] |= np.uint64(1) << np.uint64(vocabulary[value])
+            self.vocabularies[criterion] = vocabulary
+            self.masks[criterion] = masks
+
+    def _query_bits(self, criterion: str, analyses: Sequence[Dict[str, Any]]) -> np.ndarray:
+        _, key, _ = CATEGORICAL_CRITERIA[criterion]
+        vocabulary = self.vocabularies[criterion]
+        bits = np.zeros(len(analyses), dtype=np.uint64)
+        for i, analysis in enumerate(analyses):
+            value = analysis.get(key)
+            index = vocabulary.get(value) if isinstance(value, str) else None
+            if index is not None:
+                bits[i] = np.uint64(1) << np.uint64(index)
+        return bits
+
+    def _query_matrix(self, embeddings: Sequence[Optional[Sequence[float]]]) -> np.ndarray:
+        matrix = np.zeros((len(embeddings), self.dim), dtype=np.float32)
+        for i, vector in enumerate(embeddings):
+            if _has_values(vector):
+                width = min(len(vector), self.dim)
+                matrix[i, :width] = vector[:width]
+        return _normalize_rows(matrix)
+
+    def relevance_vector(self, relevance: Dict[str, float]) -> np.ndarray:
+        """Aligns a name -> relevance mapping (e.g. from the lexical index) with the catalog rows."""
+        return np.array([relevance.get(name, 0.0) for name in self.names], dtype=np.float32)
+
+    def criteria_scores_batch(self, analyses: Sequence[Dict[str, Any]],
+                              embeddings: Sequence[Optional[Sequence[float]]],
+                              relevance: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Returns a (queries x frameworks) score matrix for every criterion.
+
+        `relevance`, when given, is a precomputed (queries x frameworks)
+        semantic relevance matrix used instead of embedding similarity.
+        """
+        if relevance is not None:
+            scores = {'semantic_relevance': np.asarray(relevance, dtype=np.float32).reshape(len(analyses), self.size)}
+        else:
+            scores = {'semantic_relevance': self._query_matrix(embeddings) @ self.embeddings.T}
+        for criterion, (_, _, miss_score) in CATEGORICAL_CRITERIA.items():
+            bits = self._query_bits(criterion, analyses)
+            matched = (self.masks[criterion][None, :] & bits[:, None]) != 0
+            scores[criterion] = np.where(matched, np.float32(1.0), np.float32(miss_score))
+        return scores
+
+    def score_batch(self, analyses: Sequence[Dict[str, Any]],
+                    embeddings: Sequence[Optional[Sequence[float]]],
+                    relevance: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Scores a batch of queries against the whole catalog.
+
+        Returns:
+            A (queries x frameworks) matrix of weighted totals. Frameworks that
+            have no embedding get -inf for queries that do have one, matching
+            the rule that semantic relevance is required when available. No
+            framework is excluded when `relevance` replaces the embeddings.
+        """
+        scores = self.criteria_scores_batch(analyses, embeddings, relevance)
+        totals = sum(scores[key] * np.float32(weight) for key, weight in WEIGHTS.items())
+        if relevance is not None:
+            return totals
+        query_has_embedding = np.array([_has_values(e) for e in embeddings], dtype=bool)
+        excluded = query_has_embedding[:, None] & ~self.has_embedding[None, :]
+        return np.where(excluded, -np.inf, totals)
+
+    def score(self, query_analysis: Dict[str, Any], query_embedding: Optional[Sequence[float]],
+              relevance: Optional[np.ndarray] = None) -> np.ndarray:
+        """Scores a single query; returns one weighted total per framework."""
+        return self.score_batch([query_analysis], [query_embedding], relevance)[0]
+
+    def rank(self, query_analysis: Dict[str, Any], query_embedding: Optional[Sequence[float]],
+             limit: Optional[int] = None, relevance: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Returns copies of the scored frameworks, best first, with a 'score' key."""
+        return self.rank_from_scores(self.score(query_analysis, query_embedding, relevance), limit)
+
+    def rank_from_scores(self, totals: np.ndarray, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Turns one row of `score_batch` output into a sorted list of framework dicts."""
+        order = np.argsort(-totals, kind='stable')
+        order = order[np.isfinite(totals[order])][:limit]
+        ranked = []
+        for row, score in zip(order.tolist(), totals[order].tolist()):
+            framework = dict(self.source[row])
+            framework['score'] = score
+            ranked.append(framework)
+        return ranked
@@ -0,0 +1,150 @@
+"""
+A Firestore session service that writes state deltas once per turn.
+
+`DeltaSessionService` implements the ADK session service interface on top of
+`SessionWriter` (app/session_store.py). `append_event` only applies the
+event's state delta in memory and buffers the event; the session is written
+when the turn ends, as one batch holding the changed state keys and the turn's
+events. The end of a turn is the end of the HTTP request, so wrap the server
+app in `SessionFlushMiddleware`, which commits before the response's last
+chunk goes out. Writes that nothing flushes are committed after
+SESSION_FLUSH_MAX_DELAY_SECONDS at the latest, and reading a session always
+flushes its pending writes first.
+
+Large state values live outside the session document and are read on first
+access (see `LazyState`); `get_session` honours `config.num_recent_events`
+by reading only the history chunks it needs.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Optional
+
+from adk.events import Event
+from adk.sessions import BaseSessionService, ListSessionsResponse, Session
+
+from .session_store import TEMP_PREFIX, SessionWriter
+
+logger = logging.getLogger(__name__)
+
+SESSION_FLUSH_MAX_DELAY_SECONDS = float(os.environ.get("SESSION_FLUSH_MAX_DELAY_SECONDS", "2"))
+
+
+class DeltaSessionService(BaseSessionService):
+    """
+    Args:
+        client_factory: Returns the Firestore client (default: a new `firestore.Client()`).
+        writer: Defaults to a `SessionWriter` over `client_factory`.
+    """
+
+    def __init__(self, client_factory=None, writer: Optional[SessionWriter] = None):
+        super().__init__()
+        if client_factory is None:
+            from google.cloud import firestore
+
+            client = firestore.Client()
+            client_factory = lambda: client
+        self.writer = writer or SessionWriter(client_factory)
+        self._timers = {}
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict] = None,
+                             session_id: Optional[str] = None) -> Session:
+        session = Session(id=session_id or uuid.uuid4().hex, app_name=app_name, user_id=user_id,
+                          state=dict(state or {}), events=[], last_update_time=time.time())
+        self.writer.stage(session.id, session.state, {"app_name": app_name, "user_id": user_id,
+                                                      "last_update_time": session.last_update_time})
+        # A new session is written right away, so that another instance can serve its next turn.
+        await asyncio.to_thread(self.writer.flush, session.id)
+        return session
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str, config: Any = None) -> Optional[Session]:
+        recent_events = getattr(config, "num_recent_events", None)
+        loaded = await asyncio.to_thread(self.writer.load, session_id, recent_events)
+        if loaded is None:
+            return None
+        state, metadata, events = loaded
+        if metadata.get("app_name") != app_name or metadata.get("user_id") != user_id:
+            return None
+        session = Session(id=session_id, app_name=app_name, user_id=user_id, state={},
+                          events=[Event.model_validate(e) for e in events],
+                          last_update_time=metadata.get("last_update_time", 0.0))
+        # Assigned after validation, which would copy the dict and read every offloaded value.
+        session.state = state
+        return session
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        client = self.writer.client_factory()
+
+        def list_ids():
+            query = client.collection(self.writer.collection).select(["app_name", "user_id", "last_update_time"])
+            return [(s.id, s.to_dict() or {}) for s in query.stream()]
+
+        sessions = [
+            Session(id=sid, app_name=app_name, user_id=user_id, state={}, events=[],
+                    last_update_time=data.get("last_update_time", 0.0))
+            for sid, data in await asyncio.to_thread(list_ids)
+            if data.get("app_name") == app_name and data.get("user_id") == user_id
+        ]
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await asyncio.to_thread(self.writer.delete, session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        if event.actions and event.actions.state_delta:
+            for key, value in event.actions.state_delta.items():
+                if not key.startswith(TEMP_PREFIX):
+                    session.state[key] = value
+        session.events.append(event)
+        session.last_update_time = event.timestamp
+        self.writer.stage(session.id, session.state, {"last_update_time": event.timestamp},
+                          event=event.model_dump(mode="json", exclude_none=True))
+        self._schedule_flush(session.id)
+        return event
+
+    def _schedule_flush(self, session_id: str) -> None:
+        if session_id in self._timers or SESSION_FLUSH_MAX_DELAY_SECONDS <= 0:
+            return
+
+        async def flush_later():
+            try:
+                await asyncio.sleep(SESSION_FLUSH_MAX_DELAY_SECONDS)
+                await asyncio.to_thread(self.writer.flush, session_id)
+            except Exception as e:
+                logger.error(f"Could not write session {session_id}: {e}")
+            finally:
+                self._timers.pop(session_id, None)
+
+        self._timers[session_id] = asyncio.create_task(flush_later())
+
+    async def flush(self) -> None:
+        """Writes every session with pending changes, one commit each."""
+        if self.writer.dirty:
+            await asyncio.to_thread(self.writer.flush)
+
+
+class SessionFlushMiddleware:
+    """ASGI middleware that flushes `session_service` before each HTTP response completes."""
+
+    def __init__(self, app, session_service: DeltaSessionService):
+        self.app = app
+        self.session_service = session_service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def flush_then_send(message):
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                try:
+                    await self.session_service.flush()
+                except Exception as e:
+                    logger.error(f"Could not write sessions at the end of a turn: {e}")
+            await send(message)
+
+        await self.app(scope, receive, flush_then_send)
@@ -0,0 +1,532 @@
+"""
+Delta-based persistence of session state.
+
+Writing the whole session on every event means every turn rewrites the
+ranking (with the frameworks' descriptions and embeddings), the Q&A state and
+all agent reports, even when a single key changed. `SessionWriter` instead:
+
+- tracks a fingerprint per top-level state key and writes only the keys whose
+  value changed (as `state.<key>` field paths), deleting removed ones;
+- buffers the events of a turn and commits them together with the state delta
+  in one batch when the turn is flushed (see app/session_service.py);
+- stores large values of SESSION_REF_KEYS (by default `ranked_frameworks`)
+  once, content-addressed, in SESSION_REF_COLLECTION, and keeps only a
+  `{"__ref__": <sha256>}` reference in the session document;
+- moves any other value of SESSION_OFFLOAD_MIN_BYTES or more (agent reports,
+  digests, the final recommendation) out of the session document.
+
+Document layout:
+
+- `sessions/{session_id}` is a compact header: the metadata, the `state` map
+  with the small values, an `{"__offload__": <sha256>, "shards": n}`
+  placeholder per offloaded value and `event_chunks`, the index of the first
+  event of each history chunk.
+- `sessions/{session_id}/state/{key}~{i}` holds shard i of an offloaded value,
+  at most SESSION_SHARD_BYTES each, so no value runs into Firestore's 1 MiB
+  document limit.
+- `sessions/{session_id}/events/{first}` holds the events of one turn (a
+  history chunk), keyed by the index of its first event.
+- `sessions/{session_id}/speculative/{kind}~{agent}` holds a background
+  agent result until a turn collects it (written by app/speculation.py).
+
+Payloads (offloaded values, referenced values, history chunks) of
+SESSION_COMPRESS_MIN_BYTES or more are stored zlib-compressed. `load` returns
+a `LazyState`: offloaded and referenced values are only read when a phase
+first accesses them, so a Q&A turn never downloads the Pass 2 reports.
+
+Kept free of ADK imports so that scripts/benchmark_session_writes.py can run it
+against app/fakes.py.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+try:
+    from google.cloud.firestore import DELETE_FIELD
+except ImportError:  # Lets the writer run against app/fakes.py without the SDK.
+    DELETE_FIELD = object()
+
+logger = logging.getLogger(__name__)
+
+SESSION_COLLECTION = os.environ.get("SESSION_COLLECTION", "sessions")
+SESSION_REF_COLLECTION = os.environ.get("SESSION_REF_COLLECTION", "session_blobs")
+SESSION_REF_KEYS = [k.strip() for k in os.environ.get("SESSION_REF_KEYS", "ranked_frameworks").split(",") if k.strip()]
+# Smaller values of SESSION_REF_KEYS are stored inline; a reference would not save anything.
+SESSION_REF_MIN_BYTES = int(os.environ.get("SESSION_REF_MIN_BYTES", "4096"))
+SESSION_OFFLOAD_MIN_BYTES = int(os.environ.get("SESSION_OFFLOAD_MIN_BYTES", "4096"))
+# Well below the 1 MiB document limit, leaving room for the shard's other fields.
+SESSION_SHARD_BYTES = int(os.environ.get("SESSION_SHARD_BYTES", str(512 * 1024)))
+SESSION_COMPRESS_MIN_BYTES = int(os.environ.get("SESSION_COMPRESS_MIN_BYTES", "2048"))
+STATE_SUBCOLLECTION = "state"
+EVENTS_SUBCOLLECTION = "events"
+# Results of background agent runs (see app/speculation.py), deleted with the session.
+SPECULATIVE_SUBCOLLECTION = "speculative"
+# State keys with this prefix live for one invocation only (ADK convention) and are never written.
+TEMP_PREFIX = "temp:"
+
+_SIMPLE_FIELD = re.compile(r"^[A-Za-z_][A-Za-z_0-9]*$")
+
+
+def field_path(*parts: str) -> str:
+    """A Firestore field path, with backtick quoting for names that need it."""
+    return ".".join(p if _SIMPLE_FIELD.match(p) else "`" + p.replace("\\", "\\\\").replace("`", "\\`") + "`"
+                    for p in parts)
+
+
+def canonical_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def fingerprint(encoded: str) -> str:
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def pack(encoded: str, compress_min_bytes: int = SESSION_COMPRESS_MIN_BYTES) -> Tuple[str, Any]:
+    """Returns ("zlib", compressed bytes) for large JSON payloads and ("json", encoded) for small ones."""
+    raw = encoded.encode("utf-8")
+    if len(raw) >= compress_min_bytes:
+        return "zlib", zlib.compress(raw)
+    return "json", encoded
+
+
+def unpack(data: Dict[str, Any]) -> Any:
+    """Decodes a payload written by `pack`, stored as `{"zlib": ...}` or `{"json": ...}`."""
+    if "zlib" in data:
+        return json.loads(zlib.decompress(data["zlib"]).decode("utf-8"))
+    return json.loads(data["json"])
+
+
+def shard_id(key: str, index: int) -> str:
+    # Document ids may not contain "/".
+    return f"{quote(key, safe='')}~{index}"
+
+
+class LazyState(dict):
+    """
+    A session state dict whose offloaded values are fetched on first access.
+
+    Unread values are held back in `_pending` and read through `loader(key,
+    placeholder)`; anything that needs them all (`items()`, `values()`,
+    `copy()`, `dict(state)`, JSON encoding) reads them all. Writing or deleting
+    a key drops its pending placeholder.
+    """
+
+    def __init__(self, values: Dict[str, Any], placeholders: Dict[str, Any],
+                 loader: Callable[[str, Any], Any]):
+        super().__init__(values)
+        for key in placeholders:
+            dict.__setitem__(self, key, None)
+        self._pending = dict(placeholders)
+        self._loader = loader
+        self._lock = threading.Lock()
+
+    def _materialize(self, key: str) -> None:
+        if key not in self._pending:
+            return
+        with self._lock:
+            if key in self._pending:
+                dict.__setitem__(self, key, self._loader(key, self._pending[key]))
+                del self._pending[key]
+
+    def _materialize_all(self) -> None:
+        for key in list(self._pending):
+            self._materialize(key)
+
+    def unloaded_keys(self) -> set:
+        return set(self._pending)
+
+    def __getitem__(self, key):
+        self._materialize(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __setitem__(self, key, value):
+        self._pending.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._pending.pop(key, None)
+        dict.__delitem__(self, key)
+
+    def __iter__(self):
+        # Overriding iteration keeps dict(state) and {**state} on keys() + __getitem__,
+        # which materialize, instead of copying the raw slots.
+        return dict.__iter__(self)
+
+    def pop(self, key, *default):
+        self._materialize(key)
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self._materialize_all()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        self._materialize(key)
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        self._pending.clear()
+        dict.clear(self)
+
+    def items(self):
+        self._materialize_all()
+        return dict.items(self)
+
+    def values(self):
+        self._materialize_all()
+        return dict.values(self)
+
+    def copy(self):
+        self._materialize_all()
+        return dict(dict.items(self))
+
+    def __eq__(self, other):
+        self._materialize_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"LazyState({dict.__repr__(self)}, unloaded={sorted(self._pending)})"
+
+
+class SessionWriter:
+    """
+    Session state and event persistence with per-key deltas and one commit per flush.
+
+    Args:
+        client_factory: Returns the Firestore client.
+        collection: Collection holding the session documents.
+        ref_collection: Collection holding values stored by reference.
+        ref_keys: State keys whose (large, immutable) values are stored by reference.
+        ref_min_bytes: Smaller values of `ref_keys` are stored inline.
+        offload_min_bytes: Other values this large are moved to the `state` subcollection.
+        shard_bytes: Largest payload stored in one subcollection document.
+        compress_min_bytes: Payloads this large are compressed.
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], collection: str = SESSION_COLLECTION,
+                 ref_collection: str = SESSION_REF_COLLECTION, ref_keys: Optional[List[str]] = None,
+                 ref_min_bytes: int = SESSION_REF_MIN_BYTES, offload_min_bytes: int = SESSION_OFFLOAD_MIN_BYTES,
+                 shard_bytes: int = SESSION_SHARD_BYTES, compress_min_bytes: int = SESSION_COMPRESS_MIN_BYTES):
+        self.client_factory = client_factory
+        self.collection = collection
+        self._ref_collection = ref_collection
+        self._ref_keys = set(SESSION_REF_KEYS if ref_keys is None else ref_keys)
+        self._ref_min_bytes = ref_min_bytes
+        self._offload_min_bytes = offload_min_bytes
+        self._shard_bytes = shard_bytes
+        # Payloads that need sharding are always compressed; JSON text cannot be split by bytes.
+        self._compress_min_bytes = min(compress_min_bytes, shard_bytes)
+        self._lock = threading.RLock()
+        # session id -> {key: fingerprint} of what the session document holds.
+        self._persisted: Dict[str, Dict[str, str]] = {}
+        # session id -> {key: shard count} of the offloaded values.
+        self._shards: Dict[str, Dict[str, int]] = {}
+        # session id -> (live state dict, metadata, buffered event dicts).
+        self._pending: Dict[str, Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]] = {}
+        self._event_counts: Dict[str, int] = {}
+        self._event_chunks: Dict[str, List[int]] = {}
+        self._known_refs: set = set()
+        self._ref_cache: Dict[str, Any] = {}
+        self._counters = {"commits": 0, "fields_written": 0, "fields_deleted": 0, "events_written": 0,
+                          "event_chunks_written": 0, "bytes_written": 0, "full_state_bytes": 0,
+                          "refs_written": 0, "refs_reused": 0, "values_offloaded": 0, "shards_written": 0,
+                          "shards_deleted": 0, "uncompressed_bytes": 0, "lazy_loads": 0, "bytes_read": 0}
+
+    def _document(self, session_id: str):
+        return self.client_factory().collection(self.collection).document(session_id)
+
+    # --- Reads ---
+
+    def load(self, session_id: str, recent_events: Optional[int] = None
+             ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Returns (state, metadata, events) of a stored session, or None. Pending
+        writes are flushed first. `state` is a `LazyState`; `recent_events`
+        limits the history to the last n events (None reads it all).
+        """
+        self.flush(session_id)
+        document = self._document(session_id)
+        snapshot = document.get()
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict() or {}
+        self._counters["bytes_read"] += len(canonical_json(data))
+        stored_state = data.pop("state", None) or {}
+        chunks = list(data.get("event_chunks") or [])
+        values, placeholders, persisted, shards = {}, {}, {}, {}
+        for key, value in stored_state.items():
+            if isinstance(value, dict) and "__offload__" in value:
+                placeholders[key] = value
+                persisted[key] = value["__offload__"]
+                shards[key] = int(value.get("shards", 1))
+            elif isinstance(value, dict) and set(value) == {"__ref__"}:
+                placeholders[key] = value
+                persisted[key] = value["__ref__"]
+            else:
+                values[key] = value
+                persisted[key] = fingerprint(canonical_json(value))
+        state = LazyState(values, placeholders, lambda key, placeholder: self._read_value(session_id, key, placeholder))
+        event_count = int(data.get("event_count", 0))
+        events = self._read_events(document, chunks, event_count, recent_events)
+        with self._lock:
+            self._persisted[session_id] = {k: v for k, v in persisted.items() if not k.startswith(TEMP_PREFIX)}
+            self._shards[session_id] = shards
+            self._event_counts[session_id] = event_count
+            self._event_chunks[session_id] = chunks
+        return state, data, events
+
+    def _read_value(self, session_id: str, key: str, placeholder: Dict[str, Any]) -> Any:
+        self._counters["lazy_loads"] += 1
+        if "__ref__" in placeholder:
+            return self._resolve(placeholder["__ref__"])
+        digest = placeholder["__offload__"]
+        collection = self._document(session_id).collection(STATE_SUBCOLLECTION)
+        parts = []
+        for i in range(int(placeholder.get("shards", 1))):
+            snapshot = collection.document(shard_id(key, i)).get()
+            shard = snapshot.to_dict() if snapshot.exists else None
+            if not shard or shard.get("sha") != digest:
+                raise RuntimeError(f"Session {session_id}: shard {i} of '{key}' is missing or was rewritten "
+                                   f"while it was being read.")
+            parts.append(shard)
+        if "zlib" in parts[0]:
+            payload = {"zlib": b"".join(part["zlib"] for part in parts)}
+        else:
+            payload = {"json": "".join(part["json"] for part in parts)}
+        self._counters["bytes_read"] += sum(len(v) for v in payload.values())
+        return unpack(payload)
+
+    def _resolve(self, ref: str) -> Any:
+        if ref not in self._ref_cache:
+            snapshot = self.client_factory().collection(self._ref_collection).document(ref).get()
+            # Referenced values are immutable, so they can be cached for good.
+            self._ref_cache[ref] = unpack(snapshot.to_dict()) if snapshot.exists else None
+            self._known_refs.add(ref)
+        # Each session gets its own copy: state values are mutated in place.
+        return copy.deepcopy(self._ref_cache[ref])
+
+    def _read_events(self, document, chunks: List[int], event_count: int,
+                     recent_events: Optional[int]) -> List[Dict[str, Any]]:
+        collection = document.collection(EVENTS_SUBCOLLECTION)
+        if recent_events is not None and chunks:
+            # Chunks are keyed by their first event: read only those reaching past the boundary.
+            boundary = event_count - recent_events
+            ends = chunks[1:] + [event_count]
+            snapshots = [collection.document(f"{first:06d}").get()
+                         for first, end in zip(chunks, ends) if end > boundary]
+        else:
+            snapshots = sorted(collection.stream(), key=lambda s: s.id)
+        events = []
+        for snapshot in snapshots:
+            data = snapshot.to_dict() if snapshot.exists else None
+            if not data:
+                continue
+            if "count" not in data:  # One document per event, as written before history chunks.
+                events.append(data)
+                continue
+            events.extend(unpack(data))
+        if recent_events is not None:
+            events = events[-recent_events:] if recent_events else []
+        return events
+
+    # --- Writes ---
+
+    def stage(self, session_id: str, state: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None,
+              event: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Marks a session dirty. `state` is the live state dict: it is read at
+        flush time, so later in-place mutations are persisted too.
+        """
+        with self._lock:
+            _, pending_metadata, events = self._pending.get(session_id, (state, {}, []))
+            pending_metadata.update(metadata or {})
+            if event is not None:
+                events.append(event)
+            self._pending[session_id] = (state, pending_metadata, events)
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            self._pending.pop(session_id, None)
+            self._persisted.pop(session_id, None)
+            self._shards.pop(session_id, None)
+            self._event_counts.pop(session_id, None)
+            self._event_chunks.pop(session_id, None)
+
+    def delete(self, session_id: str) -> None:
+        """Deletes a session with its offloaded values and history."""
+        self.discard(session_id)
+        document = self._document(session_id)
+        for name in (STATE_SUBCOLLECTION, EVENTS_SUBCOLLECTION, SPECULATIVE_SUBCOLLECTION):
+            for snapshot in document.collection(name).stream():
+                snapshot.reference.delete()
+        document.delete()
+
+    @property
+    def dirty(self) -> List[str]:
+        with self._lock:
+            return list(self._pending)
+
+    def flush(self, session_id: Optional[str] = None) -> int:
+        """Commits the pending writes of one session (or all); returns the number of commits made."""
+        with self._lock:
+            ids = [session_id] if session_id is not None else list(self._pending)
+            batches = [(sid, self._pending.pop(sid)) for sid in ids if sid in self._pending]
+        return sum(self._commit(sid, *pending) for sid, pending in batches)
+
+    def _live_items(self, state: Dict[str, Any]) -> Iterable[Tuple[str, Any, bool]]:
+        """Yields (key, value, loaded); values a `LazyState` has not read yet are unchanged by definition."""
+        unloaded = state.unloaded_keys() if isinstance(state, LazyState) else set()
+        for key in list(state):
+            if key.startswith(TEMP_PREFIX):
+                continue
+            if key in unloaded:
+                yield key, None, False
+            else:
+                yield key, dict.get(state, key), True
+
+    def _commit(self, session_id: str, state: Dict[str, Any], metadata: Dict[str, Any],
+                events: List[Dict[str, Any]]) -> int:
+        client = self.client_factory()
+        document = self._document(session_id)
+        state_collection = document.collection(STATE_SUBCOLLECTION)
+        batch = client.batch()
+        persisted = self._persisted.get(session_id)
+        new_session = persisted is None
+        persisted = dict(persisted or {})
+        shards = dict(self._shards.get(session_id, {}))
+        counters = {key: 0 for key in self._counters}
+
+        changed: Dict[str, Any] = {}
+        full_bytes = 0
+        live_keys = set()
+        for key, value, loaded in self._live_items(state):
+            live_keys.add(key)
+            if not loaded:
+                continue
+            encoded = canonical_json(value)
+            full_bytes += len(encoded)
+            digest = fingerprint(encoded)
+            if persisted.get(key) == digest:
+                continue
+            stored: Any = value
+            shard_count = 0
+            if key in self._ref_keys and len(encoded) >= self._ref_min_bytes:
+                stored = {"__ref__": digest}
+                if digest in self._known_refs:
+                    counters["refs_reused"] += 1
+                else:
+                    codec, payload = pack(encoded, self._compress_min_bytes)
+                    batch.set(client.collection(self._ref_collection).document(digest), {codec: payload})
+                    self._known_refs.add(digest)
+                    self._ref_cache[digest] = json.loads(encoded)
+                    counters["refs_written"] += 1
+                    counters["bytes_written"] += len(payload)
+                    counters["uncompressed_bytes"] += len(encoded)
+            elif len(encoded) >= self._offload_min_bytes:
+                codec, payload = pack(encoded, self._compress_min_bytes)
+                parts = [payload[i:i + self._shard_bytes] for i in range(0, len(payload), self._shard_bytes)]
+                for i, part in enumerate(parts):
+                    batch.set(state_collection.document(shard_id(key, i)), {"sha": digest, codec: part})
+                shard_count = len(parts)
+                stored = {"__offload__": digest, "shards": shard_count}
+                counters["values_offloaded"] += 1
+                counters["shards_written"] += shard_count
+                counters["bytes_written"] += len(payload)
+                counters["uncompressed_bytes"] += len(encoded)
+            # Shards left over from a larger earlier value of this key.
+            for i in range(shard_count, shards.get(key, 0)):
+                batch.delete(state_collection.document(shard_id(key, i)))
+                counters["shards_deleted"] += 1
+            if shard_count:
+                shards[key] = shard_count
+            else:
+                shards.pop(key, None)
+            changed[key] = stored
+            counters["bytes_written"] += len(canonical_json(stored))
+            persisted[key] = digest
+        deleted = [key for key in persisted if key not in live_keys]
+        for key in deleted:
+            del persisted[key]
+            for i in range(shards.pop(key, 0)):
+                batch.delete(state_collection.document(shard_id(key, i)))
+                counters["shards_deleted"] += 1
+
+        event_count = self._event_counts.get(session_id, 0)
+        chunks = list(self._event_chunks.get(session_id, []))
+        for chunk in self._chunk_events(events):
+            encoded = canonical_json(chunk)
+            codec, payload = pack(encoded, self._compress_min_bytes)
+            batch.set(document.collection(EVENTS_SUBCOLLECTION).document(f"{event_count:06d}"),
+                      {"count": len(chunk), codec: payload})
+            chunks.append(event_count)
+            event_count += len(chunk)
+            counters["event_chunks_written"] += 1
+            counters["bytes_written"] += len(payload)
+            counters["uncompressed_bytes"] += len(encoded)
+        if events:
+            metadata = {**metadata, "event_count": event_count, "event_chunks": chunks}
+
+        if not changed and not deleted and not events and not new_session:
+            return 0
+        metadata = {**metadata, "last_update_time": metadata.get("last_update_time", time.time())}
+        if new_session:
+            # The first write creates the document, with the state as a map.
+            batch.set(document, {**metadata, "state": changed}, merge=True)
+        else:
+            updates = {field_path("state", key): value for key, value in changed.items()}
+            updates.update({field_path("state", key): DELETE_FIELD for key in deleted})
+            batch.update(document, {**metadata, **updates})
+        batch.commit()
+
+        with self._lock:
+            self._persisted[session_id] = persisted
+            self._shards[session_id] = shards
+            self._event_counts[session_id] = event_count
+            self._event_chunks[session_id] = chunks
+            for name, value in counters.items():
+                self._counters[name] += value
+            self._counters["commits"] += 1
+            self._counters["fields_written"] += len(changed)
+            self._counters["fields_deleted"] += len(deleted)
+            self._counters["events_written"] += len(events)
+            self._counters["full_state_bytes"] += full_bytes
+        return 1
+
+    def _chunk_events(self, events: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Splits a turn's events into chunks whose JSON stays under the shard size."""
+        chunks, current, size = [], [], 0
+        for event in events:
+            event_bytes = len(canonical_json(event))
+            if current and size + event_bytes > self._shard_bytes:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(event)
+            size += event_bytes
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def stats(self) -> Dict[str, Any]:
+        c = self._counters
+        return {**c, "pending_sessions": len(self._pending),
+                "write_ratio": round(c["bytes_written"] / c["full_state_bytes"], 3) if c["full_state_bytes"] else 1.0}
@@ -0,0 +1,283 @@
+"""
+Work the orchestrator starts ahead of the turn that needs it.
+
+- Speculative Pass 1: as soon as ranking returns, Pass 1 starts for the
+  top SPECULATIVE_PASS1_TOP_N frameworks while the user is still choosing.
+  Runs for frameworks the user does not pick are cancelled or discarded.
+- Background Pass 2: agents that answered SUFFICIENT in Pass 1 run Pass 2
+  while the user is still answering other agents' questions.
+
+Both use `BackgroundRuns`. Its tasks live on the server's event loop across
+turns. A run works on its own copy of the inputs it needs and hands its
+result over only through `collect`. Each finished result is also written to
+its own document, `sessions/{session_id}/speculative/{kind}~{agent}`, so a
+turn served by another instance (or after a restart) can pick it up instead of
+repeating the call; the session document itself, owned by the session
+service, is never touched. Collected and discarded results are deleted.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from .session_store import SPECULATIVE_SUBCOLLECTION, pack, unpack
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_PASS1 = os.environ.get("SPECULATIVE_PASS1", "true").lower() == "true"
+SPECULATIVE_PASS1_TOP_N = int(os.environ.get("SPECULATIVE_PASS1_TOP_N", "6"))
+SPECULATIVE_PASS2 = os.environ.get("SPECULATIVE_PASS2", "true").lower() == "true"
+# How long a turn waits for an in-flight background run before making the call itself.
+SPECULATIVE_WAIT_SECONDS = float(os.environ.get("SPECULATIVE_WAIT_SECONDS", "120"))
+# Finished results nobody collected (abandoned sessions) are dropped after this long.
+SPECULATIVE_RESULT_TTL_SECONDS = float(os.environ.get("SPECULATIVE_RESULT_TTL_SECONDS", "3600"))
+
+# Characters of operating instructions each framework agent wraps around its
+# knowledge base (measured from the agents' PROMPT_TEMPLATEs), for token estimates.
+PROMPT_OVERHEAD_CHARS = 2200
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _description_chars(agent_name: str) -> int:
+    filename = f"{agent_name.removesuffix('_agent')}.md"
+    for directory in (Path(__file__).parent.parent.parent.parent / "scripts" / "framework_descriptions",
+                      Path("/scripts/framework_descriptions")):
+        path = directory / filename
+        if path.exists():
+            return len(path.read_text(encoding="utf-8"))
+    return 0
+
+
+def estimate_call_tokens(agent_name: str, query: str, response: Any = None) -> Dict[str, int]:
+    """Approximate prompt and response tokens of one framework agent call."""
+    prompt_chars = PROMPT_OVERHEAD_CHARS + _description_chars(agent_name) + len(query)
+    response_chars = len(response) if isinstance(response, str) else len(str(response or ""))
+    return {"prompt": prompt_chars // CHARS_PER_TOKEN, "response": response_chars // CHARS_PER_TOKEN}
+
+
+class BackgroundRuns:
+    """
+    Registry of background agent runs, keyed by (session id, agent name).
+
+    Args:
+        client_factory: Returns the Firestore client used to persist results
+            (None disables persistence).
+        collection: Collection holding the session documents.
+        kind: Prefix of the result documents' ids (e.g. "pass2"), which keeps
+            the registries of one session apart.
+        label: Name used in log lines.
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], collection: str = "sessions",
+                 kind: str = "pass2", label: str = "Pass 2"):
+        self._client_factory = client_factory
+        self._collection = collection
+        self._kind = kind
+        self._label = label
+        self._tasks: Dict[Tuple[str, str], Tuple[asyncio.Task, float]] = {}
+        self._counters = {"started": 0, "completed": 0, "failed": 0, "collected_ready": 0,
+                          "collected_waited": 0, "collected_persisted": 0, "missed": 0, "discarded": 0}
+
+    def start(self, session_id: str, agent_name: str, run: Callable[[], Awaitable[Any]]) -> None:
+        """Schedules `run()` (which returns the agent's result) on the running loop."""
+        self._expire()
+        key = (session_id, agent_name)
+        if key in self._tasks:
+            return
+        task = asyncio.create_task(self._run_and_persist(session_id, agent_name, run))
+        self._tasks[key] = (task, time.monotonic())
+        self._counters["started"] += 1
+
+    async def _run_and_persist(self, session_id: str, agent_name: str, run: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await run()
+        except Exception as e:
+            self._counters["failed"] += 1
+            logger.warning(f"Background {self._label} for {agent_name} in session {session_id} failed: {e}")
+            # A missing result is simply re-requested by the turn that needs it.
+            return None
+        if result is None:
+            self._counters["failed"] += 1
+            return None
+        self._counters["completed"] += 1
+        try:
+            await asyncio.to_thread(self._persist, session_id, agent_name, result)
+        except Exception as e:
+            logger.warning(f"Could not persist background {self._label} result for {agent_name}: {e}")
+        return result
+
+    def _results(self, session_id: str):
+        client = self._client_factory()
+        if client is None:
+            return None
+        return client.collection(self._collection).document(session_id).collection(SPECULATIVE_SUBCOLLECTION)
+
+    def _persist(self, session_id: str, agent_name: str, result: Any) -> None:
+        results = self._results(session_id)
+        if results is None:
+            return
+        codec, payload = pack(json.dumps(result))
+        results.document(f"{self._kind}~{agent_name}").set({codec: payload, "created_at": time.time()})
+
+    def _load_persisted(self, session_id: str, agent_names: List[str]) -> Dict[str, Any]:
+        results = self._results(session_id)
+        if results is None:
+            return {}
+        loaded = {}
+        for name in agent_names:
+            snapshot = results.document(f"{self._kind}~{name}").get()
+            if snapshot.exists:
+                loaded[name] = unpack(snapshot.to_dict())
+        return loaded
+
+    def _forget_persisted(self, session_id: str, agent_names: List[str]) -> None:
+        results = self._results(session_id)
+        if results is None:
+            return
+        for name in agent_names:
+            results.document(f"{self._kind}~{name}").delete()
+
+    def _forget_later(self, session_id: str, agent_names: List[str]) -> None:
+        async def forget():
+            try:
+                await asyncio.to_thread(self._forget_persisted, session_id, agent_names)
+            except Exception as e:
+                logger.warning(f"Could not delete persisted background {self._label} results for session {session_id}: {e}")
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # Not on the event loop; the documents go with the session.
+            return
+        if agent_names:
+            loop.create_task(forget())
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - SPECULATIVE_RESULT_TTL_SECONDS
+        for key, (task, started) in list(self._tasks.items()):
+            if task.done() and started < cutoff:
+                del self._tasks[key]
+
+    async def collect(self, session_id: str, agent_names: List[str],
+                      timeout: float = SPECULATIVE_WAIT_SECONDS) -> Dict[str, Any]:
+        """
+        Returns agent name -> result for every agent in `agent_names` whose
+        background run succeeded, waiting up to `timeout` for runs still in
+        flight in this process. Agents missing from the result must be run by
+        the caller.
+        """
+        results: Dict[str, Any] = {}
+        pending = {}
+        for name in agent_names:
+            entry = self._tasks.pop((session_id, name), None)
+            if entry is None:
+                continue
+            task = entry[0]
+            if task.done():
+                if not task.cancelled() and task.result() is not None:
+                    results[name] = task.result()
+                    self._counters["collected_ready"] += 1
+            else:
+                pending[name] = task
+
+        if pending:
+            done, not_done = await asyncio.wait(pending.values(), timeout=timeout)
+            for name, task in pending.items():
+                if task in done and task.result() is not None:
+                    results[name] = task.result()
+                    self._counters["collected_waited"] += 1
+            for task in not_done:
+                task.cancel()
+
+        # Runs started by another instance, or before a restart, only exist in Firestore.
+        missing = [name for name in agent_names if name not in results]
+        if missing:
+            try:
+                persisted = await asyncio.to_thread(self._load_persisted, session_id, missing)
+            except Exception as e:
+                logger.warning(f"Could not load persisted background {self._label} results for session {session_id}: {e}")
+                persisted = {}
+            for name in missing:
+                if name in persisted:
+                    results[name] = persisted[name]
+                    self._counters["collected_persisted"] += 1
+                else:
+                    self._counters["missed"] += 1
+        # A result is handed over once; the caller keeps it in the session from here on.
+        self._forget_later(session_id, list(results))
+        return results
+
+    def discard(self, session_id: str, agent_names: List[str]) -> Dict[str, Any]:
+        """
+        Cancels the runs for `agent_names` that are still in flight and drops
+        the finished ones. Returns agent name -> result (None if it had not
+        finished) for every run that existed.
+        """
+        discarded = {}
+        for name in agent_names:
+            entry = self._tasks.pop((session_id, name), None)
+            if entry is None:
+                continue
+            task = entry[0]
+            if task.done():
+                discarded[name] = None if task.cancelled() else task.result()
+            else:
+                task.cancel()
+                discarded[name] = None
+            self._counters["discarded"] += 1
+        self._forget_later(session_id, list(discarded))
+        return discarded
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "in_flight": sum(1 for task, _ in self._tasks.values() if not task.done())}
+
+
+class SpeculationMetrics:
+    """
+    Process-wide counters for speculative Pass 1.
+
+    `hit_rate` is the share of selected frameworks whose Pass 1 result came
+    from speculation; `precision` is the share of speculative runs that were
+    used. Wasted tokens are estimated for runs the user did not select, counting
+    the prompt as spent whenever the run was started.
+    """
+
+    def __init__(self):
+        self._counters = {"sessions": 0, "speculated": 0, "selected": 0, "hits": 0, "wasted_calls": 0,
+                          "wasted_prompt_tokens": 0, "wasted_response_tokens": 0}
+
+    def observe(self, speculated: List[str], selected: List[str], hits: List[str], discarded: Dict[str, Any],
+                query: str) -> Dict[str, Any]:
+        """Adds one session's outcome and returns its own summary."""
+        wasted_prompt = wasted_response = 0
+        for name, result in discarded.items():
+            tokens = estimate_call_tokens(name, query, result)
+            wasted_prompt += tokens["prompt"]
+            wasted_response += tokens["response"]
+        c = self._counters
+        c["sessions"] += 1
+        c["speculated"] += len(speculated)
+        c["selected"] += len(selected)
+        c["hits"] += len(hits)
+        c["wasted_calls"] += len(discarded)
+        c["wasted_prompt_tokens"] += wasted_prompt
+        c["wasted_response_tokens"] += wasted_response
+        summary = {
+            "speculated": list(speculated), "selected": list(selected), "hits": list(hits),
+            "wasted_calls": len(discarded), "wasted_tokens": wasted_prompt + wasted_response,
+        }
+        logger.info(f"Speculative Pass 1: {len(hits)}/{len(selected)} selected agents served from speculation, "
+                    f"{len(discarded)} runs discarded (~{summary['wasted_tokens']} tokens). Totals: {self.stats()}")
+        return summary
+
+    def stats(self) -> Dict[str, Any]:
+        c = self._counters
+        return {
+            **c,
+            "hit_rate": round(c["hits"] / c["selected"], 3) if c["selected"] else 0.0,
+            "precision": round(c["hits"] / c["speculated"], 3) if c["speculated"] else 0.0,
+        }
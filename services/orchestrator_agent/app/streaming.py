@@ -0,0 +1,347 @@
+"""
+Incremental parsing of framework agent responses while they stream in.
+
+Framework agents answer with a single JSON object, and the LLM generating it
+writes the fields in order. `AgentReplyParser` decodes each top-level field as
+soon as its value is complete, so the orchestrator can act on a partial reply:
+
+- Pass 1: `pass1_decision` tells from `status` and `questions` alone whether
+  the agent needs answers; the rest of the body is not waited for (and under
+  the single-shot protocol, a COMPLETE report finishes in the background).
+- Pass 2: each report section can be shown to the user as it completes.
+
+Kept free of ADK imports so that scripts/benchmark_streaming.py can use it.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Response envelope keys holding the agent's JSON as a string; see remote_agent.agent_output.
+ENVELOPE_KEYS = ("output", "response", "text")
+
+_SCALAR_END = frozenset(",]} \t\r\n")
+_WHITESPACE = frozenset(" \t\r\n")
+
+Path = Tuple[Any, ...]
+
+
+class _Frame:
+    __slots__ = ("kind", "path", "start", "key", "expect_key")
+
+    def __init__(self, kind: str, path: Path, start: int):
+        self.kind = kind
+        self.path = path
+        self.start = start
+        # Current member key (objects) or element index (arrays).
+        self.key: Any = None if kind == "{" else 0
+        self.expect_key = kind == "{"
+
+
+class JSONStreamParser:
+    """
+    Parses one JSON document fed in arbitrary chunks.
+
+    `feed(text)` returns the values completed by that chunk, innermost first,
+    as (path, value) pairs, where `path` holds the object keys and array
+    indexes leading to the value: `(("status",), "NEED_INFO")`, then
+    `(("questions", 0), "Budget?")`, ..., and finally `((), <document>)`.
+    Only values at most `depth` levels deep are decoded and reported (the
+    document itself always is); deeper ones are skipped over. A bare number,
+    `true`, `false` or `null` has no closing character, so as a whole document
+    it is only complete once `close()` ends the input.
+
+    Args:
+        depth: Deepest level reported.
+        text_paths: Paths of string values that are also passed to `on_text`
+            piecewise, as their characters arrive.
+        on_text: Called with (path, decoded fragment).
+        skip_prefix: Ignore text before the document (e.g. a ```json fence), which must
+            then be an object or array.
+    """
+
+    def __init__(self, depth: int = 1, text_paths: Iterable[Path] = (),
+                 on_text: Optional[Callable[[Path, str], None]] = None, skip_prefix: bool = False):
+        self.depth = depth
+        self.text_paths = set(text_paths)
+        self.on_text = on_text
+        self.skip_prefix = skip_prefix
+        self.done = False
+        self.value: Any = None
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        # The string or scalar being scanned: (start offset, path, is key), and where to resume.
+        self._token: Optional[Tuple[int, Path, bool]] = None
+        self._resume = 0
+        self._text_from = 0
+
+    def _path(self) -> Path:
+        if not self._stack:
+            return ()
+        top = self._stack[-1]
+        return top.path + (top.key,)
+
+    def _complete(self, path: Path, start: int, end: int, events: List[Tuple[Path, Any]]) -> None:
+        if len(path) <= self.depth or not path:
+            value = json.loads(self._buf[start:end])
+            events.append((path, value))
+            if not path:
+                self.done = True
+                self.value = value
+
+    def feed(self, text: str) -> List[Tuple[Path, Any]]:
+        events: List[Tuple[Path, Any]] = []
+        if self.done:
+            return events
+        self._buf += text
+        buf, i, n = self._buf, self._pos, len(self._buf)
+        while i < n and not self.done:
+            if self._token is not None:
+                start, path, is_key = self._token
+                if buf[start] == '"':
+                    end = self._scan_string(start, n)
+                    if path in self.text_paths and not is_key:
+                        self._emit_text(path, end if end >= 0 else n, final=end >= 0)
+                    if end < 0:
+                        i = n
+                        break
+                    self._token = None
+                    i = end + 1
+                    if is_key:
+                        self._stack[-1].key = json.loads(buf[start:i])
+                    else:
+                        self._complete(path, start, i, events)
+                else:
+                    end = self._resume
+                    while end < n and buf[end] not in _SCALAR_END:
+                        end += 1
+                    if end == n:
+                        self._resume = n
+                        i = n
+                        break
+                    self._token = None
+                    self._complete(path, start, end, events)
+                    i = end
+                continue
+
+            c = buf[i]
+            if c in _WHITESPACE:
+                i += 1
+            elif not self._stack and self.skip_prefix and c not in "{[":
+                i += 1
+            elif c == '"':
+                top = self._stack[-1] if self._stack else None
+                is_key = top is not None and top.kind == "{" and top.expect_key
+                self._token = (i, self._path(), is_key)
+                self._resume = i + 1
+                self._text_from = i + 1
+                i += 1
+            elif c in "{[":
+                self._stack.append(_Frame(c, self._path(), i))
+                i += 1
+            elif c in "}]":
+                if not self._stack:
+                    raise ValueError(f"Unexpected '{c}' at offset {i}")
+                frame = self._stack.pop()
+                i += 1
+                self._complete(frame.path, frame.start, i, events)
+            elif c == ":":
+                self._stack[-1].expect_key = False
+                i += 1
+            elif c == ",":
+                top = self._stack[-1] if self._stack else None
+                if top is None:
+                    raise ValueError(f"Unexpected ',' at offset {i}")
+                if top.kind == "{":
+                    top.expect_key = True
+                else:
+                    top.key += 1
+                i += 1
+            else:
+                self._token = (i, self._path(), False)
+                self._resume = i
+        self._pos = i
+        return events
+
+    def close(self) -> List[Tuple[Path, Any]]:
+        """Ends the input, completing a bare top-level scalar; raises ValueError if the document is incomplete."""
+        events: List[Tuple[Path, Any]] = []
+        if not self.done and self._token is not None and not self._stack and self._buf[self._token[0]] != '"':
+            self._complete((), self._token[0], len(self._buf), events)
+        if not self.done:
+            raise ValueError("Incomplete JSON document")
+        return events
+
+    def _scan_string(self, start: int, n: int) -> int:
+        """Offset of the closing quote of the string opened at `start`, or -1 if it has not arrived yet."""
+        buf = self._buf
+        i = self._resume
+        while True:
+            q = buf.find('"', i, n)
+            if q < 0:
+                self._resume = n
+                return -1
+            backslashes = 0
+            k = q - 1
+            while k > start and buf[k] == "\\":
+                backslashes += 1
+                k -= 1
+            if backslashes % 2 == 0:
+                return q
+            i = q + 1
+
+    def _emit_text(self, path: Path, end: int, final: bool) -> None:
+        if self.on_text is None or end <= self._text_from:
+            return
+        raw = self._buf[self._text_from:end]
+        # Hold back an escape sequence cut off by the chunk boundary (at most "\uXXXX").
+        for cut in range(1 if final else min(6, len(raw)) + 1):
+            candidate = raw[:len(raw) - cut] if cut else raw
+            try:
+                text = json.loads(f'"{candidate}"')
+            except json.JSONDecodeError:
+                continue
+            if not final and text and "\ud800" <= text[-1] <= "\udbff":
+                continue  # Half of a surrogate pair.
+            if text:
+                self.on_text(path, text)
+            self._text_from += len(candidate)
+            return
+        if final:
+            raise ValueError(f"Invalid string at {path}")
+
+
+class AgentReplyParser:
+    """
+    Parses a framework agent's `/run` response as it streams in.
+
+    The response is either the agent's JSON object itself or an envelope whose
+    "output" (or "response" / "text") string holds it, as `agent_output`
+    reads it. In the envelope case the string is unescaped as it arrives and
+    parsed by a second parser that skips a leading ```json fence.
+
+    `feed` returns the agent's completed values as (path, value) pairs (see
+    `JSONStreamParser`) and records top-level fields in `fields`. If the
+    agent's output is not parseable JSON, `failed` is set and only the final
+    text (`text()`) is available.
+    """
+
+    def __init__(self, depth: int = 1):
+        self.depth = depth
+        self.fields: Dict[str, Any] = {}
+        self.failed = False
+        self._outer = JSONStreamParser(depth=depth, text_paths={(key,) for key in ENVELOPE_KEYS},
+                                       on_text=self._on_envelope_text)
+        self._inner: Optional[JSONStreamParser] = None
+        self._envelope_key: Optional[str] = None
+        self._inner_text: List[str] = []
+        self._inner_events: List[Tuple[Path, Any]] = []
+
+    def _on_envelope_text(self, path: Path, text: str) -> None:
+        if self._envelope_key is None:
+            self._envelope_key = path[0]
+            self._inner = JSONStreamParser(depth=self.depth, skip_prefix=True)
+        if path[0] != self._envelope_key:
+            return
+        self._inner_text.append(text)
+        if not self.failed:
+            try:
+                self._inner_events.extend(self._inner.feed(text))
+            except ValueError:
+                self.failed = True
+
+    def feed(self, text: str) -> List[Tuple[Path, Any]]:
+        outer_events = self._outer.feed(text)
+        if self._envelope_key is None:
+            events = outer_events
+        else:
+            if not self.failed and not self._inner.done and any(path == (self._envelope_key,) for path, _ in outer_events):
+                # The envelope string is complete, and so is the output in it (a bare scalar only ends here).
+                try:
+                    self._inner_events.extend(self._inner.close())
+                except ValueError:
+                    self.failed = True
+            events, self._inner_events = self._inner_events, []
+        for path, value in events:
+            if len(path) == 1:
+                self.fields[path[0]] = value
+        return events
+
+    def text(self) -> str:
+        """The agent's complete output, as `agent_output` would return it; raises ValueError if incomplete."""
+        self._outer.close()
+        if self._envelope_key is not None:
+            return "".join(self._inner_text)
+        value = self._outer.value
+        return value if isinstance(value, str) else json.dumps(value)
+
+
+def pass1_decision(fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The Pass 1 outcome once the decoded fields settle it, else None. NEED_INFO
+    and SUFFICIENT are settled by `status` plus `questions`; COMPLETE (single-shot
+    protocol) by `status` alone, and carries the report only if it came first.
+    """
+    status = fields.get("status")
+    if status in ("NEED_INFO", "SUFFICIENT") and "questions" in fields:
+        return {"status": status, "questions": fields["questions"]}
+    if status == "COMPLETE":
+        return {"status": status, "report": fields["report"]} if "report" in fields else {"status": status}
+    return None
+
+
+async def _read_pass1(open_stream: Callable[[], AsyncIterator[str]], decided: asyncio.Future) -> Optional[str]:
+    parser = AgentReplyParser()
+    chunks = open_stream()
+    streaming = False
+    try:
+        async for text in chunks:
+            parser.feed(text)
+            if streaming:
+                if "report" in parser.fields or parser.failed:
+                    break
+                continue
+            decision = None if parser.failed else pass1_decision(parser.fields)
+            if decision is None:
+                continue
+            streaming = decision["status"] == "COMPLETE" and "report" not in decision
+            if not streaming:
+                decided.set_result((json.dumps(decision), False))
+                return None
+            decision["report_streaming"] = True
+            decided.set_result((json.dumps(decision), True))
+        if not decided.done():
+            decided.set_result((parser.text(), False))
+            return None
+    finally:
+        await chunks.aclose()
+    report = parser.fields.get("report")
+    return json.dumps(report) if report is not None else None
+
+
+async def stream_pass1(open_stream: Callable[[], AsyncIterator[str]]) -> Tuple[str, Optional[asyncio.Task]]:
+    """
+    Reads a Pass 1 response from `open_stream()` up to its decision. Returns the
+    value to store under the agent's name (the decision, or the whole output if
+    it never settles one) and, for a single-shot COMPLETE whose report is still
+    to come, the task reading on to the report (it returns the report as JSON
+    text, or None); otherwise the stream is closed before this returns.
+
+    The stream is opened, read and closed by that one task from start to
+    finish, so it is never handed between tasks. Errors before the decision,
+    and cancellation, reach the caller; the stream is then closed.
+    """
+    decided = asyncio.get_running_loop().create_future()
+    reader = asyncio.create_task(_read_pass1(open_stream, decided))
+    try:
+        await asyncio.wait({decided, reader}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        reader.cancel()
+        raise
+    if not decided.done():
+        reader.result()  # Raises whatever ended the stream before the decision.
+    value, streaming = decided.result()
+    if streaming:
+        return value, reader
+    await reader
+    return value, None
@@ -1,9 +1,22 @@
+import logging
 import os
 import random
 import json
-from typing import List, Dict, Any
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 import google.generativeai as genai
 from google.cloud import firestore
+from pathlib import Path
+from .cassette import Cassette, CassetteEmbedder, CassetteFirestoreClient, CassetteModel
+from .catalog import CATALOG_FIELDS, FrameworkCatalog
+from .embedding_index import EmbeddingIndex
+from .scoring import CompiledCatalog
+from .query_cache import create_query_cache
+from .heuristics import classify_query
+from .lexical_index import load_default_index
+
+logger = logging.getLogger(__name__)
 
 # --- Initialization & Setup ---
 
@@ -15,13 +28,118 @@ except Exception as e:
     print(f"CRITICAL: Failed to initialize Firestore client. Error: {e}")
     db = None
 
+ANALYSIS_MODEL = 'gemini-2.5-pro'
+
 # Configure Generative AI client
 try:
-    llm = genai.GenerativeModel('gemini-2.5-pro')
+    llm = genai.GenerativeModel(ANALYSIS_MODEL)
 except Exception as e:
     print(f"Warning: Failed to initialize GenerativeModel. LLM-based ranking may not work. Error: {e}")
     llm = None
 
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+# Record/replay of every Gemini and Firestore call made from here (CASSETTE_MODE=record|replay,
+# see app/cassette.py). In replay mode the real clients are not needed.
+cassette = Cassette.from_env()
+if cassette.mode != "off":
+    if db is not None or cassette.replaying:
+        db = CassetteFirestoreClient(db, cassette)
+    if llm is not None or cassette.replaying:
+        llm = CassetteModel(llm, cassette, ANALYSIS_MODEL)
+    genai = CassetteEmbedder(genai, cassette)
+
+# Per-call timeout for the query embedding in the async ranking path (seconds).
+EMBED_TIMEOUT_SECONDS = float(os.environ.get("RANK_EMBED_TIMEOUT_SECONDS", "10"))
+
+# How query characteristics are obtained:
+# - "hedged" (default): the LLM analysis, replaced by the local heuristic classifier when it
+#   fails or misses ANALYSIS_LATENCY_BUDGET_SECONDS.
+# - "llm": the LLM analysis only; ranking returns [] if it fails or misses the budget.
+# - "local": the heuristic classifier only, with no network call.
+ANALYSIS_MODE = os.environ.get("ANALYSIS_MODE", "hedged").lower()
+ANALYSIS_LATENCY_BUDGET_SECONDS = float(os.environ.get("ANALYSIS_LATENCY_BUDGET_SECONDS", "8"))
+
+# Limits for rank_frameworks_batch: texts per embedding request, and analyses in flight.
+EMBED_BATCH_SIZE = int(os.environ.get("RANK_EMBED_BATCH_SIZE", "100"))
+ANALYSIS_BATCH_CONCURRENCY = int(os.environ.get("RANK_ANALYSIS_CONCURRENCY", "8"))
+
+# Source of the 'semantic_relevance' criterion:
+# - "embedding": cosine similarity against the remote query embedding only.
+# - "lexical": the offline BM25 index only; no embedding call is made.
+# - "embedding_fallback_lexical" (default): embeddings, with BM25 when the embedding call fails.
+RELEVANCE_SCORER = os.environ.get("RELEVANCE_SCORER", "embedding_fallback_lexical").lower()
+
+try:
+    lexical_index = load_default_index() if RELEVANCE_SCORER != "embedding" else None
+except Exception as e:
+    logger.warning(f"Failed to load the lexical relevance index: {e}")
+    lexical_index = None
+
+# Memory-mapped framework embeddings written by scripts/setup_framework_embeddings.py.
+# When present, the catalog no longer downloads the 'embedding' lists from Firestore.
+# An index built with a different model than EMBEDDING_MODEL is refused.
+FRAMEWORK_INDEX_PATH = os.environ.get(
+    "FRAMEWORK_INDEX_PATH", str(Path(__file__).parent.parent / "framework_index.bin")
+)
+embedding_index = None
+if os.path.exists(FRAMEWORK_INDEX_PATH):
+    try:
+        embedding_index = EmbeddingIndex.open(FRAMEWORK_INDEX_PATH, expected_model=EMBEDDING_MODEL)
+        logger.info(f"Loaded framework embedding index {FRAMEWORK_INDEX_PATH} "
+              f"({len(embedding_index.names)} x {embedding_index.dim}, {embedding_index.header['dtype']}, "
+              f"catalog hash {embedding_index.catalog_hash[:12]}).")
+    except Exception as e:
+        logger.error(f"Refusing to use framework embedding index {FRAMEWORK_INDEX_PATH}: {e}")
+
+# In-process cache of the 'frameworks' collection. Set CATALOG_USE_LISTENER=true to
+# invalidate on Firestore writes instead of relying on CATALOG_TTL_SECONDS alone.
+catalog = FrameworkCatalog(
+    client_factory=lambda: db,
+    use_listener=os.environ.get("CATALOG_USE_LISTENER", "false").lower() == "true",
+    fields=[f for f in CATALOG_FIELDS if f != "embedding"] if embedding_index is not None else None,
+)
+
+
+def _verify_embedding_index(frameworks: List[Dict[str, Any]], version: int) -> None:
+    """
+    Catalog refresh callback: stops using an index built from other descriptions
+    than the catalog's (a stale framework_index.bin in the image) and reloads the
+    catalog with its Firestore embeddings instead.
+    """
+    global embedding_index
+    index = embedding_index
+    if index is None:
+        return
+    hashes = {f.get('name'): f.get('content_hash') or "" for f in frameworks}
+    if index.matches_catalog(hashes):
+        return
+    logger.warning(f"Framework embedding index {FRAMEWORK_INDEX_PATH} does not match catalog v{version} "
+          f"(catalog hash {index.catalog_hash[:12]}; stale or missing: {index.stale_names(hashes) or 'none'}, "
+          f"{len(index.names)} indexed vs {len(hashes)} in the catalog). Using the Firestore embeddings instead.")
+    embedding_index = None
+    catalog.set_fields(CATALOG_FIELDS)
+    catalog.refresh()
+
+
+if embedding_index is not None:
+    catalog.add_refresh_callback(_verify_embedding_index)
+
+# Memoizes query embeddings and characteristic analyses (see QUERY_CACHE_BACKEND).
+query_cache = create_query_cache(lambda: db)
+
+_compiled_catalog: CompiledCatalog | None = None
+
+def _get_compiled_catalog() -> CompiledCatalog:
+    """Returns the scoring matrices for the cached catalog, recompiling only after a reload."""
+    global _compiled_catalog
+    frameworks = catalog.get()
+    compiled = _compiled_catalog
+    if compiled is None or compiled.source is not frameworks:
+        compiled = CompiledCatalog(frameworks, embedding_index=embedding_index, embedding_model=EMBEDDING_MODEL)
+        _compiled_catalog = compiled
+    return compiled
+
 # --- Multi-Criteria Ranking Implementation ---
 
 def _analyze_query_characteristics(query: str) -> Dict[str, Any]:
@@ -32,6 +150,10 @@ def _analyze_query_characteristics(query: str) -> Dict[str, Any]:
     if not llm:
         return {"error": "LLM not configured"}
 
+    cached = query_cache.get("analysis", ANALYSIS_MODEL, query)
+    if cached is not None:
+        return cached
+
     prompt = f"""
     Analyze the following user query to determine the characteristics of the decision they are trying to make.
     Respond with a JSON object with the following keys:
@@ -48,81 +170,221 @@ def _analyze_query_characteristics(query: str) -> Dict[str, Any]:
         response = llm.generate_content(prompt)
         # Clean the response to ensure it's valid JSON
         clean_response = response.text.strip().replace("```json", "").replace("```", "")
-        return json.loads(clean_response)
+        analysis = json.loads(clean_response)
     except Exception as e:
         print(f"Error analyzing query with LLM: {e}")
         return {"error": "Failed to analyze query characteristics"}
+    query_cache.set("analysis", ANALYSIS_MODEL, query, analysis)
+    return analysis
 
-def _calculate_criteria_scores(framework: Dict[str, Any], query_analysis: Dict[str, Any], query_embedding: List[float]) -> Dict[str, float]:
-    """Calculates scores for each criterion based on query analysis and framework properties."""
-    # This is a simplified scoring logic. A real implementation would have more nuanced rules.
-    scores = {
-        'semantic_relevance': sum(q * f for q, f in zip(query_embedding, framework.get('embedding', []))),
-        'complexity_match': 1.0 if query_analysis.get('complexity') in framework.get('complexity', []) else 0.2,
-        'data_availability': 1.0 if query_analysis.get('data_availability') in framework.get('data_focus', []) else 0.3,
-        'time_sensitivity': 1.0 if query_analysis.get('time_sensitivity') in framework.get('speed', []) else 0.4,
-        'quantitative_need': 1.0 if query_analysis.get('quantitative_need') in framework.get('type', []) else 0.5,
-        'stakeholder_involvement': 1.0 if query_analysis.get('stakeholder_involvement') in framework.get('stakeholders', []) else 0.6,
-        'strategic_operational': 1.0 if query_analysis.get('strategic_operational') in framework.get('focus', []) else 0.7,
-    }
-    return scores
-
-def rank_frameworks(query: str) -> List[Dict[str, Any]]:
-    """
-    Ranks decision-making frameworks using a multi-criteria algorithm, including
-    semantic relevance and LLM-based analysis of the query's characteristics.
-    """
-    print(f"Executing multi-criteria rank_frameworks for query: {query}")
-
-    # 1. Generate Query Embedding
+def _embed_query(query: str) -> List[float]:
+    """Embeds the query for semantic ranking; returns [] if the embedding call fails."""
+    cached = query_cache.get("embedding", EMBEDDING_MODEL, query)
+    if cached is not None:
+        return cached
     try:
-        query_result = genai.embed_content(model="models/text-embedding-004", content=query, task_type="RETRIEVAL_QUERY")
+        query_result = genai.embed_content(model=EMBEDDING_MODEL, content=query, task_type="RETRIEVAL_QUERY")
         query_embedding = query_result['embedding']
     except Exception as e:
         print(f"Error generating embedding: {e}. Cannot perform semantic ranking.")
-        query_embedding = []
+        return []
+    query_cache.set("embedding", EMBEDDING_MODEL, query, query_embedding)
+    return query_embedding
 
-    # 2. Analyze Query Characteristics with LLM
+def _analyze_query(query: str) -> Dict[str, Any]:
+    """Returns query characteristics according to ANALYSIS_MODE (blocking)."""
+    if ANALYSIS_MODE == "local":
+        return classify_query(query)
     query_analysis = _analyze_query_characteristics(query)
+    if "error" in query_analysis and ANALYSIS_MODE == "hedged":
+        logger.warning("LLM analysis unavailable. Using the local heuristic classifier.")
+        return classify_query(query)
+    return query_analysis
+
+async def _embed_query_async(query: str) -> List[float]:
+    """Embeds the query in a worker thread, bounded by EMBED_TIMEOUT_SECONDS."""
+    if RELEVANCE_SCORER == "lexical":
+        return []
+    return await asyncio.wait_for(asyncio.to_thread(_embed_query, query), EMBED_TIMEOUT_SECONDS)
+
+async def _analyze_query_hedged(query: str) -> Dict[str, Any]:
+    """
+    Races the LLM analysis against the latency budget. The local classifier is
+    effectively instant, so it is the answer whenever the LLM has not produced a
+    usable result in time. A late LLM result still lands in the query cache.
+    """
+    if ANALYSIS_MODE == "local":
+        return classify_query(query)
+
+    llm_task = asyncio.ensure_future(asyncio.to_thread(_analyze_query_characteristics, query))
+    done, _ = await asyncio.wait({llm_task}, timeout=ANALYSIS_LATENCY_BUDGET_SECONDS)
+    if done and "error" not in llm_task.result():
+        return llm_task.result()
+
+    reason = "failed" if done else f"missed the {ANALYSIS_LATENCY_BUDGET_SECONDS}s budget"
+    if ANALYSIS_MODE == "llm":
+        logger.warning(f"Query analysis {reason}.")
+        return {"error": f"Query characteristic analysis {reason}"}
+    logger.warning(f"LLM analysis {reason}. Using the local heuristic classifier.")
+    return classify_query(query)
+
+def _lexical_relevance(compiled: CompiledCatalog, query: str, query_embedding: List[float]):
+    """Returns BM25 relevance aligned with the catalog when the lexical scorer applies, else None."""
+    if lexical_index is None or RELEVANCE_SCORER == "embedding":
+        return None
+    if RELEVANCE_SCORER == "embedding_fallback_lexical" and query_embedding:
+        return None
+    return compiled.relevance_vector(lexical_index.score(query))
+
+def _score_frameworks(query: str, query_analysis: Dict[str, Any], query_embedding: List[float]) -> List[Dict[str, Any]]:
+    """Scores the cached catalog against an analyzed query and returns it sorted by score."""
     if "error" in query_analysis:
         print("Falling back to simple semantic search due to LLM analysis failure.")
         # Simplified fallback logic can be placed here if needed
         return []
 
-    # 3. Load frameworks from Firestore (they should have metadata for scoring)
-    all_frameworks = []
+    # Load the compiled catalog (they should have metadata for scoring)
     try:
-        if db:
-            frameworks_ref = db.collection('frameworks')
-            for doc in frameworks_ref.stream():
-                all_frameworks.append(doc.to_dict() or {})
-        else:
-            raise ConnectionError("Firestore client not available.")
+        compiled = _get_compiled_catalog()
     except Exception as e:
         print(f"Error loading frameworks from Firestore: {e}. Cannot rank.")
         return []
 
-    # 4. Calculate Weighted Scores for each Framework
-    weights = {
-        'semantic_relevance': 0.10, 'complexity_match': 0.20, 'data_availability': 0.15,
-        'time_sensitivity': 0.15, 'quantitative_need': 0.15, 'stakeholder_involvement': 0.15,
-        'strategic_operational': 0.10
-    }
-    
-    ranked_list = []
-    for framework in all_frameworks:
-        if not framework.get('embedding') and query_embedding:
-            continue # Skip if embedding is required but missing
-
-        criteria_scores = _calculate_criteria_scores(framework, query_analysis, query_embedding)
-        
-        total_score = sum(criteria_scores[key] * weights[key] for key in weights)
-        
-        framework['score'] = total_score
-        ranked_list.append(framework)
-
-    # 5. Sort by final score
-    ranked_list.sort(key=lambda x: x['score'], reverse=True)
+    # Score every framework in one vectorized pass and sort by final score.
+    # Frameworks without an embedding are skipped when the query has one,
+    # unless relevance comes from the lexical index instead.
+    relevance = _lexical_relevance(compiled, query, query_embedding)
+    ranked_list = compiled.rank(query_analysis, query_embedding, relevance=relevance)
 
     print(f"Successfully ranked {len(ranked_list)} frameworks using multi-criteria algorithm.")
     return ranked_list
+
+def rank_frameworks(query: str) -> List[Dict[str, Any]]:
+    """
+    Ranks decision-making frameworks using a multi-criteria algorithm, including
+    semantic relevance and LLM-based analysis of the query's characteristics.
+    """
+    print(f"Executing multi-criteria rank_frameworks for query: {query}")
+
+    # 1. Generate Query Embedding (skipped when relevance is purely lexical)
+    query_embedding = _embed_query(query) if RELEVANCE_SCORER != "lexical" else []
+
+    # 2. Analyze Query Characteristics with LLM (or the local classifier, see ANALYSIS_MODE)
+    query_analysis = _analyze_query(query)
+
+    # 3. Score and sort the catalog
+    return _score_frameworks(query, query_analysis, query_embedding)
+
+async def rank_frameworks_async(query: str) -> List[Dict[str, Any]]:
+    """
+    Async variant of `rank_frameworks` for use inside the agent's event loop.
+
+    The embedding call and the LLM characteristic analysis are blocking client
+    calls, so both run in worker threads and are awaited together: Phase 1 waits
+    for the slower of the two rather than their sum, and the loop stays free to
+    serve other sessions. The embedding has its own timeout and degrades like a
+    failed call; the analysis is bounded by the latency budget and hedged with
+    the local classifier.
+    """
+    logger.info(f"Executing async multi-criteria rank_frameworks for query: {query}")
+
+    embedding_result, analysis_result = await asyncio.gather(
+        _embed_query_async(query),
+        _analyze_query_hedged(query),
+        return_exceptions=True,
+    )
+
+    if isinstance(embedding_result, BaseException):
+        logger.warning(f"Embedding call did not complete ({type(embedding_result).__name__}). Cannot perform semantic ranking.")
+        embedding_result = []
+    if isinstance(analysis_result, BaseException):
+        logger.warning(f"Query analysis did not complete ({type(analysis_result).__name__}).")
+        analysis_result = {"error": "Query characteristic analysis failed"}
+
+    # Catalog access may block on the first Firestore load, so keep it off the loop too.
+    return await asyncio.to_thread(_score_frameworks, query, analysis_result, embedding_result)
+
+# --- Batch Ranking (offline evaluation and bulk triage) ---
+
+def _embed_queries(queries: List[str]) -> List[List[float]]:
+    """
+    Embeds many queries with one request per EMBED_BATCH_SIZE texts. Cached
+    queries are not re-sent; a failed batch yields [] for each of its queries.
+    """
+    embeddings: List[Optional[List[float]]] = [query_cache.get("embedding", EMBEDDING_MODEL, q) for q in queries]
+    missing = [i for i, e in enumerate(embeddings) if e is None]
+    for start in range(0, len(missing), EMBED_BATCH_SIZE):
+        chunk = missing[start:start + EMBED_BATCH_SIZE]
+        try:
+            result = genai.embed_content(model=EMBEDDING_MODEL, content=[queries[i] for i in chunk], task_type="RETRIEVAL_QUERY")
+            vectors = result['embedding']
+        except Exception as e:
+            logger.error(f"Error generating embeddings for a batch of {len(chunk)} queries: {e}.")
+            vectors = [[] for _ in chunk]
+        for i, vector in zip(chunk, vectors):
+            embeddings[i] = vector
+            if vector:
+                query_cache.set("embedding", EMBEDDING_MODEL, queries[i], vector)
+    return [e or [] for e in embeddings]
+
+async def embed_texts_async(texts: List[str]) -> List[List[float]]:
+    """
+    Embeds short texts (e.g. Q&A questions) in one batched request off the event
+    loop; every entry is [] if embeddings are disabled, fail or time out.
+    """
+    if RELEVANCE_SCORER == "lexical" or not texts:
+        return [[] for _ in texts]
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(_embed_queries, texts), EMBED_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f"Embedding {len(texts)} texts missed the {EMBED_TIMEOUT_SECONDS}s budget.")
+        return [[] for _ in texts]
+
+def rank_frameworks_batch(queries: List[str], concurrency: int = ANALYSIS_BATCH_CONCURRENCY,
+                          top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Ranks many queries at once: embeddings are requested in batches, query
+    characteristics are analyzed with at most `concurrency` calls in flight, and
+    the whole batch is scored against the catalog in one matrix operation.
+
+    Returns:
+        One `{"analysis": ..., "ranked": [...]}` dict per query, in input order.
+        `ranked` has the same shape as `rank_frameworks` output (truncated to
+        `top_k` when given) and is [] when the query could not be analyzed.
+    """
+    if not queries:
+        return []
+
+    # 1. Batch-embed the queries (skipped when relevance is purely lexical)
+    embeddings = _embed_queries(queries) if RELEVANCE_SCORER != "lexical" else [[] for _ in queries]
+
+    # 2. Analyze characteristics with bounded concurrency
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        analyses = list(pool.map(_analyze_query, queries))
+
+    # 3. Score the whole batch at once
+    try:
+        compiled = _get_compiled_catalog()
+    except Exception as e:
+        logger.error(f"Error loading frameworks from Firestore: {e}. Cannot rank.")
+        return [{"analysis": analysis, "ranked": []} for analysis in analyses]
+
+    valid = [i for i, analysis in enumerate(analyses) if "error" not in analysis]
+    results = [{"analysis": analysis, "ranked": []} for analysis in analyses]
+    if not valid:
+        return results
+
+    # Queries that need lexical relevance get BM25 rows; the others keep their
+    # embedding similarity. Mixing the two is rare (failed embedding batches only).
+    relevance_rows = [_lexical_relevance(compiled, queries[i], embeddings[i]) for i in valid]
+    if any(row is not None for row in relevance_rows):
+        semantic = compiled.criteria_scores_batch([analyses[i] for i in valid], [embeddings[i] for i in valid])['semantic_relevance']
+        relevance = [row if row is not None else semantic[j] for j, row in enumerate(relevance_rows)]
+        totals = compiled.score_batch([analyses[i] for i in valid], [embeddings[i] for i in valid], relevance=relevance)
+    else:
+        totals = compiled.score_batch([analyses[i] for i in valid], [embeddings[i] for i in valid])
+
+    for row, i in enumerate(valid):
+        results[i]["ranked"] = compiled.rank_from_scores(totals[row], top_k)
+    logger.info(f"Ranked {len(valid)} of {len(queries)} queries in batch.")
+    return results
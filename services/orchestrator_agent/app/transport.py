@@ -0,0 +1,234 @@
+"""
+One long-lived HTTP client pool for every orchestrator-to-agent call.
+
+Each framework service gets its own `httpx.AsyncClient` (so AGENT_POOL_SIZE is
+a per-host limit), kept for the life of the process: connections and TLS
+sessions are reused across calls and sessions, and with AGENT_HTTP2 concurrent
+calls to one service share a single multiplexed connection.
+
+Responses are requested with `Accept-Encoding: zstd, gzip` (zstd only when the
+`zstandard` package is installed); httpx decodes them transparently. Request
+bodies of at least AGENT_COMPRESS_MIN_BYTES are compressed with
+AGENT_REQUEST_COMPRESSION ("none" by default, since `adk api_server` does not
+decode compressed requests; enable it only for agents behind a proxy that does).
+
+`stream_json` hands the response body over as it arrives, so that callers can
+act on a partial reply (see app/streaming.py).
+
+Origins registered with `mount()` are served by an ASGI app in this process
+(see app/framework_host.py) instead of over the network.
+
+Kept free of ADK imports so that scripts/benchmark_transport.py can use it.
+"""
+import gzip
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available.
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+AGENT_HTTP2 = os.environ.get("AGENT_HTTP2", "true").lower() == "true"
+AGENT_POOL_SIZE = int(os.environ.get("AGENT_POOL_SIZE", "20"))
+AGENT_KEEPALIVE_SECONDS = float(os.environ.get("AGENT_KEEPALIVE_SECONDS", "300"))
+AGENT_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("AGENT_CONNECT_TIMEOUT_SECONDS", "5"))
+AGENT_REQUEST_COMPRESSION = os.environ.get("AGENT_REQUEST_COMPRESSION", "none").lower()
+AGENT_COMPRESS_MIN_BYTES = int(os.environ.get("AGENT_COMPRESS_MIN_BYTES", "1024"))
+
+
+def accept_encoding() -> str:
+    return "zstd, gzip" if zstandard is not None else "gzip"
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=5)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("AGENT_REQUEST_COMPRESSION=zstd needs the 'zstandard' package")
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    raise ValueError(f"Unknown request compression '{encoding}'")
+
+
+class AgentTransport:
+    """
+    Pooled JSON-over-HTTP client for the framework agents.
+
+    Args:
+        http2: Negotiate HTTP/2 (via ALPN on https URLs).
+        pool_size: Maximum connections per host.
+        keepalive_seconds: How long an idle connection is kept.
+        request_compression: "none", "gzip" or "zstd" for request bodies.
+        compress_min_bytes: Smaller request bodies are sent uncompressed.
+    """
+
+    def __init__(self, http2: bool = AGENT_HTTP2, pool_size: int = AGENT_POOL_SIZE,
+                 keepalive_seconds: float = AGENT_KEEPALIVE_SECONDS,
+                 request_compression: str = AGENT_REQUEST_COMPRESSION,
+                 compress_min_bytes: int = AGENT_COMPRESS_MIN_BYTES):
+        self.http2 = http2
+        self.pool_size = pool_size
+        self.keepalive_seconds = keepalive_seconds
+        self.request_compression = request_compression
+        self.compress_min_bytes = compress_min_bytes
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._mounts: Dict[str, Any] = {}
+        self._counters = {"requests": 0, "errors": 0, "in_process_requests": 0, "new_connections": 0,
+                          "reused_connections": 0, "http2_requests": 0, "bytes_sent": 0, "bytes_uncompressed": 0,
+                          "bytes_received": 0, "compressed_responses": 0, "streamed_requests": 0,
+                          "streams_closed_early": 0, "probes": 0, "probe_errors": 0}
+
+    def mount(self, origin: str, app: Any) -> None:
+        """Serves requests to `origin` (e.g. 'http://in-process') with the ASGI `app`, without a network hop."""
+        self._mounts[origin.rstrip("/")] = app
+
+    def _origin(self, url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _client(self, url: str) -> httpx.AsyncClient:
+        origin = self._origin(url)
+        client = self._clients.get(origin)
+        if client is None and origin in self._mounts:
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=self._mounts[origin]),
+                                       timeout=httpx.Timeout(None))
+            self._clients[origin] = client
+        elif client is None:
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size,
+                                    keepalive_expiry=self.keepalive_seconds),
+                timeout=httpx.Timeout(None, connect=AGENT_CONNECT_TIMEOUT_SECONDS),
+                headers={"accept-encoding": accept_encoding()},
+            )
+            self._clients[origin] = client
+        return client
+
+    def _prepare(self, url: str, payload: Any) -> Tuple[bytes, Dict[str, str], bool]:
+        """Encodes `payload` for a POST to `url`: (body to send, headers, served in process)."""
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"content-type": "application/json"}
+        sent = body
+        # Compressing a request that never leaves the process only costs CPU.
+        in_process = self._origin(url) in self._mounts
+        if self.request_compression != "none" and not in_process and len(body) >= self.compress_min_bytes:
+            sent = compress(body, self.request_compression)
+            headers["content-encoding"] = self.request_compression
+        self._counters["requests"] += 1
+        self._counters["bytes_sent"] += len(sent)
+        self._counters["bytes_uncompressed"] += len(body)
+        return sent, headers, in_process
+
+    def _count_connection(self, in_process: bool, connected: list) -> None:
+        if in_process:
+            self._counters["in_process_requests"] += 1
+        else:
+            self._counters["new_connections" if connected else "reused_connections"] += 1
+
+    def _count_response(self, response: httpx.Response) -> None:
+        if response.http_version == "HTTP/2":
+            self._counters["http2_requests"] += 1
+        if response.headers.get("content-encoding"):
+            self._counters["compressed_responses"] += 1
+
+    @staticmethod
+    def _trace(connected: list):
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            # Only requests that had to open a connection see connect_tcp events.
+            if event_name == "connection.connect_tcp.complete":
+                connected.append(True)
+
+        return trace
+
+    async def post_json(self, url: str, payload: Any, timeout: Optional[float] = None) -> Any:
+        """POSTs `payload` as JSON and returns the decoded JSON response; raises on HTTP errors."""
+        sent, headers, in_process = self._prepare(url, payload)
+        connected = []
+        try:
+            response = await self._client(url).post(url, content=sent, headers=headers, timeout=timeout,
+                                                    extensions={"trace": self._trace(connected)})
+            response.raise_for_status()
+        except httpx.HTTPError:
+            self._counters["errors"] += 1
+            raise
+        finally:
+            self._count_connection(in_process, connected)
+        self._count_response(response)
+        self._counters["bytes_received"] += int(response.headers.get("content-length") or len(response.content))
+        return response.json()
+
+    async def stream_json(self, url: str, payload: Any, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        POSTs `payload` as JSON and yields the response body as text, chunk by
+        chunk, as it arrives; raises on HTTP errors. Closing the generator
+        before the end abandons the rest of the response.
+        """
+        sent, headers, in_process = self._prepare(url, payload)
+        connected = []
+        response = None
+        finished = False
+        self._counters["streamed_requests"] += 1
+        try:
+            async with self._client(url).stream("POST", url, content=sent, headers=headers, timeout=timeout,
+                                                extensions={"trace": self._trace(connected)}) as response:
+                response.raise_for_status()
+                self._count_response(response)
+                async for text in response.aiter_text():
+                    yield text
+                finished = True
+        except httpx.HTTPError:
+            self._counters["errors"] += 1
+            finished = True
+            raise
+        finally:
+            self._count_connection(in_process, connected)
+            if response is not None:
+                self._counters["bytes_received"] += response.num_bytes_downloaded
+            if not finished:
+                self._counters["streams_closed_early"] += 1
+
+    async def probe(self, url: str, timeout: Optional[float] = None) -> int:
+        """GETs `url` (e.g. to wake a scaled-to-zero service) and returns the HTTP status; raises on transport errors."""
+        self._counters["probes"] += 1
+        try:
+            response = await self._client(url).get(url, timeout=timeout)
+        except httpx.HTTPError:
+            self._counters["probe_errors"] += 1
+            raise
+        return response.status_code
+
+    def stats(self) -> Dict[str, Any]:
+        c = self._counters
+        connections = c["new_connections"] + c["reused_connections"]
+        return {
+            **c,
+            "hosts": len(self._clients),
+            "reuse_ratio": round(c["reused_connections"] / connections, 3) if connections else 0.0,
+            "request_compression_ratio": round(c["bytes_sent"] / c["bytes_uncompressed"], 3) if c["bytes_uncompressed"] else 1.0,
+        }
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+
+_shared: Optional[AgentTransport] = None
+
+
+def get_transport() -> AgentTransport:
+    """The process-wide transport shared by all framework agents."""
+    global _shared
+    if _shared is None:
+        _shared = AgentTransport()
+        logger.info(f"Agent transport: http2={_shared.http2}, pool_size={_shared.pool_size}/host, "
+                    f"accept-encoding='{accept_encoding()}', request compression={_shared.request_compression}")
+    return _shared
@@ -27,14 +27,23 @@ def test_firestore_connection():
 # Run the diagnostic test on startup, before the app starts
 test_firestore_connection()
 
-# Create an instance of the Firestore session service.
-session_service = FirestoreSessionService()
+# Create an instance of the Firestore session service. SESSION_STORE=delta writes
+# only the changed state keys, once per turn (see app/session_service.py).
+SESSION_STORE = os.environ.get("SESSION_STORE", "adk").lower()
+if SESSION_STORE == "delta":
+    from app.session_service import DeltaSessionService
+    session_service = DeltaSessionService()
+else:
+    session_service = FirestoreSessionService()
 
 # Get the main agent application instance
 agent_app = app.create_app(
     agent=get_agent(),
     session_service=session_service
 )
+if SESSION_STORE == "delta":
+    from app.session_service import SessionFlushMiddleware
+    agent_app = SessionFlushMiddleware(agent_app, session_service)
 
 if __name__ == "__main__":
     # Respect the PORT environment variable provided by Cloud Run.
@@ -0,0 +1,143 @@
+import threading
+import time
+
+import pytest
+
+from app import catalog as catalog_module
+from app.catalog import FrameworkCatalog
+from app.fakes import FakeFirestoreClient
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(catalog_module.time, "monotonic", clock)
+    return clock
+
+
+def make_client(*names, latency=0.0):
+    client = FakeFirestoreClient(latency=latency)
+    for name in names:
+        client.collection("frameworks").document(name).set({"name": name, "description": "long markdown"})
+    return client
+
+
+def names(frameworks):
+    return sorted(f["name"] for f in frameworks)
+
+
+def wait_for_refresh(catalog):
+    if catalog._refreshing is not None:
+        catalog._refreshing.join(5)
+
+
+def test_first_load_applies_the_projection(clock):
+    catalog = FrameworkCatalog(lambda: make_client("swot"), ttl_seconds=60)
+    assert catalog.get() == [{"name": "swot"}]
+    assert catalog.stats()["misses"] == 1 and catalog.version == 1
+
+
+def test_ttl_expiry_refreshes(clock):
+    client = make_client("swot")
+    catalog = FrameworkCatalog(lambda: client, ttl_seconds=60)
+    catalog.get()
+    client.collection("frameworks").document("okr").set({"name": "okr"})
+
+    clock.now += 59
+    assert names(catalog.get()) == ["swot"]
+    wait_for_refresh(catalog)
+    assert catalog.version == 1 and catalog.stats()["hits"] == 1
+
+    clock.now += 1
+    catalog.get()
+    wait_for_refresh(catalog)
+    assert names(catalog.get()) == ["okr", "swot"] and catalog.version == 2
+    assert catalog.stats()["stale_hits"] == 1
+
+
+def test_stale_copy_is_served_while_revalidating(clock):
+    client = make_client("swot")
+    catalog = FrameworkCatalog(lambda: client, ttl_seconds=60)
+    catalog.get()
+    client.collection("frameworks").document("okr").set({"name": "okr"})
+    client.latency = 0.5
+    clock.now += 60
+
+    started = time.perf_counter()
+    assert names(catalog.get()) == ["swot"]
+    assert names(catalog.get()) == ["swot"]
+    assert time.perf_counter() - started < 0.25
+    # Both stale reads share the one refresh in flight.
+    assert catalog.stats()["stale_hits"] == 2 and catalog._refreshing.is_alive()
+    wait_for_refresh(catalog)
+    assert names(catalog.get()) == ["okr", "swot"] and catalog.stats()["refreshes"] == 2
+
+
+def test_failed_refresh_keeps_the_cached_copy(clock):
+    clients = [make_client("swot")]
+    catalog = FrameworkCatalog(lambda: clients[0], ttl_seconds=60)
+    catalog.get()
+    clients[0] = None
+    clock.now += 60
+    assert names(catalog.get()) == ["swot"]
+    wait_for_refresh(catalog)
+    assert names(catalog.get()) == ["swot"] and catalog.stats()["refresh_errors"] == 1
+
+
+def test_failed_first_load_raises_then_recovers():
+    clients = [None]
+    catalog = FrameworkCatalog(lambda: clients[0], ttl_seconds=60)
+    with pytest.raises(ConnectionError):
+        catalog.get()
+    clients[0] = make_client("swot")
+    assert names(catalog.get()) == ["swot"]
+
+
+def test_concurrent_first_loads_all_wait_for_the_data():
+    for _ in range(50):
+        catalog = FrameworkCatalog(lambda client=make_client("swot"): client, ttl_seconds=60,
+                                   load_timeout_seconds=2)
+        barrier = threading.Barrier(8)
+        results, errors = [], []
+
+        def first_get():
+            barrier.wait()
+            try:
+                results.append(names(catalog.get()))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=first_get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == [] and results == [["swot"]] * 8
+
+
+def test_listener_installs_writes_without_a_refresh(clock):
+    client = make_client("swot")
+    catalog = FrameworkCatalog(lambda: client, ttl_seconds=60, use_listener=True)
+    seen = []
+    catalog.add_refresh_callback(lambda frameworks, version: seen.append((names(frameworks), version)))
+    assert catalog.get() == [{"name": "swot"}] and catalog.stats()["listener_attached"]
+
+    client.collection("frameworks").document("okr").set({"name": "okr", "description": "long markdown"})
+    # Expiry is ignored while the listener keeps the copy current.
+    clock.now += 3600
+    assert sorted(catalog.get(), key=lambda f: f["name"]) == [{"name": "okr"}, {"name": "swot"}]
+    assert catalog._refreshing is None and catalog.stats()["stale_hits"] == 0
+    assert seen[-1] == (["okr", "swot"], catalog.version)
+
+    catalog.close()
+    assert not catalog.stats()["listener_attached"]
+    client.collection("frameworks").document("pestle").set({"name": "pestle"})
+    assert seen[-1] == (["okr", "swot"], catalog.version)
@@ -0,0 +1,188 @@
+"""
+Property checks for QAState: each test replays many randomly generated Q&As
+(seeded, so a failure names the seed that reproduces it) against a reference
+model of the nested qa_state layout the orchestrator used to store.
+"""
+import json
+import random
+
+import pytest
+
+from app.qa import NO_ANSWER, QAState, qa_answers
+
+SEEDS = range(200)
+
+
+def random_results(rng: random.Random) -> dict:
+    """Pass 1 results for up to five agents; some need no answers or failed to parse."""
+    results = {}
+    for i in range(rng.randint(0, 5)):
+        kind = rng.choice(["NEED_INFO", "NEED_INFO", "NEED_INFO", "SUFFICIENT", None])
+        if kind is None:
+            results[f"agent_{i}"] = None
+        else:
+            # Question text is unique per agent: the nested layout matched answers by question.
+            results[f"agent_{i}"] = {"status": kind, "questions": [f"Q{i}.{q}?" for q in range(rng.randint(0, 4))]}
+    return results
+
+
+def asked(results: dict) -> list:
+    """(agent, question) pairs in asking order, as the old orchestrator asked them."""
+    return [(name, q) for name, result in results.items()
+            if result and result["status"] == "NEED_INFO" for q in result["questions"]]
+
+
+def nested_layout(results: dict, answered: int) -> dict:
+    """The nested qa_state the old orchestrator stored after `answered` sequential answers."""
+    state = {"agents_with_questions": [], "completed_agents": [], "current_question": None, "answers": {}}
+    for name, result in results.items():
+        if result and result["status"] == "NEED_INFO" and result["questions"]:
+            state["agents_with_questions"].append({"name": name, "questions": result["questions"], "question_index": 0})
+            state["answers"][name] = []
+    for n in range(answered):
+        agent = state["agents_with_questions"][0]
+        state["answers"][agent["name"]].append({"q": agent["questions"][agent["question_index"]], "a": f"answer {n}"})
+        agent["question_index"] += 1
+        if agent["question_index"] >= len(agent["questions"]):
+            state["completed_agents"].append(state["agents_with_questions"].pop(0))
+    if state["agents_with_questions"]:
+        agent = state["agents_with_questions"][0]
+        state["current_question"] = {"agent_name": agent["name"], "question": agent["questions"][agent["question_index"]]}
+    return state
+
+
+def first_unanswered(state: QAState) -> int:
+    return next((slot for slot, reply in enumerate(state.replies) if reply is None), len(state.questions))
+
+
+def assert_same(a: QAState, b: QAState) -> None:
+    assert (a.agents, a.starts, a.questions, a.replies, a.cursor) == (b.agents, b.starts, b.questions, b.replies, b.cursor)
+    assert a.answers() == b.answers()
+    assert a.current() == b.current()
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_sequential_answers_match_the_nested_layout(seed):
+    rng = random.Random(seed)
+    results = random_results(rng)
+    pairs = asked(results)
+    state = QAState.from_results(results)
+    assert len(state.questions) == len(pairs)
+    for n, (agent_name, question) in enumerate(pairs):
+        current = state.current()
+        assert (current["agent_name"], current["question"]) == (agent_name, question)
+        legacy = nested_layout(results, n)
+        assert legacy["current_question"] == {"agent_name": agent_name, "question": question}
+        assert qa_answers(state.to_dict()) == legacy["answers"]
+        state.answer(f"answer {n}")
+    assert state.complete and state.current() is None
+    assert qa_answers(state.to_dict()) == nested_layout(results, len(pairs))["answers"]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_out_of_order_answers(seed):
+    rng = random.Random(seed)
+    state = QAState.from_results(random_results(rng))
+    order = list(range(len(state.questions)))
+    rng.shuffle(order)
+    expected = {}
+    for slot in order:
+        question = state.question_at(slot)
+        assert state.slot(question["agent_name"], question["index"]) == slot
+        # Routed by (agent, index) or by slot; both land in the same place.
+        if rng.random() < 0.5:
+            state.answer(f"a{slot}", slot)
+        else:
+            state.answer(f"a{slot}", state.slot(question["agent_name"], question["index"]))
+        expected[slot] = f"a{slot}"
+        assert state.cursor == first_unanswered(state)
+        assert [q["slot"] for q in state.pending()] == [s for s in range(len(state.questions)) if s not in expected]
+    assert state.complete
+    for i, agent_name in enumerate(state.agents):
+        # Each agent's answers come back in its own question order, whatever order they arrived in.
+        assert state.answers_for(agent_name) == [{"q": state.questions[s], "a": expected[s]}
+                                                 for s in range(state.starts[i], state.starts[i + 1])]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_cursor_only_moves_forward(seed):
+    rng = random.Random(seed)
+    state = QAState.from_results(random_results(rng))
+    previous = state.cursor
+    for _ in range(rng.randint(0, 2 * len(state.questions) + 1)):
+        if state.questions and rng.random() < 0.6:
+            # Re-answering an earlier slot must not pull the cursor back.
+            state.answer("again" if rng.random() < 0.3 else "new", rng.randrange(len(state.questions)))
+        elif not state.complete:
+            state.answer("current")
+        assert previous <= state.cursor == first_unanswered(state)
+        previous = state.cursor
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_compact_round_trip(seed):
+    rng = random.Random(seed)
+    state = QAState.from_results(random_results(rng))
+    for slot in rng.sample(range(len(state.questions)), rng.randint(0, len(state.questions))):
+        state.answer(f"a{slot}", slot)
+    if state.pending() and rng.random() < 0.5:
+        pending = state.pending()
+        rng.shuffle(pending)
+        state.form = [{"id": i, "question": item["question"], "askers": [item]} for i, item in enumerate(pending, start=1)]
+    stored = json.loads(json.dumps(state.to_dict()))
+    restored = QAState.from_dict(stored)
+    assert_same(restored, state)
+    assert restored.form == state.form
+    assert restored.to_dict() == stored
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_nested_layout_round_trip(seed):
+    rng = random.Random(seed)
+    results = random_results(rng)
+    answered = rng.randint(0, len(asked(results)))
+    legacy = nested_layout(results, answered)
+    restored = QAState.from_dict(json.loads(json.dumps(legacy)))
+    if not asked(results):
+        assert restored.complete and restored.answers() == {}
+        return
+    expected = QAState.from_results(results)
+    for n in range(answered):
+        expected.answer(f"answer {n}")
+    assert_same(restored, expected)
+    current = restored.current()
+    assert ({"agent_name": current["agent_name"], "question": current["question"]} if current else None) == legacy["current_question"]
+    assert qa_answers(restored.to_dict()) == legacy["answers"]
+    assert_same(QAState.from_dict(restored.to_dict()), restored)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_form_stays_open_until_answered_or_skipped(seed):
+    rng = random.Random(seed)
+    state = QAState.from_results(random_results(rng))
+    pending = state.pending()
+    state.form = [{"id": i, "question": item["question"], "askers": [item]} for i, item in enumerate(pending, start=1)]
+    expected = {}
+    while state.form and rng.random() < 0.8:
+        replies = {group["id"]: f"form {group['id']}" for group in state.form if rng.random() < 0.5}
+        expected.update(replies)
+        state.apply_form(replies)
+        state = QAState.from_dict(json.loads(json.dumps(state.to_dict())))
+        # Unanswered items stay on the form under the numbers the user saw.
+        assert [group["id"] for group in state.form or []] == [i for i in range(1, len(pending) + 1) if i not in expected]
+        assert state.complete == (state.form is None)
+        assert state.cursor == first_unanswered(state)
+    state.apply_form({}, finish=True)
+    assert state.complete and state.form is None
+    for i, item in enumerate(pending, start=1):
+        assert state.replies[item["slot"]] == expected.get(i, NO_ANSWER)
+
+
+def test_answer_outside_the_qa_is_rejected():
+    state = QAState.from_results({"swot_agent": {"status": "NEED_INFO", "questions": ["Budget?"]}})
+    with pytest.raises(IndexError):
+        state.answer("x", 1)
+    state.answer("y")
+    with pytest.raises(IndexError):
+        state.answer("z")
+    assert qa_answers(None) == {}
@@ -0,0 +1,59 @@
+from app.fakes import FakeFirestoreClient
+from app.query_cache import DiskTier, FirestoreTier, MemoryTier, QueryCache
+
+
+def test_memory_tier_returns_copies():
+    cache = QueryCache(MemoryTier(), log_every=0)
+    ranking = [{"name": "SWOT"}]
+    cache.set("ranking", "m", "Open a bakery?", ranking)
+    ranking[0]["score"] = 1
+    hit = cache.get("ranking", "m", "  open a BAKERY? ")
+    assert hit == [{"name": "SWOT"}]
+    hit[0]["score"] = 2
+    assert cache.get("ranking", "m", "Open a bakery?") == [{"name": "SWOT"}]
+
+
+def test_disk_tier_reads_do_not_write(tmp_path):
+    tier = DiskTier(str(tmp_path / "cache.sqlite3"))
+    tier.set("a", {"x": 1})
+    changes = tier._conn.total_changes
+    for _ in range(5):
+        assert tier.get("a")[0] == {"x": 1}
+    assert tier.get("missing") is None
+    assert tier._conn.total_changes == changes and not tier._conn.in_transaction
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    tier = DiskTier(str(tmp_path / "cache.sqlite3"), max_entries=10, sweep_every=1000)
+    for i in range(10):
+        tier.set(f"k{i}", i)
+    assert tier.evictions == 0 and len(tier) == 10
+    # Hits count as use once saved, which the eviction sweep does first.
+    for i in range(5):
+        tier.get(f"k{i}")
+    tier.set("k10", 10)
+    # Evicted down to 90% of the bound: the two least recently used entries go.
+    assert len(tier) == 9 and tier.evictions == 2
+    assert tier.get("k5") is None and tier.get("k6") is None
+    assert all(tier.get(f"k{i}") is not None for i in [0, 1, 2, 3, 4, 7, 8, 9, 10])
+    # The row count is read back from the table when it is opened again.
+    reopened = DiskTier(str(tmp_path / "cache.sqlite3"), max_entries=10)
+    assert len(reopened) == 9
+
+
+def test_disk_tier_sweeps_expired_rows(tmp_path):
+    tier = DiskTier(str(tmp_path / "cache.sqlite3"), ttl_seconds=-1, sweep_every=3)
+    tier.set("a", 1)
+    tier.set("b", 2)
+    assert tier.get("a") is None and len(tier) == 2
+    tier.set("c", 3)
+    assert len(tier) == 0 and tier.evictions == 0
+
+
+def test_firestore_tier_evictions_are_not_counted():
+    client = FakeFirestoreClient()
+    cache = QueryCache(MemoryTier(), FirestoreTier(lambda: client), log_every=0)
+    cache.set("analysis", "m", "q", {"type": "strategic"})
+    assert QueryCache(MemoryTier(), cache.persistent, log_every=0).get("analysis", "m", "q") == {"type": "strategic"}
+    stats = cache.stats()
+    assert stats["persistent_tier"] == "firestore" and stats["persistent_evictions"] is None
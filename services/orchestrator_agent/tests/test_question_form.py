@@ -0,0 +1,33 @@
+from app.qa import build_question_form, is_skip_reply, parse_form_reply
+
+
+def test_numbered_reply_answers_open_items_only():
+    reply = "1. About $200k\n3) Six months\n   including hiring"
+    assert parse_form_reply(reply, [1, 3]) == {1: "About $200k", 3: "Six months including hiring"}
+
+
+def test_json_reply():
+    assert parse_form_reply('{"2": "Yes", "5": "", "9": "No"}', [2, 5]) == {2: "Yes"}
+    assert parse_form_reply('["Yes", "No", "Extra"]', [2, 5]) == {2: "Yes", 5: "No"}
+
+
+def test_unnumbered_reply_matched_in_order_only_when_unambiguous():
+    assert parse_form_reply("Yes\nNo", [1, 4]) == {1: "Yes", 4: "No"}
+    assert parse_form_reply("Not sure about the budget", [4]) == {4: "Not sure about the budget"}
+    # One line for two unrelated questions answers neither; both are asked again.
+    assert parse_form_reply("Not sure about the budget", [1, 2]) == {}
+    assert parse_form_reply("   ", [1]) == {}
+
+
+def test_skip_reply():
+    assert is_skip_reply(" Skip. ") and is_skip_reply("n/a")
+    assert not is_skip_reply("skip the budget question, the rest is fine")
+
+
+def test_overlapping_questions_are_asked_once():
+    questions = [{"agent_name": "swot_agent", "question": "What is your budget?"},
+                 {"agent_name": "okr_agent", "question": "What is your budget?"},
+                 {"agent_name": "okr_agent", "question": "Who are the stakeholders?"}]
+    form = build_question_form(questions)
+    assert [group["id"] for group in form] == [1, 2]
+    assert [asker["agent_name"] for asker in form[0]["askers"]] == ["swot_agent", "okr_agent"]
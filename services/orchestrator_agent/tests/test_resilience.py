@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from app.resilience import AgentUnavailableError, CircuitBreaker, call_with_resilience
+
+
+async def _fail():
+    raise RuntimeError("boom")
+
+
+async def _succeed():
+    return "report"
+
+
+def _open_circuit(breaker: CircuitBreaker, name: str) -> None:
+    for _ in range(2):
+        breaker.record_failure(name)
+    assert breaker.state(name) == "half_open"
+
+
+def test_cancelled_half_open_trial_releases_the_circuit():
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0)
+        _open_circuit(breaker, "swot_agent")
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(3600)
+
+        trial = asyncio.create_task(call_with_resilience("swot_agent", hang, breaker, deadline=60, retries=0))
+        await started.wait()
+        assert not breaker.allow("swot_agent")  # Only one trial at a time.
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert await call_with_resilience("swot_agent", _succeed, breaker, deadline=60, retries=0) == "report"
+        assert breaker.state("swot_agent") == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_open_circuit_rejects_calls():
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+        breaker.record_failure("swot_agent")
+        breaker.record_failure("swot_agent")
+        assert breaker.state("swot_agent") == "open"
+        with pytest.raises(AgentUnavailableError):
+            await call_with_resilience("swot_agent", _fail, breaker, deadline=60, retries=0)
+
+    asyncio.run(scenario())
+
+
+def test_trial_timeout_counts_as_failure():
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0)
+        _open_circuit(breaker, "swot_agent")
+
+        async def slow():
+            await asyncio.sleep(3600)
+
+        with pytest.raises(AgentUnavailableError):
+            await call_with_resilience("swot_agent", slow, breaker, deadline=0.01, retries=0)
+        assert breaker.stats()["opened"] == 2
+
+    asyncio.run(scenario())
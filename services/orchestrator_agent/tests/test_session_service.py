@@ -0,0 +1,45 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("adk")
+
+from app import session_service
+from app.fakes import FakeFirestoreClient
+from app.session_service import DeltaSessionService
+
+
+def make_event(timestamp, state_delta=None, partial=False):
+    dumped = {"author": "orchestrator", "timestamp": timestamp, "state_delta": dict(state_delta or {})}
+    return SimpleNamespace(partial=partial, timestamp=timestamp,
+                           actions=SimpleNamespace(state_delta=state_delta) if state_delta is not None else None,
+                           model_dump=lambda **kwargs: dumped)
+
+
+def test_append_event_buffers_the_turn_until_flush(monkeypatch):
+    monkeypatch.setattr(session_service, "SESSION_FLUSH_MAX_DELAY_SECONDS", 0)
+    client = FakeFirestoreClient()
+    service = DeltaSessionService(client_factory=lambda: client)
+
+    async def scenario():
+        session = SimpleNamespace(id="s1", state={"query": "q"}, events=[], last_update_time=0.0)
+        service.writer.stage(session.id, session.state, {"app_name": "app", "user_id": "u"})
+        await service.flush()
+        commits = service.writer.stats()["commits"]
+
+        await service.append_event(session, make_event(1.0, {"qa_state": {"cursor": 1}, "temp:scratch": 1}))
+        await service.append_event(session, make_event(1.5, partial=True))
+        await service.append_event(session, make_event(2.0, {"awaiting_selection": False}))
+        # Applied in memory, temp: keys and partial events aside; nothing written yet.
+        assert session.state == {"query": "q", "qa_state": {"cursor": 1}, "awaiting_selection": False}
+        assert len(session.events) == 2 and session.last_update_time == 2.0
+        assert service.writer.stats()["commits"] == commits and service.writer.dirty == ["s1"]
+
+        await service.flush()
+        assert service.writer.stats()["commits"] == commits + 1 and not service.writer.dirty
+        state, metadata, events = service.writer.load("s1")
+        assert dict(state) == session.state
+        assert [e["timestamp"] for e in events] == [1.0, 2.0] and metadata["last_update_time"] == 2.0
+
+    asyncio.run(scenario())
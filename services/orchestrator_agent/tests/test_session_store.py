@@ -0,0 +1,254 @@
+import random
+
+from app.fakes import FakeDocumentReference, FakeFirestoreClient, FakeWriteBatch
+from app.session_store import DELETE_FIELD, SessionWriter
+
+
+class RecordingBatch(FakeWriteBatch):
+    def __init__(self, client):
+        super().__init__()
+        self._client = client
+
+    def update(self, reference, data):
+        self._client.updates.append(dict(data))
+        super().update(reference, data)
+
+    def commit(self):
+        self._client.commits += 1
+        super().commit()
+
+
+class RecordingClient(FakeFirestoreClient):
+    """Counts batch commits and records every `update` sent to a document."""
+
+    def __init__(self):
+        super().__init__()
+        self.commits = 0
+        self.updates = []
+
+    def batch(self):
+        return RecordingBatch(self)
+
+
+def make_writer(**kwargs):
+    client = RecordingClient()
+    return client, SessionWriter(lambda: client, **kwargs)
+
+
+def stored_state(client, session_id="s1"):
+    return client.collection("sessions").document(session_id).get().to_dict()["state"]
+
+
+def state_fields(update):
+    return {path: value for path, value in update.items() if path.startswith("state.")}
+
+
+def test_only_changed_keys_are_written():
+    client, writer = make_writer()
+    state = {"query": "Open a second bakery?", "selected_frameworks": ["swot_agent"], "swot_agent": "{}"}
+    writer.stage("s1", state, {"app_name": "app", "user_id": "u"})
+    writer.flush("s1")
+    assert stored_state(client) == state
+
+    state["swot_agent"] = '{"status": "SUFFICIENT"}'
+    state["my-key"] = 1
+    writer.stage("s1", state)
+    writer.flush("s1")
+    assert state_fields(client.updates[-1]) == {"state.swot_agent": '{"status": "SUFFICIENT"}', "state.`my-key`": 1}
+    assert stored_state(client) == state
+
+    # Writing an equal value again is not a change.
+    state["query"] = "Open a second bakery?"
+    writer.stage("s1", state, event={"author": "user"})
+    writer.flush("s1")
+    assert state_fields(client.updates[-1]) == {}
+
+
+def test_removed_keys_are_deleted():
+    client, writer = make_writer()
+    state = {"query": "q", "awaiting_selection": True}
+    writer.stage("s1", state)
+    writer.flush("s1")
+    del state["awaiting_selection"]
+    writer.stage("s1", state)
+    writer.flush("s1")
+    assert state_fields(client.updates[-1]) == {"state.awaiting_selection": DELETE_FIELD}
+    assert stored_state(client) == {"query": "q"}
+
+
+def test_temp_keys_are_never_written():
+    client, writer = make_writer()
+    state = {"query": "q", "temp:scratch": [1, 2]}
+    writer.stage("s1", state)
+    writer.flush("s1")
+    assert stored_state(client) == {"query": "q"}
+    state["temp:scratch"] = [3]
+    writer.stage("s1", state)
+    assert writer.flush("s1") == 0
+    loaded, _, _ = writer.load("s1")
+    assert "temp:scratch" not in loaded
+
+
+def test_one_commit_per_flush():
+    client, writer = make_writer()
+    state = {"query": "q"}
+    writer.stage("s1", state, {"app_name": "app"})
+    for i in range(5):
+        state[f"step_{i}"] = i
+        writer.stage("s1", state, {"last_update_time": float(i)}, event={"author": "orchestrator", "n": i})
+    writer.stage("s2", {"query": "other"})
+    assert sorted(writer.dirty) == ["s1", "s2"]
+    assert writer.flush("s1") == 1 and client.commits == 1
+    assert writer.flush() == 1 and client.commits == 2
+    # Nothing pending, nothing written.
+    assert writer.flush() == 0 and client.commits == 2
+
+    _, metadata, events = writer.load("s1")
+    assert [e["n"] for e in events] == list(range(5))
+    assert metadata["event_count"] == 5 and metadata["last_update_time"] == 4.0
+    assert writer.stats()["commits"] == 2
+
+
+def test_state_is_read_at_flush_time():
+    client, writer = make_writer()
+    state = {"qa_state": {"cursor": 0}}
+    writer.stage("s1", state)
+    state["qa_state"]["cursor"] = 2
+    writer.flush("s1")
+    assert stored_state(client) == {"qa_state": {"cursor": 2}}
+
+
+def test_a_second_writer_picks_up_from_a_loaded_session():
+    client, writer = make_writer()
+    writer.stage("s1", {"query": "q", "swot_agent": "{}"}, event={"n": 0})
+    writer.flush("s1")
+
+    other = SessionWriter(lambda: client)
+    state, _, events = other.load("s1")
+    state["swot_agent"] = "{}"
+    state["okr_agent"] = "{}"
+    other.stage("s1", state, event={"n": 1})
+    other.flush("s1")
+    assert state_fields(client.updates[-1]) == {"state.okr_agent": "{}"}
+    assert [e["n"] for e in other.load("s1")[2]] == [0, 1]
+
+
+def test_referenced_values_are_not_shared_between_sessions():
+    client, writer = make_writer(ref_min_bytes=64)
+    ranked = [{"name": f"framework {i}", "score": i / 10} for i in range(10)]
+    for session_id in ("s1", "s2"):
+        writer.stage(session_id, {"ranked_frameworks": ranked})
+        writer.flush(session_id)
+    assert stored_state(client)["ranked_frameworks"].keys() == {"__ref__"}
+
+    first, _, _ = writer.load("s1")
+    first["ranked_frameworks"][0]["score"] = 99
+    second, _, _ = writer.load("s2")
+    assert second["ranked_frameworks"] == ranked
+    assert SessionWriter(lambda: client).load("s1")[0]["ranked_frameworks"] == ranked
+
+
+def shard_ids(client, key, session_id="s1"):
+    return sorted(s.id for s in client.collection(f"sessions/{session_id}/state").stream() if s.id.startswith(f"{key}~"))
+
+
+def test_shrinking_a_value_deletes_its_leftover_shards():
+    # Tiny shards, with every payload compressed (random text keeps it from shrinking to one shard).
+    client, writer = make_writer(offload_min_bytes=100, shard_bytes=64, compress_min_bytes=1)
+    rng = random.Random(0)
+    report = "".join(rng.choice("abcdefghij ") for _ in range(2000))
+    state = {"swot_agent": report}
+    writer.stage("s1", state)
+    writer.flush("s1")
+    many = shard_ids(client, "swot_agent")
+    assert len(many) > 3 and stored_state(client)["swot_agent"]["shards"] == len(many)
+
+    state["swot_agent"] = report[:300]
+    writer.stage("s1", state)
+    writer.flush("s1")
+    few = shard_ids(client, "swot_agent")
+    assert 0 < len(few) < len(many) and stored_state(client)["swot_agent"]["shards"] == len(few)
+    assert writer.load("s1")[0]["swot_agent"] == report[:300]
+    assert SessionWriter(lambda: client).load("s1")[0]["swot_agent"] == report[:300]
+
+
+def test_a_value_below_the_threshold_is_inlined_again():
+    client, writer = make_writer(offload_min_bytes=100, shard_bytes=64, compress_min_bytes=1)
+    state = {"swot_agent": "x" * 500, "query": "q"}
+    writer.stage("s1", state)
+    writer.flush("s1")
+    assert "__offload__" in stored_state(client)["swot_agent"]
+
+    state["swot_agent"] = "short"
+    writer.stage("s1", state)
+    writer.flush("s1")
+    assert stored_state(client)["swot_agent"] == "short"
+    assert shard_ids(client, "swot_agent") == []
+
+    # Removing an offloaded key removes its shards too.
+    state["okr_agent"] = "y" * 500
+    writer.stage("s1", state)
+    writer.flush("s1")
+    del state["okr_agent"]
+    writer.stage("s1", state)
+    writer.flush("s1")
+    assert shard_ids(client, "okr_agent") == [] and "okr_agent" not in stored_state(client)
+
+
+def test_recent_events_reads_only_the_chunks_past_the_boundary(monkeypatch):
+    client, writer = make_writer()
+    turns = [3, 2, 4, 1]  # Events per turn; each turn's events are one history chunk.
+    n = 0
+    state = {"query": "q"}
+    for count in turns:
+        for _ in range(count):
+            writer.stage("s1", state, event={"n": n})
+            n += 1
+        writer.flush("s1")
+
+    reads = []
+    original_get = FakeDocumentReference.get
+
+    def recording_get(reference):
+        reads.append(reference.id)
+        return original_get(reference)
+
+    monkeypatch.setattr(FakeDocumentReference, "get", recording_get)
+    _, metadata, events = writer.load("s1", recent_events=5)
+    assert metadata["event_chunks"] == [0, 3, 5, 9]
+    assert [e["n"] for e in events] == [5, 6, 7, 8, 9]
+    # The session header, then the chunks starting at events 5 and 9; not those at 0 and 3.
+    assert reads == ["s1", "000005", "000009"]
+
+    reads.clear()
+    assert [e["n"] for e in writer.load("s1")[2]] == list(range(10))
+    assert writer.load("s1", recent_events=0)[2] == []
+
+
+def test_lazy_state_reads_values_on_access_only():
+    client, writer = make_writer(offload_min_bytes=100)
+    writer.stage("s1", {"query": "q", "swot_agent": "x" * 500, "okr_agent": "y" * 500})
+    writer.flush("s1")
+
+    def fresh():
+        return SessionWriter(lambda: client).load("s1")[0]
+
+    state = fresh()
+    assert state.unloaded_keys() == {"swot_agent", "okr_agent"}
+    # Iterating over keys and membership tests read nothing.
+    assert sorted(state) == ["okr_agent", "query", "swot_agent"] and "swot_agent" in state and len(state) == 3
+    assert state.unloaded_keys() == {"swot_agent", "okr_agent"}
+    assert state.get("swot_agent") == "x" * 500 and state.unloaded_keys() == {"okr_agent"}
+
+    state = fresh()
+    assert dict(state.items())["okr_agent"] == "y" * 500 and not state.unloaded_keys()
+    state = fresh()
+    assert state.copy() == {"query": "q", "swot_agent": "x" * 500, "okr_agent": "y" * 500}
+    assert not state.unloaded_keys()
+    state = fresh()
+    assert dict(state)["swot_agent"] == "x" * 500 and not state.unloaded_keys()
+
+    # Overwriting an unread value drops it without reading it.
+    state = fresh()
+    state["swot_agent"] = "new"
+    assert state.unloaded_keys() == {"okr_agent"} and state["swot_agent"] == "new"
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from app.streaming import AgentReplyParser, JSONStreamParser, pass1_decision, stream_pass1
+
+SEEDS = range(100)
+
+REPLY = {
+    "status": "NEED_INFO",
+    "questions": ["What is the budget (in €)?", "Who signs off—the \"board\"?"],
+    "report": {
+        "summary": "Line one\nLine two\ttabbed \\ backslash \U0001F600 emoji",
+        "risks": ["Rent rises", {"nested": [1, 2.5, -3e2, True, False, None]}],
+    },
+    "score": 0.75,
+    "done": True,
+}
+
+
+def chunked(text: str, rng: random.Random) -> list:
+    """`text` cut at random offsets, including single characters and inside escapes."""
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, 40))))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+def envelope(output: str) -> str:
+    return json.dumps({"output": output, "session_id": "s1"})
+
+
+def documents():
+    bare = json.dumps(REPLY)
+    # ensure_ascii writes \uXXXX escapes, including the surrogate pair of the emoji.
+    escaped = json.dumps(REPLY, ensure_ascii=True)
+    return {
+        "bare": bare,
+        "bare_escaped": escaped,
+        "envelope": envelope(bare),
+        "envelope_escaped": json.dumps({"output": escaped}, ensure_ascii=True),
+        "envelope_fenced": envelope(f"```json\n{json.dumps(REPLY, indent=2)}\n```"),
+    }
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("kind", sorted(documents()))
+def test_reply_split_anywhere_decodes_the_same(kind, seed):
+    text = documents()[kind]
+    parser = AgentReplyParser()
+    events = []
+    for chunk in chunked(text, random.Random(seed)):
+        events.extend(parser.feed(chunk))
+    assert not parser.failed
+    assert parser.fields == REPLY
+    # Each top-level field is reported once, in document order, as soon as it completes.
+    assert [path[0] for path, _ in events if len(path) == 1] == list(REPLY)
+    assert json.loads(parser.text().strip().removeprefix("```json").removesuffix("```")) == REPLY
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_text_fragments_rebuild_the_string(seed):
+    value = "Quote \" slash \\ newline \n unicode é中 \U0001F680 end"
+    text = json.dumps({"output": value}, ensure_ascii=seed % 2 == 0)
+    pieces = []
+    parser = JSONStreamParser(text_paths={("output",)}, on_text=lambda path, piece: pieces.append(piece))
+    for chunk in chunked(text, random.Random(seed)):
+        parser.feed(chunk)
+    assert parser.done and "".join(pieces) == value
+    # A lone high surrogate is never passed on by itself.
+    assert all(not ("\ud800" <= piece[-1] <= "\udbff") for piece in pieces)
+
+
+@pytest.mark.parametrize("document", ["42", "-1.5e3", "true", "null", '"text"'])
+def test_top_level_scalar(document):
+    parser = JSONStreamParser()
+    events = []
+    for char in document:
+        events.extend(parser.feed(char))
+    events.extend(parser.close())
+    assert parser.done and events == [((), json.loads(document))]
+
+    # An agent's output must be an object (or array); a scalar in the envelope is rejected, not left pending.
+    reply = AgentReplyParser()
+    for chunk in chunked(envelope(document), random.Random(0)):
+        reply.feed(chunk)
+    assert reply.failed and reply.fields == {} and reply.text() == document
+
+
+def test_incomplete_documents():
+    parser = JSONStreamParser()
+    parser.feed('{"status": "NEED')
+    with pytest.raises(ValueError):
+        parser.close()
+    reply = AgentReplyParser()
+    reply.feed(envelope('{"status": "NEED_INFO", "questions": ['))
+    assert reply.failed and reply.text().startswith('{"status"')
+    reply = AgentReplyParser()
+    reply.feed(envelope("Sorry, I cannot help with that."))
+    assert reply.failed and reply.fields == {}
+
+
+def test_pass1_decision():
+    assert pass1_decision({"status": "NEED_INFO"}) is None
+    assert pass1_decision({"status": "SUFFICIENT", "questions": []}) == {"status": "SUFFICIENT", "questions": []}
+    assert pass1_decision({"status": "COMPLETE"}) == {"status": "COMPLETE"}
+    assert pass1_decision({"status": "COMPLETE", "report": {"a": 1}}) == {"status": "COMPLETE", "report": {"a": 1}}
+
+
+class FakeStream:
+    """Serves `text` in small chunks, recording which task opened and closed it."""
+
+    def __init__(self, text: str, fail_at: int = None, hold_at: int = None):
+        self.text = text
+        self.fail_at = fail_at
+        self.hold_at = hold_at
+        self.released = asyncio.Event()
+        self.read = 0
+        self.opened_in = self.closed_in = None
+
+    async def chunks(self):
+        self.opened_in = asyncio.current_task()
+        try:
+            for i in range(0, len(self.text), 5):
+                if self.fail_at is not None and i >= self.fail_at:
+                    raise ConnectionError("connection reset")
+                if self.hold_at is not None and i >= self.hold_at:
+                    await self.released.wait()
+                self.read = i + 5
+                yield self.text[i:i + 5]
+                await asyncio.sleep(0)
+        finally:
+            self.closed_in = asyncio.current_task()
+
+
+def test_stream_pass1_stops_at_the_decision():
+    async def scenario():
+        stream = FakeStream(envelope(json.dumps({"status": "NEED_INFO", "questions": ["Budget?"], "notes": "x" * 500})))
+        value, report = await stream_pass1(stream.chunks)
+        assert json.loads(value) == {"status": "NEED_INFO", "questions": ["Budget?"]}
+        assert report is None
+        assert stream.read < len(stream.text) and stream.closed_in is stream.opened_in
+
+    asyncio.run(scenario())
+
+
+def test_stream_pass1_complete_report_after_status():
+    async def scenario():
+        body = {"status": "COMPLETE", "questions": [], "report": {"summary": "Open it."}, "trailer": "x" * 200}
+        stream = FakeStream(envelope(json.dumps(body)), hold_at=60)
+        value, report = await stream_pass1(stream.chunks)
+        # Decided on `status` alone; the report is still to come.
+        assert json.loads(value) == {"status": "COMPLETE", "report_streaming": True}
+        assert not report.done()
+        stream.released.set()
+        assert json.loads(await report) == {"summary": "Open it."}
+        # The task that opened the stream read it to the report and closed it, before the trailer.
+        assert stream.opened_in is report and stream.closed_in is report
+        assert stream.read < len(stream.text)
+
+    asyncio.run(scenario())
+
+
+def test_stream_pass1_failure_before_the_decision():
+    async def scenario():
+        stream = FakeStream(envelope(json.dumps({"status": "NEED_INFO", "questions": ["Budget?"]})), fail_at=20)
+        with pytest.raises(ConnectionError):
+            await stream_pass1(stream.chunks)
+        assert stream.closed_in is stream.opened_in
+
+    asyncio.run(scenario())
+
+
+def test_stream_pass1_cancelled_before_the_decision():
+    async def scenario():
+        stream = FakeStream(envelope(json.dumps({"status": "NEED_INFO", "questions": ["Budget?"]})), hold_at=10)
+        call = asyncio.create_task(stream_pass1(stream.chunks))
+        while stream.read < 10:
+            await asyncio.sleep(0)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        await asyncio.sleep(0)
+        assert stream.closed_in is stream.opened_in
+
+    asyncio.run(scenario())
+
+
+def test_stream_pass1_unparseable_output_is_read_whole():
+    async def scenario():
+        stream = FakeStream(envelope("I could not produce JSON this time."))
+        value, report = await stream_pass1(stream.chunks)
+        assert value == "I could not produce JSON this time." and report is None
+
+    asyncio.run(scenario())
@@ -54,7 +54,7 @@ You operate in a two-pass system. Your response format is ALWAYS a single JSON o
 **PASS 1: Information Sufficiency Analysis**
 If you receive only an `original_query`, your task is to determine if you have enough information to clearly define the immediate decision and understand its context and stakes.
 - If YES, you MUST return the following JSON object:
-  `{\{\"status\": \"SUFFICIENT\", "questions": []}}`
+  `{{"status": "SUFFICIENT", "questions": []}}`
 - If NO, you MUST generate up to 3 critical questions to clarify the core decision, the immediate feelings it might generate, and the long-term context, and return the following JSON object:
   `{{"status": "NEED_INFO", "questions": ["Question about the immediate action?", "Question about the biggest challenge in 10 months?", "Question 3?", "..."]}}`
 
@@ -65,6 +65,12 @@ If you receive a `shared_context` that includes `qa_answers`, you MUST perform t
 - If you determine that critical information is still missing, you MUST generate a `caveat` field in your final report explaining the gap and its impact.
 - Your final output MUST be a JSON object containing the impact analysis and the synthesized recommendation:
   `{{"decision": "...", "impact_10_minutes": "...", "impact_10_months": "...", "impact_10_years": "...", "synthesized_recommendation": "...", "caveat": "..."}}`
+
+**SINGLE-SHOT MODE (opt-in)**
+If the request includes `"protocol": "single_shot"` and you receive only an `original_query`, combine both passes in one response:
+- If critical information is missing, respond exactly as in PASS 1 with `NEED_INFO` and your questions.
+- Otherwise, do NOT return `SUFFICIENT`. Perform the PASS 2 analysis right away, following all PASS 2 rules, and return it wrapped as:
+  `{{"status": "COMPLETE", "report": <the PASS 2 JSON object>}}`
 """
 
 def get_agent():
@@ -54,7 +54,7 @@ You operate in a two-pass system. Your response format is ALWAYS a single JSON o
 **PASS 1: Information Sufficiency Analysis**
 If you receive only an `original_query`, your task is to determine if you have enough information to define the options, criteria, and weights necessary for a complete Weighted Decision Matrix analysis.
 - If YES, you MUST return the following JSON object:
-  `{\{\"status\": \"SUFFICIENT\", "questions": []}}`
+  `{{"status": "SUFFICIENT", "questions": []}}`
 - If NO, you MUST generate up to 3 critical questions to identify options, define evaluation criteria, and understand their relative importance (weights) and return the following JSON object:
   `{{"status": "NEED_INFO", "questions": ["Question 1?", "Question 2?", "..."]}}`
 
@@ -65,6 +65,12 @@ If you receive a `shared_context` that includes `qa_answers`, you MUST perform t
 - If you determine that critical information is still missing, you MUST generate a `caveat` field in your final report explaining the gap and its impact.
 - Your final output MUST be a JSON object containing the full analysis, formatted as structured lists of criteria and options scores, plus the winning option, final recommendation, and caveat:
   `{{"criteria": [ {{"name": "...", "weight": 0, "description": "..."}} ], "options_scores": [ {{"option": "...", "score": 0, "breakdown": "..."}} ], "winning_option": "...", "recommendation": "...", "caveat": "..."}}`
+
+**SINGLE-SHOT MODE (opt-in)**
+If the request includes `"protocol": "single_shot"` and you receive only an `original_query`, combine both passes in one response:
+- If critical information is missing, respond exactly as in PASS 1 with `NEED_INFO` and your questions.
+- Otherwise, do NOT return `SUFFICIENT`. Perform the PASS 2 analysis right away, following all PASS 2 rules, and return it wrapped as:
+  `{{"status": "COMPLETE", "report": <the PASS 2 JSON object>}}`
 """
 
 def get_agent():